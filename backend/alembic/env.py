@@ -13,6 +13,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from app.auth.models import EmailCode, User  # noqa: F401
 from app.core.config import settings
 from app.db.session import Base
+from app.mail.models import EmailOutbox  # noqa: F401
+from app.rides.models import Booking, Ride  # noqa: F401
 
 config = context.config
 if config.config_file_name is not None:
@@ -0,0 +1,38 @@
+"""rides: index for loading a university's active offers into the matcher
+
+Revision ID: a3c9e5f1b7d2
+Revises: f1b7c2d8e4a6
+Create Date: 2026-10-18 19:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c9e5f1b7d2"
+down_revision: str | None = "f1b7c2d8e4a6"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_rides_active_university_departure",
+            "rides",
+            ["university", "departure_latest"],
+            postgresql_where=sa.text("status = 'active'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_rides_active_university_departure",
+            table_name="rides",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,30 @@
+"""add users.token_version for JWT revocation
+
+Revision ID: a41c7e9d2f10
+Revises: 2bcb0688de6c
+Create Date: 2026-10-18 10:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a41c7e9d2f10"
+down_revision: str | None = "2bcb0688de6c"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # Los tokens emitidos antes de la migración no llevan "ver" y se leen como versión 0
+    op.add_column(
+        "users",
+        sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "token_version")
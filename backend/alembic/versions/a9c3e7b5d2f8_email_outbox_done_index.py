@@ -0,0 +1,36 @@
+"""email_outbox: partial index on delivered/failed rows for the relay purge
+
+Revision ID: a9c3e7b5d2f8
+Revises: d2e6a9c4f1b7
+Create Date: 2026-10-19 11:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a9c3e7b5d2f8"
+down_revision: str | None = "d2e6a9c4f1b7"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_email_outbox_done",
+            "email_outbox",
+            ["created_at"],
+            postgresql_where=sa.text("status <> 'pending'"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_email_outbox_done", table_name="email_outbox", postgresql_concurrently=True
+        )
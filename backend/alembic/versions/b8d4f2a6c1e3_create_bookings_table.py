@@ -0,0 +1,55 @@
+"""bookings table with per-passenger idempotency keys
+
+Revision ID: b8d4f2a6c1e3
+Revises: a3c9e5f1b7d2
+Create Date: 2026-10-18 20:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b8d4f2a6c1e3"
+down_revision: str | None = "a3c9e5f1b7d2"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bookings",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "ride_id", sa.Integer(), sa.ForeignKey("rides.id", ondelete="CASCADE"), nullable=False
+        ),
+        sa.Column(
+            "passenger_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("seats", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("confirmed", "cancelled", name="bookingstatus"),
+            nullable=False,
+            server_default="confirmed",
+        ),
+        sa.Column("idempotency_key", sa.String(length=64), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.UniqueConstraint(
+            "passenger_id", "idempotency_key", name="uq_bookings_passenger_idempotency_key"
+        ),
+    )
+    op.create_index("ix_bookings_ride_id", "bookings", ["ride_id"])
+    op.create_index("ix_bookings_passenger_id", "bookings", ["passenger_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bookings_passenger_id", table_name="bookings")
+    op.drop_index("ix_bookings_ride_id", table_name="bookings")
+    op.drop_table("bookings")
+    sa.Enum(name="bookingstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,46 @@
+"""email_codes: partial index for pending lookups and index on expires_at
+
+Revision ID: c7f2a9e4b813
+Revises: b5d93f1e7a24
+Create Date: 2026-10-18 13:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c7f2a9e4b813"
+down_revision: str | None = "b5d93f1e7a24"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY no puede ir dentro de una transacción; así no se bloquean las escrituras
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_email_codes_pending",
+            "email_codes",
+            ["email", "purpose", "created_at"],
+            postgresql_where=sa.text("NOT consumed"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_email_codes_expires_at",
+            "email_codes",
+            ["expires_at"],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_email_codes_expires_at", table_name="email_codes", postgresql_concurrently=True
+        )
+        op.drop_index(
+            "ix_email_codes_pending", table_name="email_codes", postgresql_concurrently=True
+        )
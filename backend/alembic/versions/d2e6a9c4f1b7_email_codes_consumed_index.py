@@ -0,0 +1,36 @@
+"""email_codes: partial index on consumed codes for the sweeper
+
+Revision ID: d2e6a9c4f1b7
+Revises: f4a8c2e6b1d9
+Create Date: 2026-10-19 10:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2e6a9c4f1b7"
+down_revision: str | None = "f4a8c2e6b1d9"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_email_codes_consumed",
+            "email_codes",
+            ["id"],
+            postgresql_where=sa.text("consumed"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_email_codes_consumed", table_name="email_codes", postgresql_concurrently=True
+        )
@@ -0,0 +1,28 @@
+"""users.avatar_url index for avatar reference counting
+
+Revision ID: d2e8b4a6c915
+Revises: c7f2a9e4b813
+Create Date: 2026-10-18 15:00:00
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2e8b4a6c915"
+down_revision: str | None = "c7f2a9e4b813"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_avatar_url", "users", ["avatar_url"], postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_users_avatar_url", table_name="users", postgresql_concurrently=True)
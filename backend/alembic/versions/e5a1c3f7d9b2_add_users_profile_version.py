@@ -0,0 +1,29 @@
+"""add users.profile_version for profile ETags
+
+Revision ID: e5a1c3f7d9b2
+Revises: d2e8b4a6c915
+Create Date: 2026-10-18 16:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a1c3f7d9b2"
+down_revision: str | None = "d2e8b4a6c915"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "users",
+        sa.Column("profile_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "profile_version")
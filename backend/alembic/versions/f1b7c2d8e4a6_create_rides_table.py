@@ -0,0 +1,64 @@
+"""rides table with cell + departure index for nearby search
+
+Revision ID: f1b7c2d8e4a6
+Revises: e5a1c3f7d9b2
+Create Date: 2026-10-18 18:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f1b7c2d8e4a6"
+down_revision: str | None = "e5a1c3f7d9b2"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rides",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column(
+            "driver_id",
+            sa.Integer(),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("university", sa.String(length=150), nullable=False),
+        sa.Column("origin_lat", sa.Float(), nullable=False),
+        sa.Column("origin_lon", sa.Float(), nullable=False),
+        sa.Column("origin_label", sa.String(length=200), nullable=True),
+        sa.Column("origin_cell", sa.BigInteger(), nullable=False),
+        sa.Column("dest_lat", sa.Float(), nullable=False),
+        sa.Column("dest_lon", sa.Float(), nullable=False),
+        sa.Column("dest_label", sa.String(length=200), nullable=True),
+        sa.Column("departure_earliest", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("departure_latest", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("seats_total", sa.Integer(), nullable=False),
+        sa.Column("seats_left", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("active", "cancelled", name="ridestatus"),
+            nullable=False,
+            server_default="active",
+        ),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_rides_driver_id", "rides", ["driver_id"])
+    op.create_index(
+        "ix_rides_active_cell_departure",
+        "rides",
+        ["origin_cell", "departure_earliest"],
+        postgresql_where=sa.text("status = 'active'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_rides_active_cell_departure", table_name="rides")
+    op.drop_index("ix_rides_driver_id", table_name="rides")
+    op.drop_table("rides")
+    sa.Enum(name="ridestatus").drop(op.get_bind(), checkfirst=True)
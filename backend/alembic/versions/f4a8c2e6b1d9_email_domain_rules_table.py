@@ -0,0 +1,31 @@
+"""email_domain_rules: registration domain rules reloaded without restart
+
+Revision ID: f4a8c2e6b1d9
+Revises: b8d4f2a6c1e3
+Create Date: 2026-10-18 23:00:00
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f4a8c2e6b1d9"
+down_revision: str | None = "b8d4f2a6c1e3"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "email_domain_rules",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("rule", sa.String(length=255), nullable=False, unique=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("email_domain_rules")
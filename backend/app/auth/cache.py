@@ -0,0 +1,266 @@
+"""
+Cachés del módulo de auth.
+
+LoginCache recuerda durante unos segundos que un par email+contraseña ya se verificó con
+bcrypt contra el password_hash actual, para que los reintentos de login desde varios
+dispositivos no repitan ~250 ms de CPU. La clave es un HMAC (nunca la contraseña) y cada
+entrada guarda la huella de password_hash/is_active/is_verified: si cualquiera cambia, la
+entrada deja de valer.
+
+UserCache guarda snapshots de usuario por id para el modo AUTH_STATELESS: las lecturas
+autenticadas se resuelven con el JWT y el snapshot, sin consultar la BD. Cualquier commit
+que modifique un User lo invalida (en memoria o en Redis si se comparte entre workers).
+El stack async (DB_ASYNC) usa aget/aset/ainvalidate: con Redis van por redis.asyncio y no
+bloquean el event loop.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+from dataclasses import asdict, dataclass, field, replace
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.auth.models import User
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import LOGIN_CACHE_REQUESTS, USER_CACHE_REQUESTS
+
+
+def _fingerprint(user: User) -> tuple[str, bool, bool]:
+    return (user.password_hash, bool(user.is_active), bool(user.is_verified))
+
+
+class LoginCache:
+    def __init__(self, enabled: bool, maxsize: int, ttl: float, secret: str):
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._secret = secret.encode()
+
+    def _key(self, email: str, password: str) -> bytes:
+        msg = f"{email.lower()}\0{password}".encode()
+        return hmac.new(self._secret, msg, hashlib.sha256).digest()
+
+    def check(self, user: User, password: str) -> bool:
+        """
+        True si este email+contraseña ya se verificó contra el estado actual del usuario.
+        """
+        if not self.enabled:
+            return False
+        hit = self._cache.get(self._key(user.email, password)) == _fingerprint(user)
+        LOGIN_CACHE_REQUESTS.labels("hit" if hit else "miss").inc()
+        return hit
+
+    def remember(self, user: User, password: str) -> None:
+        if self.enabled:
+            self._cache.set(self._key(user.email, password), _fingerprint(user))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+login_cache = LoginCache(
+    enabled=settings.login_cache_enabled,
+    maxsize=settings.login_cache_max_entries,
+    ttl=settings.login_cache_ttl_seconds,
+    secret=settings.secret_key,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    id: int
+    email: str
+    is_active: bool
+    is_verified: bool
+    token_version: int
+    full_name: str | None = None
+    university: str | None = None
+    degree: str | None = None
+    course: int | None = None
+    ride_intent: str | None = None
+    avatar_url: str | None = None
+    profile_version: int = 0
+    # True si se leyó de la BD en esta petición; lo que sale de la caché puede ir por detrás
+    # de otro worker (ver profile.service.patch_profile)
+    fresh: bool = field(default=False, compare=False)
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        ride = user.ride_intent.value if hasattr(user.ride_intent, "value") else user.ride_intent
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            token_version=user.token_version or 0,
+            full_name=user.full_name,
+            university=user.university,
+            degree=user.degree,
+            course=user.course,
+            ride_intent=ride,
+            avatar_url=user.avatar_url,
+            profile_version=user.profile_version or 0,
+            fresh=True,
+        )
+
+
+class MemoryUserStore:
+    blocking = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id: int) -> UserSnapshot | None:
+        return self._cache.get(user_id)
+
+    def set(self, snap: UserSnapshot) -> None:
+        self._cache.set(snap.id, snap)
+
+    def delete(self, user_id: int) -> None:
+        self._cache.pop(user_id)
+
+    # Sin E/S: las versiones async solo comparten interfaz con RedisUserStore
+    async def aget(self, user_id: int) -> UserSnapshot | None:
+        return self.get(user_id)
+
+    async def aset(self, snap: UserSnapshot) -> None:
+        self.set(snap)
+
+    async def adelete(self, user_id: int) -> None:
+        self.delete(user_id)
+
+
+class RedisUserStore:
+    """
+    Snapshots compartidos entre workers; la invalidación de un worker la ven todos.
+    """
+
+    blocking = True
+
+    def __init__(self, url: str, ttl: float, prefix: str = "unigo:user:"):
+        # dependencia opcional, solo con USER_CACHE_BACKEND=redis
+        import redis
+        import redis.asyncio
+
+        self._redis = redis.Redis.from_url(url)
+        # Cliente async para el stack DB_ASYNC: el síncrono bloquearía el event loop
+        self._aredis = redis.asyncio.Redis.from_url(url)
+        self._ttl = int(ttl)
+        self._prefix = prefix
+
+    @staticmethod
+    def _load(raw: bytes | None) -> UserSnapshot | None:
+        return UserSnapshot(**json.loads(raw)) if raw else None
+
+    def get(self, user_id: int) -> UserSnapshot | None:
+        return self._load(self._redis.get(f"{self._prefix}{user_id}"))
+
+    def set(self, snap: UserSnapshot) -> None:
+        self._redis.set(f"{self._prefix}{snap.id}", json.dumps(asdict(snap)), ex=self._ttl)
+
+    def delete(self, user_id: int) -> None:
+        self._redis.delete(f"{self._prefix}{user_id}")
+
+    async def aget(self, user_id: int) -> UserSnapshot | None:
+        return self._load(await self._aredis.get(f"{self._prefix}{user_id}"))
+
+    async def aset(self, snap: UserSnapshot) -> None:
+        await self._aredis.set(f"{self._prefix}{snap.id}", json.dumps(asdict(snap)), ex=self._ttl)
+
+    async def adelete(self, user_id: int) -> None:
+        await self._aredis.delete(f"{self._prefix}{user_id}")
+
+
+class UserCache:
+    def __init__(self, store: MemoryUserStore | RedisUserStore):
+        self.store = store
+        self._pending: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _count(snap: UserSnapshot | None) -> UserSnapshot | None:
+        USER_CACHE_REQUESTS.labels("miss" if snap is None else "hit").inc()
+        return snap
+
+    def get(self, user_id: int) -> UserSnapshot | None:
+        return self._count(self.store.get(user_id))
+
+    def set(self, snap: UserSnapshot) -> None:
+        self.store.set(replace(snap, fresh=False))
+
+    def invalidate(self, user_id: int) -> None:
+        self.store.delete(user_id)
+
+    async def aget(self, user_id: int) -> UserSnapshot | None:
+        return self._count(await self.store.aget(user_id))
+
+    async def aset(self, snap: UserSnapshot) -> None:
+        await self.store.aset(replace(snap, fresh=False))
+
+    async def ainvalidate(self, user_id: int) -> None:
+        await self.store.adelete(user_id)
+
+    def invalidate_from_loop(self, user_ids) -> None:
+        """
+        Invalidación desde código síncrono que corre en el hilo del event loop (los eventos
+        de sesión de un AsyncSession). Con Redis se encarga a una tarea en vez de bloquear.
+        """
+        if not self.store.blocking:
+            for user_id in user_ids:
+                self.invalidate(user_id)
+            return
+        for user_id in user_ids:
+            task = asyncio.get_running_loop().create_task(self.ainvalidate(user_id))
+            self._pending.add(task)  # el loop solo guarda referencias débiles
+            task.add_done_callback(self._pending.discard)
+
+
+def _build_user_store() -> MemoryUserStore | RedisUserStore:
+    if settings.user_cache_backend == "redis":
+        return RedisUserStore(settings.redis_url, ttl=settings.user_cache_ttl_seconds)
+    return MemoryUserStore(
+        maxsize=settings.user_cache_max_entries, ttl=settings.user_cache_ttl_seconds
+    )
+
+
+user_cache = UserCache(_build_user_store())
+
+_DIRTY_USERS = "unigo_dirty_user_ids"
+
+
+def mark_user_dirty(session: Session, user_id: int) -> None:
+    """
+    Invalida el snapshot de user_id cuando la sesión haga commit. Los UPDATE de Core (sin
+    pasar por el ORM) tienen que llamarla a mano.
+    """
+    session.info.setdefault(_DIRTY_USERS, set()).add(user_id)
+
+
+@event.listens_for(User, "after_update")
+def _mark_user_dirty(mapper, connection, target: User) -> None:
+    session = object_session(target)
+    if session is not None:
+        mark_user_dirty(session, target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_dirty_users(session: Session) -> None:
+    # Solo tras el commit: invalidar antes dejaría recachear el estado viejo
+    user_ids = session.info.pop(_DIRTY_USERS, ())
+    if not user_ids:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        for user_id in user_ids:
+            user_cache.invalidate(user_id)
+    else:
+        # AsyncSession: el commit síncrono corre en el hilo del event loop (greenlet)
+        user_cache.invalidate_from_loop(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_dirty_users(session: Session) -> None:
+    session.info.pop(_DIRTY_USERS, None)
@@ -0,0 +1,176 @@
+"""
+Política de dominios de email para el registro.
+
+Las reglas se compilan en un trie de etiquetas invertidas ("alumnos.ugr.es" -> es, ugr,
+alumnos), así que comprobar un dominio cuesta lo que sus etiquetas y no lo que la lista.
+
+Formato de una regla (ALLOWED_EMAIL_DOMAINS, fichero o tabla email_domain_rules):
+
+- "ugr.es": permite ugr.es y todos sus subdominios.
+- "!ext.ugr.es": deniega ext.ugr.es y sus subdominios.
+- "*" ocupa exactamente una etiqueta: "*.ugr.es" son los subdominios (no ugr.es) y
+  "alumnos.*.es" vale para alumnos.ugr.es, alumnos.ual.es...
+
+Gana la regla más específica (más etiquetas; a igualdad, más etiquetas literales) y, si
+empatan, la de denegar. Sin ninguna regla que case: se deniega si hay alguna regla de
+permitir y se permite si no (lista vacía = sin restricción, como hasta ahora).
+
+EmailDomains recarga cada EMAIL_DOMAINS_RELOAD_SECONDS las reglas de EMAIL_DOMAINS_FILE y,
+con EMAIL_DOMAINS_TABLE, de la tabla, sin reiniciar. Una lista con errores no se aplica: se
+registra el fallo y se sigue con la anterior.
+"""
+
+import asyncio
+import logging
+import re
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.auth.models import EmailDomainRule
+from app.core.config import settings
+from app.core.metrics import EMAIL_DOMAIN_RULES
+from app.db.session import SessionLocal
+
+log = logging.getLogger("auth.domains")
+
+_LABEL = re.compile(r"\*|[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?")
+# Clave del nodo que guarda la acción; nunca choca con una etiqueta (no hay etiquetas vacías)
+_ACTION = ""
+
+
+def parse_rule(rule: str) -> tuple[bool, list[str]]:
+    """
+    "!ext.ugr.es" -> (False, ["ext", "ugr", "es"]). ValueError si no es un dominio válido.
+    """
+    text = rule.strip().lower()
+    allow = not text.startswith("!")
+    labels = text.lstrip("!").strip().strip(".").split(".")
+    if not all(_LABEL.fullmatch(label) for label in labels) or labels == ["*"]:
+        raise ValueError(f"Regla de dominio inválida: {rule!r}")
+    return allow, labels
+
+
+class DomainPolicy:
+    def __init__(self, rules: Iterable[str] = ()):
+        self._root: dict = {}
+        self.size = 0
+        has_allow = False
+        for rule in rules:
+            allow, labels = parse_rule(rule)
+            node = self._root
+            for label in reversed(labels):
+                node = node.setdefault(label, {})
+            # La misma regla con los dos signos: gana denegar
+            node[_ACTION] = node.get(_ACTION, True) and allow
+            has_allow |= allow
+            self.size += 1
+        self._default = not has_allow
+
+    def allows(self, domain: str) -> bool:
+        labels = domain.lower().rstrip(".").split(".")
+        labels.reverse()
+        best = None  # (etiquetas, etiquetas literales, deniega)
+        stack = [(self._root, 0, 0)]
+        while stack:
+            node, depth, literal = stack.pop()
+            action = node.get(_ACTION)
+            if action is not None:
+                key = (depth, literal, not action)
+                if best is None or key > best:
+                    best = key
+            if depth < len(labels):
+                child = node.get(labels[depth])
+                if child is not None:
+                    stack.append((child, depth + 1, literal + 1))
+                child = node.get("*")
+                if child is not None:
+                    stack.append((child, depth + 1, literal))
+        return self._default if best is None else not best[2]
+
+
+def read_rules_file(path: str) -> list[str]:
+    """
+    Una regla por línea; se ignoran las vacías y lo que va tras "#".
+    """
+    lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [rule for line in lines if (rule := line.split("#", 1)[0].strip())]
+
+
+class EmailDomains:
+    def __init__(
+        self,
+        static_rules: list[str],
+        path: str = "",
+        table: bool = False,
+        reload_seconds: float = 30.0,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.static_rules = static_rules
+        self.path = path
+        self.table = table
+        self.reload_seconds = reload_seconds
+        self.session_factory = session_factory
+        # Se sustituye entera en cada recarga: las lecturas no necesitan lock
+        self.policy = DomainPolicy(static_rules)
+        self._task: asyncio.Task | None = None
+        EMAIL_DOMAIN_RULES.set(self.policy.size)
+
+    @property
+    def dynamic(self) -> bool:
+        return bool(self.path or self.table)
+
+    def allows(self, domain: str) -> bool:
+        return self.policy.allows(domain)
+
+    def load_rules(self) -> list[str]:
+        rules = list(self.static_rules)
+        if self.path:
+            rules += read_rules_file(self.path)
+        if self.table:
+            with self.session_factory() as db:
+                rules += db.scalars(select(EmailDomainRule.rule)).all()
+        return rules
+
+    def reload(self) -> bool:
+        """
+        Recompila la política. Si el fichero, la tabla o alguna regla fallan, se mantiene la
+        anterior y devuelve False.
+        """
+        try:
+            policy = DomainPolicy(self.load_rules())
+        except (OSError, SQLAlchemyError, ValueError) as err:
+            log.warning("No se recargan los dominios de email: %s", err)
+            return False
+        self.policy = policy
+        EMAIL_DOMAIN_RULES.set(policy.size)
+        return True
+
+    async def start(self) -> None:
+        # La primera carga antes de servir: el fichero y la tabla aplican desde el arranque
+        await run_in_threadpool(self.reload)
+        self._task = asyncio.create_task(self._loop(), name="email-domains-reload")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            await run_in_threadpool(self.reload)
+
+
+email_domains = EmailDomains(
+    static_rules=settings.allowed_email_domains,
+    path=settings.email_domains_file,
+    table=settings.email_domains_table,
+    reload_seconds=settings.email_domains_reload_seconds,
+)
@@ -1,7 +1,18 @@
 import enum
 from datetime import UTC, datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Enum, Integer, String
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    Index,
+    Integer,
+    String,
+    event,
+    inspect,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.db.session import Base
@@ -25,21 +36,77 @@ class User(Base):
     degree = Column(String(150), nullable=True)
     course = Column(Integer, nullable=True)
     ride_intent = Column(Enum(RideIntent), nullable=True)
-    avatar_url = Column(String(300), nullable=True)
+    # Indexado: el GC de avatares cuenta referencias por URL
+    avatar_url = Column(String(300), nullable=True, index=True)
+    # Se incrementa al cambiar la contraseña o desactivar la cuenta: invalida los JWT emitidos
+    token_version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Se incrementa con cada cambio de PROFILE_FIELDS: ETag de /api/me/profile
+    profile_version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
     )
 
 
+PROFILE_FIELDS = ("full_name", "university", "degree", "course", "ride_intent", "avatar_url")
+
+
+@event.listens_for(User, "before_update")
+def _bump_versions(mapper, connection, target: User) -> None:
+    state = inspect(target)
+    password_changed = state.attrs.password_hash.history.has_changes()
+    deactivated = state.attrs.is_active.history.has_changes() and not target.is_active
+    if password_changed or deactivated:
+        target.token_version = (target.token_version or 0) + 1
+    # has_changes() es False si se asigna el mismo valor: un PUT idéntico no cambia el ETag
+    if any(getattr(state.attrs, f).history.has_changes() for f in PROFILE_FIELDS):
+        target.profile_version = (target.profile_version or 0) + 1
+
+
 class EmailCode(Base):
     __tablename__ = "email_codes"
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     email: Mapped[str] = mapped_column(String(255), index=True, nullable=False)
     code: Mapped[str] = mapped_column(String(10), nullable=False)
     purpose: Mapped[str] = mapped_column(String(50), default="verify_email", nullable=False)
-    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # Indexado para el barrido de códigos caducados
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), index=True, nullable=False
+    )
     consumed: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
     )
+
+    __table_args__ = (
+        # verify_email: último código no consumido de (email, purpose)
+        Index(
+            "ix_email_codes_pending",
+            "email",
+            "purpose",
+            "created_at",
+            postgresql_where=text("NOT consumed"),
+            sqlite_where=text("NOT consumed"),
+        ),
+        # Barrido de los ya consumidos (app/auth/sweeper.py)
+        Index(
+            "ix_email_codes_consumed",
+            "id",
+            postgresql_where=text("consumed"),
+            sqlite_where=text("consumed"),
+        ),
+    )
+
+
+class EmailDomainRule(Base):
+    """
+    Reglas extra de dominios de email (EMAIL_DOMAINS_TABLE), con el formato de
+    app/auth/domains.py: "ugr.es", "!ext.ugr.es", "*.ual.es". Se aplican sin reiniciar.
+    """
+
+    __tablename__ = "email_domain_rules"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    rule: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
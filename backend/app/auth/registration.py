@@ -0,0 +1,105 @@
+"""
+Sentencias de alta de usuario.
+
+En PostgreSQL el registro completo es UNA sentencia: un CTE que inserta el usuario con
+ON CONFLICT (email) DO NOTHING RETURNING id y, solo si se insertó, el EmailCode (y la fila de
+email_outbox si MAIL_OUTBOX_TABLE está activo). El índice único de users.email resuelve la
+carrera entre registros simultáneos; si el email ya existía la sentencia no devuelve filas.
+En otros dialectos (SQLite en tests) se hace INSERT ... ON CONFLICT + INSERT en una sola
+transacción.
+"""
+
+import secrets
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import Insert, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.auth.models import EmailCode, User
+from app.core.config import settings
+from app.core.mailer import build_verification_message
+from app.mail.models import EmailOutbox
+
+_CODE_COLUMNS = ("email", "code", "purpose", "expires_at", "consumed", "attempts", "created_at")
+_OUTBOX_COLUMNS = (
+    "kind",
+    "to_email",
+    "subject",
+    "body",
+    "status",
+    "attempts",
+    "next_attempt_at",
+    "created_at",
+)
+
+
+def build_email_code(
+    email: str, purpose: str = "verify_email"
+) -> tuple[EmailCode, EmailOutbox | None]:
+    """
+    Genera el código de 6 dígitos y, con MAIL_OUTBOX_TABLE, su email pendiente (si no, None).
+    Los objetos NO se añaden a la sesión.
+    """
+    now = datetime.now(UTC)
+    rec = EmailCode(
+        email=email,
+        code=f"{secrets.randbelow(10**6):06d}",  # 6 dígitos, con ceros a la izquierda
+        purpose=purpose,
+        expires_at=now + timedelta(minutes=settings.email_code_expire_minutes),
+        consumed=False,
+        attempts=0,
+        created_at=now,
+    )
+    outbox = None
+    if settings.mail_outbox_table:
+        msg = build_verification_message(to_email=email, code=rec.code)
+        outbox = EmailOutbox.from_message(purpose, msg)
+        outbox.status, outbox.attempts = "pending", 0
+        outbox.next_attempt_at = outbox.created_at = now
+    return rec, outbox
+
+
+def insert_user(dialect: str, email: str, password_hash: str) -> Insert:
+    """
+    INSERT del usuario que no falla si el email existe: RETURNING id vacío en ese caso.
+    """
+    dml = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    # Valores explícitos: los defaults de Python no se aplican dentro de un CTE
+    return (
+        dml(User)
+        .values(
+            email=email,
+            password_hash=password_hash,
+            is_active=True,
+            is_verified=False,
+            token_version=0,
+            profile_version=0,
+            created_at=datetime.now(UTC),
+        )
+        .on_conflict_do_nothing(index_elements=[User.email])
+        .returning(User.id)
+    )
+
+
+def _values(obj, columns: tuple[str, ...]):
+    return select(*(literal(getattr(obj, c), type_=obj.__table__.c[c].type) for c in columns))
+
+
+def registration_statement(
+    email: str, password_hash: str, rec: EmailCode, outbox: EmailOutbox | None
+) -> Insert:
+    """
+    Sentencia única (PostgreSQL) usuario + código (+ outbox). Devuelve una fila si se creó.
+    """
+    new_user = insert_user("postgresql", email, password_hash).cte("new_user")
+    new_code = insert(EmailCode).from_select(
+        _CODE_COLUMNS, _values(rec, _CODE_COLUMNS).select_from(new_user)
+    )
+    if outbox is None:
+        return new_code.returning(EmailCode.id)
+    code_cte = new_code.returning(EmailCode.id).cte("new_code")
+    return (
+        insert(EmailOutbox)
+        .from_select(_OUTBOX_COLUMNS, _values(outbox, _OUTBOX_COLUMNS).select_from(code_cte))
+        .returning(EmailOutbox.id)
+    )
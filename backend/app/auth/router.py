@@ -1,14 +1,26 @@
 # backend/app/auth/router.py
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Response,
+    WebSocket,
+    WebSocketException,
+    status,
+)
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
+from jose import JWTError
 from sqlalchemy.orm import Session
 
 from app.auth import service
+from app.auth.cache import UserSnapshot, user_cache
 from app.auth.models import User
-from app.auth.schemas import Token, UserCreate, UserLogin, UserOut, VerifyEmail
+from app.auth.schemas import ResendCode, Token, UserCreate, UserLogin, UserOut, VerifyEmail
 from app.core.config import settings
-from app.core.mailer import send_verification_email
+from app.core.mail_outbox import queue_verification_email
+from app.core.ratelimit import rate_limited
+from app.core.security import decode_access_token
 from app.db.session import get_db
 
 # Nota: este router ya incluye el prefijo /api; en main.py se debe incluir SIN prefijo adicional.
@@ -17,8 +29,20 @@ router = APIRouter(prefix="/api/auth", tags=["auth"])
 # OAuth2PasswordBearer lo usamos para extraer el Bearer token del Authorization header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Token bucket por IP y por email (app/core/ratelimit.py): se rechaza antes de tocar BD o bcrypt
+limit_register = rate_limited(
+    "register", settings.rate_limit_register_ip, settings.rate_limit_register_email
+)
+limit_verify = rate_limited(
+    "verify", settings.rate_limit_verify_ip, settings.rate_limit_verify_email
+)
+limit_resend = rate_limited(
+    "resend", settings.rate_limit_resend_ip, settings.rate_limit_resend_email
+)
+limit_login = rate_limited("login", settings.rate_limit_login_ip, settings.rate_limit_login_email)
 
-@router.post("/register", status_code=204)
+
+@router.post("/register", status_code=204, dependencies=[Depends(limit_register)])
 def register_user(
     data: UserCreate,
     bg: BackgroundTasks,
@@ -26,16 +50,27 @@ def register_user(
 ) -> Response:
     """
     Crea/actualiza usuario y genera un código de verificación.
-    Envía el email en segundo plano (mailer síncrono con kwargs).
+    El email se encola en el outbox async (o BackgroundTask si no está activo).
     """
     code = service.register(db, data)  # debe devolver el string de 6 dígitos
 
     # ⚠️ IMPORTANTE: pasar argumentos por nombre (la función no acepta posicionales)
-    bg.add_task(send_verification_email, to_email=data.email, code=code)
+    queue_verification_email(bg, to_email=data.email, code=code)
     return Response(status_code=204)
 
 
-@router.post("/verify", status_code=204)
+@router.post("/resend", status_code=204, dependencies=[Depends(limit_resend)])
+def resend_code(data: ResendCode, bg: BackgroundTasks, db: Session = Depends(get_db)) -> Response:
+    """
+    Envía un código nuevo si la cuenta existe y no está verificada; responde 204 siempre.
+    """
+    code = service.resend_code(db, data.email)
+    if code is not None:
+        queue_verification_email(bg, to_email=data.email, code=code)
+    return Response(status_code=204)
+
+
+@router.post("/verify", status_code=204, dependencies=[Depends(limit_verify)])
 def verify_user(payload: VerifyEmail, db: Session = Depends(get_db)) -> Response:
     """
     Verifica el email con el código recibido.
@@ -44,7 +79,7 @@ def verify_user(payload: VerifyEmail, db: Session = Depends(get_db)) -> Response
     return Response(status_code=204)
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(limit_login)])
 def login_user(payload: UserLogin, db: Session = Depends(get_db)) -> Token:
     """
     Login con email + contraseña. Devuelve un JWT si son correctos.
@@ -53,33 +88,122 @@ def login_user(payload: UserLogin, db: Session = Depends(get_db)) -> Token:
     return {"access_token": token, "token_type": "bearer"}
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
-    """
-    Extrae el usuario actual a partir del Bearer token.
-    """
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def token_identity(token: str) -> tuple[int, int]:
+    """
+    Valida el JWT y devuelve (user_id, token_version).
+    """
     try:
-        data = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
+        data = decode_access_token(token)
         sub = data.get("sub")
         if not sub:
-            raise credentials_exception
-        user = db.get(User, int(sub))
+            raise _credentials_exception()
+        return int(sub), int(data.get("ver", 0))
+    except (JWTError, ValueError):
+        raise _credentials_exception() from None
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> User:
+    """
+    Extrae el usuario actual a partir del Bearer token.
+    """
+    user_id, version = token_identity(token)
+    user = db.get(User, user_id)
+    if not user or user.token_version != version:
+        raise _credentials_exception()
+    return user
+
+
+def current_snapshot(token: str, db: Session) -> UserSnapshot:
+    """
+    Usuario del token como snapshot.
+    Con AUTH_STATELESS sale de la caché de snapshots y no toca la BD (la sesión es perezosa).
+    """
+    user_id, version = token_identity(token)
+    snap = user_cache.get(user_id) if settings.auth_stateless else None
+    if snap is None or snap.token_version < version:
+        user = db.get(User, user_id)
         if not user:
-            raise credentials_exception
-        return user
-    except JWTError:
-        raise credentials_exception from None
+            raise _credentials_exception()
+        snap = UserSnapshot.from_user(user)
+        # El snapshot no depende de la sesión: se devuelve ya la conexión al pool. Si no, con
+        # muchas peticiones a la vez cada hilo retiene una conexión mientras espera hilo para
+        # el endpoint y el pool se agota (QueuePool timeout).
+        db.rollback()
+        if settings.auth_stateless:
+            user_cache.set(snap)
+    if snap.token_version != version:
+        raise _credentials_exception()
+    return snap
+
+
+def get_current_snapshot(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> UserSnapshot:
+    """
+    Usuario actual para endpoints de solo lectura.
+    """
+    return current_snapshot(token, db)
+
+
+# Subprotocolo que precede al token en Sec-WebSocket-Protocol:
+#   new WebSocket(url, ["unigo.bearer", jwt])
+WS_AUTH_PROTOCOL = "unigo.bearer"
+
+
+def websocket_token(websocket: WebSocket) -> str:
+    """
+    Bearer token de un WebSocket. El navegador no puede poner cabeceras al abrirlo, así que
+    se acepta también como segundo subprotocolo tras WS_AUTH_PROTOCOL. Nunca en la URL: acaba
+    en los access logs de uvicorn y de los proxies.
+    """
+    scheme, _, value = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and value:
+        return value
+    protocols = websocket.scope.get("subprotocols", [])
+    if WS_AUTH_PROTOCOL in protocols[:-1]:
+        return protocols[protocols.index(WS_AUTH_PROTOCOL) + 1]
+    raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+
+
+def get_websocket_snapshot(
+    token: str = Depends(websocket_token),
+    db: Session = Depends(get_db),
+) -> UserSnapshot:
+    """
+    get_current_snapshot para WebSockets: sin credenciales válidas se cierra con 1008.
+    """
+    try:
+        return current_snapshot(token, db)
+    except HTTPException:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION) from None
+
+
+def token_still_valid(token: str, db: Session) -> bool:
+    """
+    Para conexiones largas: False si el token caducó o se revocó (token_version) después
+    del handshake.
+    """
+    try:
+        current_snapshot(token, db)
+    except HTTPException:
+        return False
+    return True
 
 
 @router.get("/me", response_model=UserOut)
-def me(current: User = Depends(get_current_user)) -> UserOut:
+def me(current: UserSnapshot = Depends(get_current_snapshot)) -> UserOut:
     """
     Devuelve los datos públicos del usuario autenticado.
     """
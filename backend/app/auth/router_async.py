@@ -0,0 +1,154 @@
+# backend/app/auth/router_async.py
+# Variante de app.auth.router para DB_ASYNC=true: mismas rutas, handlers async con AsyncSession.
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Response,
+    WebSocketException,
+    status,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import service_async as service
+from app.auth.cache import UserSnapshot, user_cache
+from app.auth.models import User
+from app.auth.router import (
+    _credentials_exception,
+    limit_login,
+    limit_register,
+    limit_resend,
+    limit_verify,
+    oauth2_scheme,
+    token_identity,
+    websocket_token,
+)
+from app.auth.schemas import ResendCode, Token, UserCreate, UserLogin, UserOut, VerifyEmail
+from app.core.config import settings
+from app.core.mail_outbox import queue_verification_email
+from app.db.session import get_async_db
+
+router = APIRouter(prefix="/api/auth", tags=["auth"])
+
+
+@router.post("/register", status_code=204, dependencies=[Depends(limit_register)])
+async def register_user(
+    data: UserCreate,
+    bg: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+) -> Response:
+    """
+    Crea/actualiza usuario y genera un código de verificación.
+    El email se encola en el outbox async (o BackgroundTask si no está activo).
+    """
+    code = await service.register(db, data)
+    queue_verification_email(bg, to_email=data.email, code=code)
+    return Response(status_code=204)
+
+
+@router.post("/resend", status_code=204, dependencies=[Depends(limit_resend)])
+async def resend_code(
+    data: ResendCode, bg: BackgroundTasks, db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    """
+    Envía un código nuevo si la cuenta existe y no está verificada; responde 204 siempre.
+    """
+    code = await service.resend_code(db, data.email)
+    if code is not None:
+        queue_verification_email(bg, to_email=data.email, code=code)
+    return Response(status_code=204)
+
+
+@router.post("/verify", status_code=204, dependencies=[Depends(limit_verify)])
+async def verify_user(payload: VerifyEmail, db: AsyncSession = Depends(get_async_db)) -> Response:
+    """
+    Verifica el email con el código recibido.
+    """
+    await service.verify_email(db, payload.email, payload.code)
+    return Response(status_code=204)
+
+
+@router.post("/login", response_model=Token, dependencies=[Depends(limit_login)])
+async def login_user(payload: UserLogin, db: AsyncSession = Depends(get_async_db)) -> Token:
+    """
+    Login con email + contraseña. Devuelve un JWT si son correctos.
+    """
+    token = await service.login(db, payload.email, payload.password)
+    return {"access_token": token, "token_type": "bearer"}
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> User:
+    """
+    Extrae el usuario actual a partir del Bearer token.
+    """
+    user_id, version = token_identity(token)
+    user = await db.get(User, user_id)
+    if not user or user.token_version != version:
+        raise _credentials_exception()
+    return user
+
+
+async def current_snapshot(token: str, db: AsyncSession) -> UserSnapshot:
+    """
+    Usuario del token como snapshot (ver app.auth.router.current_snapshot).
+    """
+    user_id, version = token_identity(token)
+    snap = await user_cache.aget(user_id) if settings.auth_stateless else None
+    if snap is None or snap.token_version < version:
+        user = await db.get(User, user_id)
+        if not user:
+            raise _credentials_exception()
+        snap = UserSnapshot.from_user(user)
+        # Devuelve la conexión: un WebSocket mantiene viva la sesión mientras dura
+        await db.rollback()
+        if settings.auth_stateless:
+            await user_cache.aset(snap)
+    if snap.token_version != version:
+        raise _credentials_exception()
+    return snap
+
+
+async def get_current_snapshot(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+) -> UserSnapshot:
+    """
+    Usuario actual para endpoints de solo lectura (ver app.auth.router.get_current_snapshot).
+    """
+    return await current_snapshot(token, db)
+
+
+async def get_websocket_snapshot(
+    token: str = Depends(websocket_token),
+    db: AsyncSession = Depends(get_async_db),
+) -> UserSnapshot:
+    """
+    get_current_snapshot para WebSockets: sin credenciales válidas se cierra con 1008.
+    """
+    try:
+        return await current_snapshot(token, db)
+    except HTTPException:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION) from None
+
+
+async def token_still_valid(token: str, db: AsyncSession) -> bool:
+    """
+    Ver app.auth.router.token_still_valid.
+    """
+    try:
+        await current_snapshot(token, db)
+    except HTTPException:
+        return False
+    return True
+
+
+@router.get("/me", response_model=UserOut)
+async def me(current: UserSnapshot = Depends(get_current_snapshot)) -> UserOut:
+    """
+    Devuelve los datos públicos del usuario autenticado.
+    """
+    return current
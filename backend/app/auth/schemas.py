@@ -26,6 +26,10 @@ class UserOut(BaseModel):
         from_attributes = True
 
 
+class ResendCode(BaseModel):
+    email: EmailStr
+
+
 class VerifyEmail(BaseModel):
     email: EmailStr
     code: str = Field(min_length=6, max_length=6)
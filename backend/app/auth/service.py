@@ -1,14 +1,22 @@
-import secrets
-from datetime import UTC, datetime, timedelta
+import logging
+from datetime import UTC, datetime
 
 from fastapi import HTTPException, status
+from sqlalchemy import Update, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
+from app.auth.cache import login_cache
+from app.auth.domains import email_domains
 from app.auth.models import EmailCode, User
+from app.auth.registration import build_email_code, insert_user, registration_statement
 from app.auth.schemas import UserCreate
 from app.core.config import settings
-from app.core.security import create_access_token, hash_password, verify_password
+from app.core.hashing import hash_password, verify_password
+from app.core.profiling import phase, profiled
+from app.core.security import create_access_token
+
+log = logging.getLogger("auth")
 
 
 def _extract_domain(email: str) -> str:
@@ -17,28 +25,26 @@ def _extract_domain(email: str) -> str:
 
 
 def _is_allowed_domain(domain: str) -> bool:
-    if not settings.allowed_email_domains:
-        return True
-    # permite subdominios: alumnos.ugr.es válido si ugr.es está permitido
-    return any(domain == d or domain.endswith(f".{d}") for d in settings.allowed_email_domains)
+    # permite subdominios: alumnos.ugr.es válido si ugr.es está permitido (ver domains.py)
+    return email_domains.allows(domain)
 
 
-def _issue_email_code(db: Session, email: str, purpose: str = "verify_email") -> str:
-    """
-    Crea y persiste un código de verificación de 6 dígitos con caducidad.
-    Devuelve el código generado (string).
-    """
-    code = f"{secrets.randbelow(10**6):06d}"  # 6 dígitos, con ceros a la izquierda
-    expires_at = datetime.now(UTC) + timedelta(minutes=settings.email_code_expire_minutes)
-    db.add(EmailCode(email=email, code=code, purpose=purpose, expires_at=expires_at))
-    db.commit()
-    return code
+def _email_taken(email: str) -> HTTPException:
+    # Mensaje claro cuando el correo ya existe
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Ya existe una cuenta registrada con el correo {email}",
+    )
 
 
+@profiled("auth.register")
 def register(db: Session, data: UserCreate) -> str:
     """
     Crea el usuario (si no existe) y genera un código de verificación.
     DEVUELVE SIEMPRE el string del código para que el router lo envíe por email.
+
+    Usuario y código se escriben en una única transacción (una sola sentencia en PostgreSQL,
+    ver app.auth.registration); el índice único de users.email detecta el duplicado.
     """
     domain = _extract_domain(data.email)
     if not _is_allowed_domain(domain):
@@ -47,30 +53,92 @@ def register(db: Session, data: UserCreate) -> str:
             detail=f"El dominio de correo '{domain}' no está permitido",
         )
 
-    if db.query(User).filter(User.email == data.email).first():
-        # Mensaje claro cuando el correo ya existe
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ya existe una cuenta registrada con el correo {data.email}",
-        )
-
+    # bcrypt antes de abrir la transacción: no se retienen conexión ni locks mientras tanto
+    password_hash = hash_password(data.password)
+    rec, outbox = build_email_code(data.email)
     try:
-        user = User(email=data.email, password_hash=hash_password(data.password))
-        db.add(user)
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            stmt = registration_statement(data.email, password_hash, rec, outbox)
+            created = db.execute(stmt).scalar() is not None
+        else:
+            created = db.execute(insert_user(dialect, data.email, password_hash)).scalar()
+            if created:
+                db.add_all([r for r in (rec, outbox) if r is not None])
+        if not created:
+            db.rollback()
+            raise _email_taken(data.email)
         db.commit()
-        db.refresh(user)
-
-        # Genera y guarda el código, y DEVUÉLVELO
-        code = _issue_email_code(db, data.email)
-        # Log de ayuda en dev
-        print(f"[UniGo] Código de verificación para {data.email}: {code}")
-        return code
-
     except SQLAlchemyError as err:
         db.rollback()
         raise HTTPException(status_code=500, detail="DB error durante el registro") from err
 
+    # El código solo viaja por email: nunca a los logs
+    log.info("[UniGo] Código de verificación generado para %s", data.email)
+    return rec.code
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite devuelve las fechas sin zona horaria; se guardan siempre en UTC
+    return value if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+def attempt_statement(code_id: int) -> Update:
+    """
+    Gasta un intento del código solo si le quedan (EMAIL_CODE_MAX_ATTEMPTS). Es atómico: con
+    peticiones en paralelo no se pueden probar más códigos de los permitidos.
+    """
+    return (
+        update(EmailCode)
+        .where(EmailCode.id == code_id, EmailCode.attempts < settings.email_code_max_attempts)
+        .values(attempts=EmailCode.attempts + 1)
+        .returning(EmailCode.attempts)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _too_many_attempts() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Demasiados intentos fallidos; pide un código nuevo",
+    )
+
 
+def supersede_codes(email: str) -> Update:
+    """
+    Invalida los códigos de verificación pendientes del email (los sustituye uno nuevo).
+    """
+    return (
+        update(EmailCode)
+        .where(
+            EmailCode.email == email,
+            EmailCode.purpose == "verify_email",
+            EmailCode.consumed.is_(False),
+        )
+        .values(consumed=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+@profiled("auth.resend_code")
+def resend_code(db: Session, email: str) -> str | None:
+    """
+    Genera un código nuevo para un usuario sin verificar e invalida los anteriores (p. ej. el
+    que agotó EMAIL_CODE_MAX_ATTEMPTS). None si el email no existe o ya está verificado.
+    """
+    user = db.query(User).filter(User.email == email).first()
+    if user is None or user.is_verified:
+        db.rollback()
+        return None
+    rec, outbox = build_email_code(email)
+    db.execute(supersede_codes(email))
+    db.add_all([r for r in (rec, outbox) if r is not None])
+    db.commit()
+    log.info("[UniGo] Código de verificación reenviado a %s", email)
+    return rec.code
+
+
+@profiled("auth.verify_email")
 def verify_email(db: Session, email: str, code: str) -> None:
     rec = (
         db.query(EmailCode)
@@ -86,12 +154,13 @@ def verify_email(db: Session, email: str, code: str) -> None:
     if not rec:
         raise HTTPException(status_code=400, detail="No hay código pendiente")
 
-    now = datetime.now(UTC)
-    if rec.expires_at < now:
+    if _aware(rec.expires_at) < datetime.now(UTC):
         raise HTTPException(status_code=400, detail="Código de verificación caducado")
 
+    if db.execute(attempt_statement(rec.id)).first() is None:
+        db.rollback()
+        raise _too_many_attempts()
     if code != rec.code:
-        rec.attempts += 1
         db.commit()
         raise HTTPException(status_code=400, detail="Código de verificación inválido")
 
@@ -104,9 +173,26 @@ def verify_email(db: Session, email: str, code: str) -> None:
     db.commit()
 
 
+def token_claims(user: User) -> dict:
+    # get_current_user contrasta "ver" con token_version; desactivar al usuario lo sube
+    return {"ver": user.token_version or 0}
+
+
+def _password_ok(user: User, password: str) -> bool:
+    # Reintentos recientes con la misma contraseña se saltan bcrypt
+    if login_cache.check(user, password):
+        return True
+    ok = verify_password(password, user.password_hash)
+    if ok:
+        login_cache.remember(user, password)
+    return ok
+
+
+@profiled("auth.login")
 def login(db: Session, email: str, password: str) -> str:
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.password_hash):
+    with phase("auth.user_lookup"):
+        user = db.query(User).filter(User.email == email).first()
+    if not user or not _password_ok(user, password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas"
         )
@@ -114,4 +200,4 @@ def login(db: Session, email: str, password: str) -> str:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuario deshabilitado")
     if not user.is_verified:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Email no verificado")
-    return create_access_token(sub=str(user.id))
+    return create_access_token(sub=str(user.id), claims=token_claims(user))
@@ -0,0 +1,142 @@
+"""
+Versión async de app.auth.service para el modo DB_ASYNC (AsyncSession + psycopg 3).
+Mantiene los mismos mensajes y códigos de error que la versión síncrona.
+"""
+
+import logging
+from datetime import UTC, datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.cache import login_cache
+from app.auth.models import EmailCode, User
+from app.auth.registration import build_email_code, insert_user, registration_statement
+from app.auth.schemas import UserCreate
+from app.auth.service import (
+    _aware,
+    _email_taken,
+    _extract_domain,
+    _is_allowed_domain,
+    _too_many_attempts,
+    attempt_statement,
+    supersede_codes,
+    token_claims,
+)
+from app.core.hashing import ahash_password, averify_password
+from app.core.profiling import phase, profiled
+from app.core.security import create_access_token
+
+log = logging.getLogger("auth")
+
+
+@profiled("auth.register")
+async def register(db: AsyncSession, data: UserCreate) -> str:
+    """
+    Crea el usuario (si no existe) y genera un código de verificación.
+    DEVUELVE SIEMPRE el string del código para que el router lo envíe por email.
+    """
+    domain = _extract_domain(data.email)
+    if not _is_allowed_domain(domain):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El dominio de correo '{domain}' no está permitido",
+        )
+
+    # bcrypt va al pool de procesos; con la cola llena lanza 503
+    password_hash = await ahash_password(data.password)
+    rec, outbox = build_email_code(data.email)
+    try:
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            stmt = registration_statement(data.email, password_hash, rec, outbox)
+            created = (await db.execute(stmt)).scalar() is not None
+        else:
+            created = (await db.execute(insert_user(dialect, data.email, password_hash))).scalar()
+            if created:
+                db.add_all([r for r in (rec, outbox) if r is not None])
+        if not created:
+            await db.rollback()
+            raise _email_taken(data.email)
+        await db.commit()
+    except SQLAlchemyError as err:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="DB error durante el registro") from err
+
+    log.info("[UniGo] Código de verificación generado para %s", data.email)
+    return rec.code
+
+
+@profiled("auth.resend_code")
+async def resend_code(db: AsyncSession, email: str) -> str | None:
+    user = await db.scalar(select(User).where(User.email == email))
+    if user is None or user.is_verified:
+        await db.rollback()
+        return None
+    rec, outbox = build_email_code(email)
+    await db.execute(supersede_codes(email))
+    db.add_all([r for r in (rec, outbox) if r is not None])
+    await db.commit()
+    log.info("[UniGo] Código de verificación reenviado a %s", email)
+    return rec.code
+
+
+@profiled("auth.verify_email")
+async def verify_email(db: AsyncSession, email: str, code: str) -> None:
+    rec = await db.scalar(
+        select(EmailCode)
+        .where(
+            EmailCode.email == email,
+            EmailCode.purpose == "verify_email",
+            EmailCode.consumed.is_(False),
+        )
+        .order_by(EmailCode.created_at.desc())
+        .limit(1)
+    )
+
+    if not rec:
+        raise HTTPException(status_code=400, detail="No hay código pendiente")
+
+    if _aware(rec.expires_at) < datetime.now(UTC):
+        raise HTTPException(status_code=400, detail="Código de verificación caducado")
+
+    if (await db.execute(attempt_statement(rec.id))).first() is None:
+        await db.rollback()
+        raise _too_many_attempts()
+    if code != rec.code:
+        await db.commit()
+        raise HTTPException(status_code=400, detail="Código de verificación inválido")
+
+    rec.consumed = True
+    user = await db.scalar(select(User).where(User.email == email))
+    if not user:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+
+    user.is_verified = True
+    await db.commit()
+
+
+async def _password_ok(user: User, password: str) -> bool:
+    if login_cache.check(user, password):
+        return True
+    ok = await averify_password(password, user.password_hash)
+    if ok:
+        login_cache.remember(user, password)
+    return ok
+
+
+@profiled("auth.login")
+async def login(db: AsyncSession, email: str, password: str) -> str:
+    with phase("auth.user_lookup"):
+        user = await db.scalar(select(User).where(User.email == email))
+    if not user or not await _password_ok(user, password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciales inválidas"
+        )
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Usuario deshabilitado")
+    if not user.is_verified:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Email no verificado")
+    return create_access_token(sub=str(user.id), claims=token_claims(user))
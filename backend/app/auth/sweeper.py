@@ -0,0 +1,109 @@
+"""
+Barrido periódico de email_codes.
+
+Cada EMAIL_CODE_SWEEP_INTERVAL_SECONDS borra los códigos caducados y los ya consumidos
+(verificados, o sustituidos por un reenvío) en lotes de EMAIL_CODE_SWEEP_BATCH_SIZE filas,
+con un commit por lote para no retener locks ni inflar el WAL. Los dos criterios tienen
+índice: expires_at y el parcial ix_email_codes_consumed.
+Con varios workers de uvicorn cada uno barre por su cuenta: FOR UPDATE SKIP LOCKED hace que
+no se pisen.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.auth.models import EmailCode
+from app.core.config import settings
+from app.core.metrics import EMAIL_CODES_ROWS, EMAIL_CODES_SWEEP_DURATION, EMAIL_CODES_SWEPT
+from app.db.session import SessionLocal
+
+log = logging.getLogger("auth.sweeper")
+
+
+def sweep_expired_codes(db: Session, batch_size: int, now: datetime | None = None) -> int:
+    """
+    Borra todos los códigos caducados o consumidos, un lote por transacción. Devuelve
+    cuántos ha borrado.
+    """
+    now = now or datetime.now(UTC)
+    start = time.perf_counter()
+    total = 0
+    while True:
+        batch = (
+            select(EmailCode.id)
+            .where(or_(EmailCode.expires_at < now, EmailCode.consumed.is_(True)))
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        deleted = db.execute(
+            delete(EmailCode)
+            .where(EmailCode.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        total += deleted
+        EMAIL_CODES_SWEPT.inc(deleted)
+        if deleted < batch_size:
+            break
+    EMAIL_CODES_SWEEP_DURATION.observe(time.perf_counter() - start)
+    # Tras el barrido la tabla solo tiene códigos pendientes y vigentes: el COUNT es barato
+    EMAIL_CODES_ROWS.set(db.scalar(select(func.count()).select_from(EmailCode)))
+    return total
+
+
+class EmailCodeSweeper:
+    def __init__(
+        self,
+        interval_seconds: float,
+        batch_size: int,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.session_factory = session_factory
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def sweep(self) -> int:
+        with self.session_factory() as db:
+            return sweep_expired_codes(db, self.batch_size)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._loop(), name="email-code-sweeper")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            # Primero espera: no compite con el arranque de la app
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                deleted = await run_in_threadpool(self.sweep)
+            except SQLAlchemyError as err:
+                log.warning("Fallo barriendo email_codes: %s", err)
+                continue
+            if deleted:
+                log.info("Borrados %d códigos de verificación caducados o usados", deleted)
+
+
+email_code_sweeper = EmailCodeSweeper(
+    interval_seconds=settings.email_code_sweep_interval_seconds,
+    batch_size=settings.email_code_sweep_batch_size,
+)
@@ -1,5 +1,6 @@
 # app/core/config.py
 import json
+from typing import Literal
 
 from pydantic import EmailStr, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -9,11 +10,95 @@ class Settings(BaseSettings):
     secret_key: str = "change-me"
     access_token_expire_minutes: int = 60
 
+    # --- Base de datos ---
+    # DB_ASYNC=true monta los routers async (AsyncEngine + psycopg 3) en vez de los síncronos.
+    db_async: bool = False
+
+    # --- bcrypt ---
+    # Pool de procesos para hash/verify (0 = núm. de CPUs). Con la cola llena -> 503 + Retry-After
+    password_hash_pool: bool = True
+    password_hash_workers: int = 0
+    password_hash_max_queue: int = 64
+    password_hash_retry_after: int = 1
+
+    # Caché de logins verificados (HMAC email+contraseña -> huella del usuario)
+    login_cache_enabled: bool = False
+    login_cache_ttl_seconds: int = 60
+    login_cache_max_entries: int = 10_000
+
+    # AUTH_STATELESS: las lecturas autenticadas usan claims del JWT + snapshot cacheado (0 queries)
+    auth_stateless: bool = False
+    user_cache_backend: Literal["memory", "redis"] = "memory"
+    user_cache_ttl_seconds: int = 30
+    user_cache_max_entries: int = 50_000
+    redis_url: str = "redis://localhost:6379/0"
+
+    # --- Rate limiting (app/core/ratelimit.py) ---
+    # Token bucket "N/second|minute|hour|day" por IP y por email; al agotarse, 429 + Retry-After.
+    # memory = por worker; redis = compartido entre workers (script Lua atómico)
+    rate_limit_enabled: bool = True
+    rate_limit_backend: Literal["memory", "redis"] = "memory"
+    rate_limit_max_keys: int = 100_000
+    rate_limit_register_ip: str = "10/minute"
+    rate_limit_register_email: str = "3/hour"
+    rate_limit_login_ip: str = "30/minute"
+    rate_limit_login_email: str = "10/minute"
+    rate_limit_verify_ip: str = "30/minute"
+    rate_limit_verify_email: str = "10/minute"
+    rate_limit_resend_ip: str = "10/minute"
+    rate_limit_resend_email: str = "3/hour"
+
+    # --- Logs (app/core/logging.py) ---
+    # Records en cola hacia stdout; si se llena se descartan en vez de bloquear la petición
+    log_queue_max: int = 10_000
+    # Fracción de INFO/DEBUG que se guarda por logger (y sus hijos): '{"profiling": 0.1}'
+    log_sample_rates: dict[str, float] = {}
+
+    # --- Perfilado (ver app/core/profiling.py) ---
+    # Desactivado por defecto; PROFILING_SECRET permite perfilar peticiones con cabecera firmada
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.01
+    profiling_secret: str = ""
+    profiling_dir: str = "data/profiles"
+    profiling_interval_ms: float = 2.0
+
+    # --- Avatares ---
+    # Tamaño máximo (413 si se supera) y trozo de lectura/escritura en streaming
+    avatar_max_bytes: int = 5 * 1024 * 1024
+    avatar_chunk_bytes: int = 256 * 1024
+    # Variantes 64/128/256 px (WebP + JPEG) en un pool de procesos (0 = núm. de CPUs)
+    avatar_process_pool: bool = True
+    avatar_workers: int = 2
+    avatar_max_pixels: int = 40_000_000
+    # Almacén direccionado por contenido (app/profile/storage.py): local (AVATAR_DIR) o s3.
+    # Con s3, AVATAR_PUBLIC_PREFIX debe apuntar al bucket/CDN.
+    avatar_store: Literal["local", "s3"] = "local"
+    avatar_s3_bucket: str = ""
+    avatar_s3_prefix: str = "avatars/"
+    avatar_s3_endpoint_url: str = ""  # MinIO u otro compatible
+    avatar_s3_region: str = ""
+    # Detrás de nginx: ruta interna (location internal) a la que delegar el envío de avatares
+    avatar_accel_redirect_prefix: str = ""
+    # GC (python -m app.profile.gc): blobs sin referencias y con más antigüedad que el margen
+    avatar_gc_batch_size: int = 500
+    avatar_gc_grace_minutes: int = 60
+
     # --- RF-01 dominios ---
     # Importante: permitir str O list[str].
     # Así Pydantic no intenta json.loads() antes del validador.
     allowed_email_domains: list[str] | str = []
+    # Reglas que se recargan sin reiniciar (app/auth/domains.py): fichero con una por línea
+    # y/o la tabla email_domain_rules, cada EMAIL_DOMAINS_RELOAD_SECONDS
+    email_domains_file: str = ""
+    email_domains_table: bool = False
+    email_domains_reload_seconds: float = 30.0
     email_code_expire_minutes: int = 15
+    # Intentos de verificación por código; después el código deja de valer (429)
+    email_code_max_attempts: int = 5
+    # Barrido periódico de email_codes caducados o consumidos (app/auth/sweeper.py), por lotes
+    email_code_sweep_enabled: bool = True
+    email_code_sweep_interval_seconds: float = 300.0
+    email_code_sweep_batch_size: int = 1000
 
     # --- Mail (MailHog en dev) ---
     mail_username: str | None = ""
@@ -24,6 +109,37 @@ class Settings(BaseSettings):
     mail_starttls: bool = False
     mail_ssl_tls: bool = False
 
+    # Cola de salida async (app/core/mail_outbox.py)
+    mail_outbox_enabled: bool = True
+    mail_workers: int = 2
+    mail_queue_max: int = 10_000
+    mail_batch_size: int = 50
+    mail_max_attempts: int = 5
+    mail_retry_base_seconds: float = 1.0
+
+    # Outbox transaccional (tabla email_outbox + relay: python -m app.mail.relay).
+    # Si está activo, el registro NO encola nada en memoria: el relay entrega.
+    mail_outbox_table: bool = False
+    mail_relay_batch_size: int = 100
+    mail_relay_poll_seconds: float = 1.0
+    mail_relay_metrics_port: int = 0
+    # El relay borra, en lotes, las filas enviadas o descartadas con más de N días
+    mail_outbox_retention_days: int = 7
+    mail_outbox_purge_interval_seconds: float = 3600.0
+    mail_outbox_purge_batch_size: int = 1000
+
+    # --- Viajes ---
+    # Antigüedad máxima de la copia en memoria de las ofertas de una universidad
+    # (app.rides.matching); recoge lo publicado o cancelado desde otros workers.
+    ride_match_refresh_seconds: float = 30.0
+    # WebSocket /api/rides/live (app.rides.live): redis para repartir entre workers; cola por
+    # conexión (si se llena, se expulsa al cliente lento) y máximo de temas por conexión
+    ride_live_backend: Literal["memory", "redis"] = "memory"
+    ride_live_queue_max: int = 256
+    ride_live_max_topics: int = 500
+    # Cada cuánto se revalida el token de una conexión abierta (token_version, caducidad)
+    ride_live_auth_check_seconds: float = 30.0
+
     # Opción simple (recomendada si arrancas desde backend/)
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
@@ -0,0 +1,116 @@
+"""
+Executor dedicado para bcrypt.
+
+El hash/verify de contraseñas es CPU puro (~250 ms). Se ejecuta en un pool de procesos
+acotado para no bloquear los workers de la API; si la cola se llena se devuelve 503 con
+Retry-After en vez de acumular peticiones.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core import security
+from app.core.config import settings
+from app.core.metrics import PASSWORD_HASH_LATENCY, PASSWORD_HASH_QUEUE_DEPTH
+from app.core.profiling import profiled
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, max_queue: int, retry_after: int, use_pool: bool = True):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.use_pool = use_pool
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: los procesos hijos no heredan hilos ni conexiones del padre
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servidor ocupado, inténtalo de nuevo en unos segundos",
+                    headers={"Retry-After": str(self.retry_after)},
+                )
+            self._pending += 1
+            PASSWORD_HASH_QUEUE_DEPTH.set(self._pending)
+
+    def _release(self, op: str, start: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            PASSWORD_HASH_QUEUE_DEPTH.set(self._pending)
+        PASSWORD_HASH_LATENCY.labels(op).observe(time.perf_counter() - start)
+
+    async def arun(self, op: str, fn, *args):
+        self._acquire()
+        start = time.perf_counter()
+        try:
+            if not self.use_pool:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            self._release(op, start)
+
+    def run(self, op: str, fn, *args):
+        """
+        Variante bloqueante para los handlers síncronos (ya corren en el threadpool).
+        """
+        self._acquire()
+        start = time.perf_counter()
+        try:
+            if not self.use_pool:
+                return fn(*args)
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._release(op, start)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+    retry_after=settings.password_hash_retry_after,
+    use_pool=settings.password_hash_pool,
+)
+
+
+@profiled("bcrypt.hash")
+def hash_password(password: str) -> str:
+    return hasher.run("hash", security.hash_password, password)
+
+
+@profiled("bcrypt.verify")
+def verify_password(plain: str, hashed: str) -> bool:
+    return hasher.run("verify", security.verify_password, plain, hashed)
+
+
+@profiled("bcrypt.hash")
+async def ahash_password(password: str) -> str:
+    return await hasher.arun("hash", security.hash_password, password)
+
+
+@profiled("bcrypt.verify")
+async def averify_password(plain: str, hashed: str) -> bool:
+    return await hasher.arun("verify", security.verify_password, plain, hashed)
@@ -1,24 +1,187 @@
-import json
+"""
+Logs JSON sin bloquear las peticiones.
+
+setup_logging() deja en el root un QueueHandler: el hilo que loguea solo mete el record en
+una cola acotada (LOG_QUEUE_MAX) y un QueueListener, en su propio hilo, lo formatea y lo
+escribe en stdout. Si la cola se llena el record se descarta y se cuenta en
+unigo_log_records_dropped_total en vez de frenar la petición.
+
+Antes de encolar, en el hilo de la petición:
+- RequestContextMiddleware guarda en contextvars el request_id (X-Request-ID o uno nuevo) y
+  el inicio de la petición; cada record lleva request_id y elapsed_ms.
+- LOG_SAMPLE_RATES ('{"profiling": 0.1}') guarda solo esa fracción de los INFO/DEBUG del
+  logger y de sus hijos. WARNING o más se guardan siempre.
+
+JsonFormatter tapa los códigos de verificación de 6 dígitos que acompañen a "código"/"code"
+en el mensaje, por si alguno llega a un log (p. ej. el cuerpo de un email).
+"""
+
+import atexit
+import copy
 import logging
+import queue
+import random
+import re
 import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
 from typing import Any
 
+import orjson
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import LOG_RECORDS_DROPPED
+
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+request_start_var: ContextVar[float | None] = ContextVar("request_start", default=None)
+
+_CODE = re.compile(r"(?i)(c[óo]digo|code)([^\n]{0,80}?)(?<!\d)\d{6}(?!\d)")
+# X-Request-ID del cliente solo si es inocuo: va tal cual a los logs y a la respuesta
+_REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+_plain = logging.Formatter()
+
+
+def redact_codes(text: str) -> str:
+    """
+    "Tu código de verificación es: 123456" -> "Tu código de verificación es: ******".
+    """
+    return _CODE.sub(r"\1\2******", text)
+
 
 class JsonFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
         log: dict[str, Any] = {
             "level": record.levelname,
             "name": record.name,
-            "message": record.getMessage(),
+            "message": redact_codes(record.getMessage()),
         }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            log["request_id"] = request_id
+            log["elapsed_ms"] = record.elapsed_ms
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            log["exc_info"] = record.exc_text
+        return orjson.dumps(log).decode()
+
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        start = request_start_var.get()
+        record.request_id = request_id_var.get()
+        record.elapsed_ms = (
+            None if start is None else round((time.perf_counter() - start) * 1000, 1)
+        )
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: dict[str, float] = {}
+
+    def rate_for(self, name: str) -> float:
+        # "profiling.http" usa la tasa de "profiling" si no tiene una propia
+        rate = self._resolved.get(name)
+        if rate is None:
+            prefix = name
+            while prefix not in self.rates and "." in prefix:
+                prefix = prefix.rsplit(".", 1)[0]
+            rate = self._resolved[name] = self.rates.get(prefix, 1.0)
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1 or random.random() < rate:
+            return True
+        LOG_RECORDS_DROPPED.labels("sampled").inc()
+        return False
+
+
+class _QueueHandler(QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels("queue_full").inc()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # args y la traza pueden referirse a objetos vivos: al listener solo le llega texto
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
         if record.exc_info:
-            log["exc_info"] = self.formatException(record.exc_info)
-        return json.dumps(log, ensure_ascii=False)
+            record.exc_text = record.exc_text or _plain.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
+class _QueueListener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Con la cola llena put_nowait fallaría; el listener la está vaciando
+        self.queue.put(self._sentinel)
 
-def setup_logging():
+
+_listener: _QueueListener | None = None
+
+
+def setup_logging() -> None:
+    global _listener
+    shutdown_logging()
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(JsonFormatter())
+    records: queue.Queue = queue.Queue(maxsize=settings.log_queue_max)
+    queue_handler = _QueueHandler(records)
+    queue_handler.addFilter(RequestContextFilter())
+    if settings.log_sample_rates:
+        queue_handler.addFilter(SamplingFilter(settings.log_sample_rates))
     root = logging.getLogger()
     root.setLevel(logging.INFO)
-    root.handlers = [handler]
+    root.handlers = [queue_handler]
+    _listener = _QueueListener(records, handler)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """
+    Escribe lo que quede en la cola y para el listener.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Los CLI (relay, gc) no paran el listener: que no se pierda la cola al salir
+atexit.register(shutdown_logging)
+
+
+class RequestContextMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming if _REQUEST_ID.fullmatch(incoming) else uuid.uuid4().hex
+        id_token = request_id_var.set(request_id)
+        start_token = request_start_var.set(time.perf_counter())
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_start_var.reset(start_token)
+            request_id_var.reset(id_token)
@@ -0,0 +1,264 @@
+"""
+Cola de salida de emails asíncrona.
+
+El registro encola el mensaje y vuelve; N workers (MAIL_WORKERS) con una conexión SMTP
+persistente cada uno (aiosmtplib) vacían la cola por lotes, reintentan con backoff
+exponencial y reconectan si el relay corta la sesión. Se prueba en local contra MailHog
+(make infra-up, UI en http://127.0.0.1:8025).
+
+Encolar nunca falla la petición: cuando se llama el registro ya está confirmado, así que con
+la cola llena el email se descarta (log + unigo_mail_messages_total{result="dropped"}). Para no
+perder ninguno está MAIL_OUTBOX_TABLE.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+
+import aiosmtplib
+from fastapi import BackgroundTasks
+
+from app.core import mailer
+from app.core.config import settings
+from app.core.metrics import MAIL_BATCH_SIZE, MAIL_QUEUE_DEPTH, MAIL_SEND_LATENCY, MAIL_SENT
+
+log = logging.getLogger("mailer")
+
+
+class SmtpSender:
+    """
+    Una conexión SMTP reutilizable entre mensajes; se reabre bajo demanda.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: str | None = None,
+        password: str | None = None,
+        use_tls: bool = False,
+        start_tls: bool = False,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self._smtp: aiosmtplib.SMTP | None = None
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is None or not self._smtp.is_connected:
+            smtp = aiosmtplib.SMTP(
+                hostname=self.host,
+                port=self.port,
+                username=self.username,
+                password=self.password,
+                use_tls=self.use_tls,
+                start_tls=self.start_tls,
+                timeout=self.timeout,
+            )
+            await smtp.connect()
+            self._smtp = smtp
+        return self._smtp
+
+    async def send(self, msg: EmailMessage) -> None:
+        start = time.perf_counter()
+        try:
+            smtp = await self._connection()
+            await smtp.send_message(msg)
+        except Exception:
+            # Conexión en estado desconocido: la próxima llamada abre otra
+            await self.close()
+            raise
+        finally:
+            MAIL_SEND_LATENCY.observe(time.perf_counter() - start)
+
+    async def close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except aiosmtplib.SMTPException:
+                smtp.close()
+
+
+def sender_from_settings() -> SmtpSender:
+    return SmtpSender(
+        host=mailer.MAIL_HOST,
+        port=mailer.MAIL_PORT,
+        username=settings.mail_username,
+        password=settings.mail_password,
+        use_tls=settings.mail_ssl_tls,
+        start_tls=settings.mail_starttls,
+    )
+
+
+@dataclass(eq=False)
+class OutboxItem:
+    msg: EmailMessage
+    attempts: int = 0
+    retry: asyncio.TimerHandle | None = None
+
+
+class MailOutbox:
+    def __init__(
+        self,
+        workers: int,
+        max_queue: int,
+        batch_size: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+        sender_factory=sender_from_settings,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.sender_factory = sender_factory
+        self._queue: asyncio.Queue[OutboxItem] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: list[asyncio.Task] = []
+        # Reintentos esperando su backoff: no están en la cola, así que join() no los ve
+        self._retrying: set[OutboxItem] = set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [
+            asyncio.create_task(self._worker(self.sender_factory()), name=f"mail-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """
+        Intenta vaciar la cola, con los reintentos pendientes adelantados, antes de cancelar
+        los workers.
+        """
+        if not self.running:
+            return
+        deadline = self._loop.time() + timeout
+        while True:
+            for item in list(self._retrying):
+                item.retry.cancel()
+                self._requeue(item)
+            try:
+                await asyncio.wait_for(self._queue.join(), deadline - self._loop.time())
+            except TimeoutError:
+                break
+            # Un fallo durante el vaciado vuelve a programar su reintento
+            if not self._retrying:
+                break
+        lost = self._queue.qsize() + len(self._retrying)
+        if lost:
+            log.warning("Mail outbox: %d mensajes sin enviar al parar", lost)
+        for item in self._retrying:
+            item.retry.cancel()
+        self._retrying.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, msg: EmailMessage) -> None:
+        """
+        Encola un mensaje. Se puede llamar desde el event loop o desde el threadpool; con la
+        cola llena se descarta (ver _put), nunca lanza.
+        """
+        item = OutboxItem(msg)
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            self._put(item)
+        else:
+            self._loop.call_soon_threadsafe(self._put, item)
+
+    def _put(self, item: OutboxItem) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            MAIL_SENT.labels("dropped").inc()
+            log.error("Mail outbox llena, se descarta email a %s", item.msg["To"])
+        MAIL_QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _next_batch(self) -> list[OutboxItem]:
+        batch = [await self._queue.get()]
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        MAIL_QUEUE_DEPTH.set(self._queue.qsize())
+        MAIL_BATCH_SIZE.observe(len(batch))
+        return batch
+
+    def _retry(self, item: OutboxItem) -> None:
+        item.attempts += 1
+        if item.attempts >= self.max_attempts:
+            MAIL_SENT.labels("failed").inc()
+            log.error("Email a %s descartado tras %d intentos", item.msg["To"], item.attempts)
+            return
+        MAIL_SENT.labels("retry").inc()
+        delay = self.retry_base_seconds * 2 ** (item.attempts - 1)
+        item.retry = self._loop.call_later(delay, self._requeue, item)
+        self._retrying.add(item)
+
+    def _requeue(self, item: OutboxItem) -> None:
+        self._retrying.discard(item)
+        item.retry = None
+        self._put(item)
+
+    async def _worker(self, sender: SmtpSender) -> None:
+        try:
+            while True:
+                batch = await self._next_batch()
+                # Todo el lote va por la misma conexión SMTP
+                for item in batch:
+                    try:
+                        await sender.send(item.msg)
+                        MAIL_SENT.labels("sent").inc()
+                    except aiosmtplib.SMTPResponseException as err:
+                        log.warning("SMTP %s enviando email a %s", err.code, item.msg["To"])
+                        # 5xx es permanente (destinatario rechazado...): no se reintenta
+                        if err.code >= 500:
+                            item.attempts = self.max_attempts - 1
+                        self._retry(item)
+                    except (aiosmtplib.SMTPException, OSError) as err:
+                        log.warning("Fallo enviando email a %s: %s", item.msg["To"], err)
+                        self._retry(item)
+                    finally:
+                        self._queue.task_done()
+        finally:
+            await sender.close()
+
+
+mail_outbox = MailOutbox(
+    workers=settings.mail_workers,
+    max_queue=settings.mail_queue_max,
+    batch_size=settings.mail_batch_size,
+    max_attempts=settings.mail_max_attempts,
+    retry_base_seconds=settings.mail_retry_base_seconds,
+)
+
+
+def queue_verification_email(bg: BackgroundTasks, *, to_email: str, code: str) -> None:
+    """
+    Encola el email de verificación. Con MAIL_OUTBOX_TABLE no hace nada (entrega el relay).
+    Sin outbox arrancado (MAIL_OUTBOX_ENABLED=false o fuera del lifespan de la app) se
+    envía como antes, en una BackgroundTask síncrona.
+    """
+    if settings.mail_outbox_table:
+        # Ya se escribió en email_outbox dentro de la transacción del registro
+        return
+    if mail_outbox.running:
+        mail_outbox.enqueue(mailer.build_verification_message(to_email=to_email, code=code))
+    else:
+        bg.add_task(mailer.send_verification_email, to_email=to_email, code=code)
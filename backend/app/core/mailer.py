@@ -11,9 +11,9 @@ MAIL_PORT = int(os.getenv("MAIL_PORT", "1025"))
 MAIL_FROM = os.getenv("MAIL_FROM", "no-reply@unigo.local")
 
 
-def send_verification_email(*, to_email: str, code: str) -> None:
+def build_verification_message(*, to_email: str, code: str) -> EmailMessage:
     """
-    Envía el código de verificación.
+    Construye el email con el código de verificación.
     Requiere 'code' no vacío; NO tiene default para evitar code=None por error.
     """
     if not isinstance(code, str) or not code.strip():
@@ -27,8 +27,16 @@ def send_verification_email(*, to_email: str, code: str) -> None:
     msg["To"] = to_email
     msg["Subject"] = subject
     msg.set_content(body)
+    return msg
+
+
+def send_verification_email(*, to_email: str, code: str) -> None:
+    """
+    Envía el código de verificación por SMTP síncrono (una conexión por mensaje).
+    """
+    msg = build_verification_message(to_email=to_email, code=code)
 
-    log.info("[UniGo] Enviando código %s a %s", code, to_email)
+    log.info("[UniGo] Enviando código de verificación a %s", to_email)
 
     with smtplib.SMTP(MAIL_HOST, MAIL_PORT) as smtp:
         smtp.send_message(msg)
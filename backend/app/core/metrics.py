@@ -1,13 +1,190 @@
+"""
+Métricas Prometheus de la API.
+
+- Las peticiones se etiquetan con la plantilla de ruta (/api/rides/{ride_id}), nunca con la
+  ruta cruda, para que la cardinalidad no crezca con los IDs.
+- Con PROMETHEUS_MULTIPROC_DIR definido (varios workers de uvicorn) /metrics agrega los
+  ficheros de todos los procesos.
+"""
+
+import os
 import time
+from contextvars import ContextVar
 
 from fastapi import APIRouter, Response
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
-from starlette.types import ASGIApp, Receive, Scope, Send
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+UNMATCHED_ROUTE = "<unmatched>"
 
 REQUEST_COUNT = Counter("unigo_requests_total", "Total HTTP requests", ["method", "path", "status"])
 REQUEST_LATENCY = Histogram(
     "unigo_request_duration_seconds", "Latency of HTTP requests", ["method", "path"]
 )
+REQUESTS_IN_PROGRESS = Gauge(
+    "unigo_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+RESPONSE_SIZE = Histogram(
+    "unigo_response_size_bytes",
+    "Size of HTTP response bodies",
+    ["method", "path"],
+    buckets=(128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "unigo_db_queries_per_request",
+    "SQL statements executed while serving a request",
+    ["method", "path"],
+    buckets=(0, 1, 2, 3, 4, 5, 8, 13, 21, 34),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "unigo_db_time_per_request_seconds",
+    "Time spent in SQL statements while serving a request",
+    ["method", "path"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+DB_QUERY_LATENCY = Histogram(
+    "unigo_db_query_duration_seconds",
+    "Latency of individual SQL statements",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    "unigo_password_hash_queue_depth",
+    "bcrypt operations queued or running in the hash pool",
+    multiprocess_mode="livesum",
+)
+PASSWORD_HASH_LATENCY = Histogram(
+    "unigo_password_hash_duration_seconds",
+    "bcrypt hash/verify latency including queue wait",
+    ["op"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+LOGIN_CACHE_REQUESTS = Counter(
+    "unigo_login_cache_requests_total", "Verified-credential cache lookups", ["result"]
+)
+USER_CACHE_REQUESTS = Counter(
+    "unigo_user_cache_requests_total", "User snapshot cache lookups", ["result"]
+)
+RATE_LIMIT_DECISIONS = Counter(
+    "unigo_rate_limit_decisions_total",
+    "Rate limiter decisions (allow, deny, error = backend down, allowed)",
+    ["route", "scope", "result"],
+)
+
+MAIL_QUEUE_DEPTH = Gauge(
+    "unigo_mail_queue_depth", "Emails waiting in the outbox queue", multiprocess_mode="livesum"
+)
+MAIL_SEND_LATENCY = Histogram(
+    "unigo_mail_send_duration_seconds",
+    "SMTP send latency per message (including reconnects)",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+MAIL_BATCH_SIZE = Histogram(
+    "unigo_mail_batch_size", "Messages sent per outbox batch", buckets=(1, 2, 5, 10, 25, 50, 100)
+)
+MAIL_OUTBOX_PENDING = Gauge(
+    "unigo_mail_outbox_pending",
+    "Pending rows in the email_outbox table",
+    multiprocess_mode="liveall",
+)
+MAIL_OUTBOX_PURGED = Counter(
+    "unigo_mail_outbox_purged_total", "Sent or failed email_outbox rows deleted"
+)
+MAIL_SENT = Counter("unigo_mail_messages_total", "Outbox delivery outcomes", ["result"])
+
+EMAIL_CODES_ROWS = Gauge(
+    "unigo_email_codes_rows",
+    "Rows in the email_codes table after the last sweep",
+    multiprocess_mode="mostrecent",
+)
+EMAIL_DOMAIN_RULES = Gauge(
+    "unigo_email_domain_rules",
+    "Email domain rules in the active registration policy",
+    multiprocess_mode="mostrecent",
+)
+EMAIL_CODES_SWEPT = Counter(
+    "unigo_email_codes_swept_total", "Expired or consumed email codes deleted"
+)
+EMAIL_CODES_SWEEP_DURATION = Histogram(
+    "unigo_email_codes_sweep_duration_seconds",
+    "Duration of a full email_codes sweep (all batches)",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+RIDE_BOOKINGS = Counter(
+    "unigo_ride_bookings_total",
+    "Seat booking attempts by outcome (created, replayed, rejected)",
+    ["result"],
+)
+
+RIDE_LIVE_CONNECTIONS = Gauge(
+    "unigo_ride_live_connections",
+    "Open ride update WebSocket connections",
+    multiprocess_mode="livesum",
+)
+RIDE_LIVE_MESSAGES = Counter(
+    "unigo_ride_live_messages_total",
+    "Ride update messages queued to WebSocket clients or lost on the broker",
+    ["result"],
+)
+RIDE_LIVE_EVICTIONS = Counter(
+    "unigo_ride_live_evictions_total", "WebSocket clients evicted for not keeping up"
+)
+LOG_RECORDS_DROPPED = Counter(
+    "unigo_log_records_dropped_total",
+    "Log records not written (sampled = LOG_SAMPLE_RATES, queue_full = listener behind)",
+    ["reason"],
+)
+
+
+class DbStats:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Objeto mutable por petición: el threadpool copia el contexto, así que los handlers
+# síncronos comparten la misma instancia que el middleware.
+db_stats: ContextVar[DbStats | None] = ContextVar("unigo_db_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("unigo_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["unigo_query_start"].pop()
+    DB_QUERY_LATENCY.observe(elapsed)
+    stats = db_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.seconds += elapsed
+
+
+def route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return UNMATCHED_ROUTE
+    return getattr(route, "path_format", None) or route.path
 
 
 class MetricsMiddleware:
@@ -18,22 +195,51 @@ class MetricsMiddleware:
         if scope["type"] != "http":
             return await self.app(scope, receive, send)
         method = scope["method"]
-        path = scope["path"]
-        start = time.time()
+        status = 500
+        size = 0
+        stats = DbStats()
+        token = db_stats.set(stats)
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
 
-        async def send_wrapper(message):
+        async def send_wrapper(message: Message):
+            nonlocal status, size
             if message["type"] == "http.response.start":
                 status = message["status"]
-                REQUEST_COUNT.labels(method, path, str(status)).inc()
-                REQUEST_LATENCY.labels(method, path).observe(time.time() - start)
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
             await send(message)
 
-        await self.app(scope, receive, send_wrapper)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # El router ya ha escrito scope["route"] al resolver la petición
+            path = route_template(scope)
+            REQUEST_COUNT.labels(method, path, str(status)).inc()
+            REQUEST_LATENCY.labels(method, path).observe(time.perf_counter() - start)
+            RESPONSE_SIZE.labels(method, path).observe(size)
+            DB_QUERIES_PER_REQUEST.labels(method, path).observe(stats.queries)
+            DB_TIME_PER_REQUEST.labels(method, path).observe(stats.seconds)
+            in_progress.dec()
+            db_stats.reset(token)
+
+
+def mark_process_dead() -> None:
+    """
+    Limpia los gauges "live" de este worker al apagarse (solo en modo multiproceso).
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
 
 
 metrics_router = APIRouter()
 
 
-@metrics_router.get("/metrics")
+@metrics_router.get("/metrics", include_in_schema=False)
 def metrics():
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,321 @@
+"""
+Perfilado opcional del hot path por petición.
+
+Se activa con PROFILING_ENABLED (muestrea PROFILING_SAMPLE_RATE de las peticiones) o, con
+PROFILING_SECRET definido, para peticiones concretas que envían la cabecera firmada
+X-UniGo-Profile (ver sign_profile_request). Si ninguna de las dos está configurada el
+middleware no se instala y los decoradores devuelven la función original: coste cero.
+
+Para cada petición perfilada:
+- Se miden fases: "dependencies" (hasta entrar al endpoint, incluye get_current_user),
+  "db.checkout" (espera de conexión del pool), las llamadas marcadas con @profiled o
+  phase() (servicios, bcrypt, JWT) y "serialization" (del return a la respuesta).
+- Las fases se devuelven en la cabecera Server-Timing y se guardan en PROFILING_DIR junto a
+  un perfil de pilas muestreadas en formato "collapsed" (flamegraph.pl, speedscope, inferno).
+  En modo async el hilo muestreado es el del event loop, compartido con otras peticiones.
+"""
+
+import asyncio
+import functools
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import route_template
+
+log = logging.getLogger("profiling")
+
+PROFILE_HEADER = "x-unigo-profile"
+SIGNATURE_MAX_AGE = 300
+ACTIVE = settings.profiling_enabled or bool(settings.profiling_secret)
+
+
+class Profile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.endpoint_end: float | None = None
+        self.phases: list[tuple[str, float]] = []
+        self.threads: set[int] = {threading.get_ident()}
+        self.stacks: Counter[str] = Counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases.append((name, seconds))
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={sec * 1000:.2f}" for name, sec in self.phases)
+
+
+_current: ContextVar[Profile | None] = ContextVar("unigo_profile", default=None)
+
+
+def current_profile() -> Profile | None:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str):
+    prof = _current.get()
+    if prof is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        prof.add(name, time.perf_counter() - start)
+
+
+def profiled(name: str):
+    """
+    Decorador de fase para funciones sync o async. Sin perfilado activo no envuelve nada.
+    """
+
+    def decorator(fn):
+        if not ACTIVE:
+            return fn
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with phase(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class StackSampler:
+    """
+    Hilo único que muestrea las pilas de los hilos registrados en cada Profile activo.
+    Duerme mientras no hay peticiones perfiladas.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: set[Profile] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add(self, prof: Profile) -> None:
+        with self._lock:
+            self._active.add(prof)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="unigo-sampler")
+                self._thread.daemon = True
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, prof: Profile) -> None:
+        with self._lock:
+            self._active.discard(prof)
+            if not self._active:
+                self._wake.clear()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                profiles = list(self._active)
+            frames = sys._current_frames()
+            for prof in profiles:
+                for tid in list(prof.threads):
+                    frame = frames.get(tid)
+                    if frame is not None and tid != own:
+                        prof.stacks[_collapse(frame)] += 1
+
+
+sampler = StackSampler(interval=settings.profiling_interval_ms / 1000)
+
+
+def sign_profile_request(secret: str, method: str, path: str, ts: int | None = None) -> str:
+    """
+    Valor de X-UniGo-Profile para forzar el perfilado de una petición (válido 5 minutos).
+    """
+    ts = int(time.time()) if ts is None else ts
+    sig = hmac.new(secret.encode(), f"{ts}:{method}:{path}".encode(), hashlib.sha256)
+    return f"{ts}.{sig.hexdigest()}"
+
+
+def _valid_signature(secret: str, value: str, method: str, path: str) -> bool:
+    ts, _, _sig = value.partition(".")
+    if not ts.isdigit() or abs(time.time() - int(ts)) > SIGNATURE_MAX_AGE:
+        return False
+    return hmac.compare_digest(sign_profile_request(secret, method, path, int(ts)), value)
+
+
+def _write_profile(out_dir: str, name: str, prof: Profile, meta: dict) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, name)
+    with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+        for stack, count in prof.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+class ProfilingMiddleware:
+    def __init__(
+        self, app: ASGIApp, sample_rate: float, secret: str, out_dir: str, enabled: bool = True
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.out_dir = out_dir
+        self.enabled = enabled
+
+    def _should_profile(self, scope: Scope) -> bool:
+        if self.secret:
+            for key, value in scope["headers"]:
+                if key == PROFILE_HEADER.encode():
+                    return _valid_signature(
+                        self.secret, value.decode("latin-1"), scope["method"], scope["path"]
+                    )
+        return self.enabled and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._should_profile(scope):
+            return await self.app(scope, receive, send)
+
+        prof = Profile()
+        token = _current.set(prof)
+        sampler.add(prof)
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if prof.endpoint_end is not None:
+                    prof.add("serialization", time.perf_counter() - prof.endpoint_end)
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", prof.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.remove(prof)
+            _current.reset(token)
+            total = time.perf_counter() - prof.start
+            route = route_template(scope)
+            meta = {
+                "method": scope["method"],
+                "route": route,
+                "status": status,
+                "total_ms": round(total * 1000, 3),
+                "phases": [{"name": n, "ms": round(s * 1000, 3)} for n, s in prof.phases],
+                "samples": sum(prof.stacks.values()),
+            }
+            log.info("profile %s %s %s", scope["method"], route, prof.server_timing())
+            slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+            name = f"{int(time.time() * 1000)}-{scope['method']}-{slug}"
+            await run_in_threadpool(_write_profile, self.out_dir, name, prof, meta)
+
+
+def _wrap_endpoint(call):
+    if asyncio.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def async_endpoint(*args, **kwargs):
+            prof = _current.get()
+            if prof is None:
+                return await call(*args, **kwargs)
+            prof.add("dependencies", time.perf_counter() - prof.start)
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                prof.endpoint_end = time.perf_counter()
+
+        return async_endpoint
+
+    @functools.wraps(call)
+    def endpoint(*args, **kwargs):
+        prof = _current.get()
+        if prof is None:
+            return call(*args, **kwargs)
+        prof.add("dependencies", time.perf_counter() - prof.start)
+        # Los endpoints síncronos corren en el threadpool: muestrear también ese hilo
+        tid = threading.get_ident()
+        prof.threads.add(tid)
+        try:
+            return call(*args, **kwargs)
+        finally:
+            prof.threads.discard(tid)
+            prof.endpoint_end = time.perf_counter()
+
+    return endpoint
+
+
+_CHECKOUT_START = "unigo_profile_checkout_start"
+
+
+def _before_orm_execute(orm_execute_state) -> None:
+    session = orm_execute_state.session
+    if _current.get() is not None and not session.in_transaction():
+        session.info.setdefault(_CHECKOUT_START, time.perf_counter())
+
+
+def _after_begin(session, transaction, connection) -> None:
+    start = session.info.pop(_CHECKOUT_START, None)
+    prof = _current.get()
+    if start is not None and prof is not None:
+        prof.add("db.checkout", time.perf_counter() - start)
+
+
+def install(app: FastAPI) -> None:
+    """
+    Instala el middleware y envuelve los endpoints ya registrados. Llamar tras include_router.
+    """
+    if not ACTIVE:
+        return
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            route.dependant.call = _wrap_endpoint(route.dependant.call)
+    event.listen(Session, "do_orm_execute", _before_orm_execute)
+    event.listen(Session, "after_begin", _after_begin)
+    app.add_middleware(
+        ProfilingMiddleware,
+        sample_rate=settings.profiling_sample_rate,
+        secret=settings.profiling_secret,
+        out_dir=settings.profiling_dir,
+        enabled=settings.profiling_enabled,
+    )
@@ -0,0 +1,192 @@
+"""
+Limitador de peticiones (token bucket) para los endpoints que cuestan CPU o emails.
+
+Cada regla es "N/periodo" ("10/minute"): un cubo de N fichas que se rellena a N por periodo,
+así que admite ráfagas de N y luego el ritmo medio. rate_limited() devuelve una dependencia
+de FastAPI que gasta una ficha por IP y, si el cuerpo trae "email", otra por email, con
+claves separadas por ruta. Se evalúa antes que el handler: una petición rechazada (429 +
+Retry-After) no llega a tocar la BD ni bcrypt.
+
+- MemoryBuckets: por proceso; con N workers el límite efectivo es N veces el configurado.
+- RedisBuckets (RATE_LIMIT_BACKEND=redis): compartido entre workers. Cada decisión es un
+  script Lua atómico que usa el reloj de Redis, así que no hay carreras entre workers ni
+  desfases de reloj. Si Redis falla se deja pasar (y se cuenta como "error"): preferimos
+  perder el límite unos segundos a tumbar el login.
+
+La IP es request.client.host: detrás de un proxy hay que arrancar uvicorn con
+--proxy-headers y --forwarded-allow-ips para que sea la del cliente.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from fastapi import HTTPException, Request, status
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_DECISIONS
+
+log = logging.getLogger("ratelimit")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True, slots=True)
+class Rate:
+    limit: int
+    period: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        """
+        "10/minute" -> Rate(10, 60). Un formato inválido falla al arrancar, no en la petición.
+        """
+        m = re.fullmatch(r"\s*(\d+)\s*/\s*(second|minute|hour|day)s?\s*", value)
+        if not m or int(m[1]) < 1:
+            raise ValueError(f"Límite inválido: {value!r} (formato: 10/minute)")
+        return cls(int(m[1]), float(_PERIODS[m[2]]))
+
+    @property
+    def per_second(self) -> float:
+        return self.limit / self.period
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys: int):
+        # Un cubo que lleva un periodo sin usarse está lleno: olvidarlo es equivalente
+        self._buckets = TTLCache(maxsize=max_keys, ttl=60)
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: Rate) -> float:
+        """
+        Gasta una ficha. Devuelve 0 si había, o los segundos hasta la siguiente.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key) or (float(rate.limit), now)
+            tokens = min(rate.limit, tokens + (now - last) * rate.per_second)
+            if tokens >= 1:
+                tokens, wait = tokens - 1, 0.0
+            else:
+                wait = (1 - tokens) / rate.per_second
+            self._buckets.set(key, (tokens, now), ttl=rate.period)
+        return wait
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+# KEYS[1] = cubo; ARGV = límite, fichas por segundo, TTL en segundos
+_TOKEN_BUCKET_LUA = """
+redis.replicate_commands()
+local limit = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or limit
+local last = tonumber(b[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    def __init__(self, url: str, prefix: str = "unigo:rl:"):
+        import redis.asyncio as redis  # dependencia opcional, solo con RATE_LIMIT_BACKEND=redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._script = self._redis.register_script(_TOKEN_BUCKET_LUA)
+        self._prefix = prefix
+
+    async def take(self, key: str, rate: Rate) -> float:
+        args = [rate.limit, repr(rate.per_second), math.ceil(rate.period)]
+        return float(await self._script(keys=[self._prefix + key], args=args))
+
+    def clear(self) -> None:
+        pass
+
+
+class RateLimiter:
+    def __init__(self, buckets: MemoryBuckets | RedisBuckets, enabled: bool = True):
+        self.buckets = buckets
+        self.enabled = enabled
+
+    async def check(self, route: str, scope: str, identity: str, rate: Rate) -> None:
+        """
+        429 con Retry-After si (route, scope, identity) ha agotado su cubo.
+        """
+        try:
+            wait = await self.buckets.take(f"{route}:{scope}:{identity}", rate)
+        except Exception:
+            RATE_LIMIT_DECISIONS.labels(route, scope, "error").inc()
+            log.exception("Rate limit no disponible; se deja pasar %s", route)
+            return
+        if wait <= 0:
+            RATE_LIMIT_DECISIONS.labels(route, scope, "allow").inc()
+            return
+        RATE_LIMIT_DECISIONS.labels(route, scope, "deny").inc()
+        retry_after = max(1, math.ceil(wait))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Demasiadas peticiones; vuelve a intentarlo en {retry_after} s",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+def _build_buckets() -> MemoryBuckets | RedisBuckets:
+    if settings.rate_limit_backend == "redis":
+        return RedisBuckets(settings.redis_url)
+    return MemoryBuckets(max_keys=settings.rate_limit_max_keys)
+
+
+rate_limiter = RateLimiter(_build_buckets(), enabled=settings.rate_limit_enabled)
+
+
+def _email_identity(email: str) -> str:
+    # Las claves viven en Redis y en memoria: mejor una huella que el correo en claro
+    return hashlib.blake2b(email.strip().lower().encode(), digest_size=12).hexdigest()
+
+
+async def _body_email(request: Request) -> str | None:
+    try:
+        body = await request.json()  # Starlette la guarda; el handler no la vuelve a leer
+    except ValueError:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    return email if isinstance(email, str) and email else None
+
+
+def rate_limited(route: str, per_ip: str, per_email: str | None = None):
+    """
+    Dependencia que limita la ruta por IP y, opcionalmente, por el email del cuerpo JSON:
+
+        @router.post("/login", dependencies=[Depends(rate_limited("login", "30/minute"))])
+    """
+    ip_rate = Rate.parse(per_ip)
+    email_rate = Rate.parse(per_email) if per_email else None
+
+    async def dependency(request: Request) -> None:
+        if not rate_limiter.enabled:
+            return
+        ip = request.client.host if request.client else "unknown"
+        await rate_limiter.check(route, "ip", ip, ip_rate)
+        if email_rate is not None:
+            email = await _body_email(request)
+            if email is not None:
+                await rate_limiter.check(route, "email", _email_identity(email), email_rate)
+
+    return dependency
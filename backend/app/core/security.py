@@ -1,9 +1,11 @@
 from datetime import UTC, datetime, timedelta
+from typing import Any
 
 from jose import jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.profiling import profiled
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ALGORITHM = "HS256"
@@ -17,11 +19,24 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
-def create_access_token(sub: str, expires_minutes: int | None = None) -> str:
+@profiled("jwt.encode")
+def create_access_token(
+    sub: str, expires_minutes: int | None = None, claims: dict[str, Any] | None = None
+) -> str:
     expire_delta = timedelta(minutes=expires_minutes or settings.access_token_expire_minutes)
     to_encode = {
         "sub": sub,
         "iat": int(datetime.now(UTC).timestamp()),
         "exp": int((datetime.now(UTC) + expire_delta).timestamp()),
     }
+    if claims:
+        to_encode.update(claims)
     return jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+
+
+@profiled("jwt.decode")
+def decode_access_token(token: str) -> dict[str, Any]:
+    """
+    Valida firma y caducidad. Lanza jose.JWTError si el token no es válido.
+    """
+    return jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
@@ -0,0 +1,51 @@
+from datetime import UTC, datetime
+from email.message import EmailMessage
+
+from sqlalchemy import DateTime, Index, Integer, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class EmailOutbox(Base):
+    """
+    Emails pendientes, escritos en la misma transacción que el dato que los origina.
+    Los entrega el relay (python -m app.mail.relay).
+    """
+
+    __tablename__ = "email_outbox"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+    to_email: Mapped[str] = mapped_column(String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    # pending -> sent | failed
+    status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_error: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Solo las filas pendientes interesan al relay
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        # Purga de las ya entregadas o descartadas (app.mail.relay.purge_outbox)
+        Index(
+            "ix_email_outbox_done",
+            "created_at",
+            postgresql_where=text("status <> 'pending'"),
+        ),
+    )
+
+    @classmethod
+    def from_message(cls, kind: str, msg: EmailMessage) -> "EmailOutbox":
+        return cls(kind=kind, to_email=msg["To"], subject=msg["Subject"], body=msg.get_content())
@@ -0,0 +1,180 @@
+"""
+Relay del outbox transaccional: python -m app.mail.relay
+
+Cada iteración abre una transacción, reclama hasta MAIL_RELAY_BATCH_SIZE filas pendientes
+con SELECT ... FOR UPDATE SKIP LOCKED, las envía por una conexión SMTP persistente y guarda
+el resultado antes del commit. Varias instancias se reparten el trabajo sin enviar dos veces
+la misma fila: las filas bloqueadas por una instancia se las saltan las demás.
+La entrega es "al menos una vez": si el proceso muere entre el envío y el commit, la fila
+vuelve a quedar pendiente.
+
+Con la cola vacía, cada MAIL_OUTBOX_PURGE_INTERVAL_SECONDS el relay borra las filas enviadas
+o descartadas de más de MAIL_OUTBOX_RETENTION_DAYS, en lotes con un commit cada uno, para que
+la tabla no crezca sin límite.
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+from datetime import UTC, datetime, timedelta
+from email.message import EmailMessage
+
+import aiosmtplib
+from prometheus_client import start_http_server
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core import mailer
+from app.core.config import settings
+from app.core.logging import setup_logging
+from app.core.mail_outbox import SmtpSender, sender_from_settings
+from app.core.metrics import MAIL_OUTBOX_PENDING, MAIL_OUTBOX_PURGED, MAIL_SENT
+from app.db.session import ASYNC_DATABASE_URL
+from app.mail.models import EmailOutbox
+
+log = logging.getLogger("mail.relay")
+
+
+def to_message(row: EmailOutbox) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = mailer.MAIL_FROM
+    msg["To"] = row.to_email
+    msg["Subject"] = row.subject
+    msg.set_content(row.body)
+    return msg
+
+
+async def relay_once(
+    session_factory: async_sessionmaker[AsyncSession],
+    sender: SmtpSender,
+    batch_size: int,
+    max_attempts: int,
+    retry_base_seconds: float,
+) -> int:
+    """
+    Reclama y envía un lote. Devuelve cuántas filas ha procesado.
+    """
+    async with session_factory() as db, db.begin():
+        now = datetime.now(UTC)
+        rows = (
+            await db.scalars(
+                select(EmailOutbox)
+                .where(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+        ).all()
+        for row in rows:
+            try:
+                await sender.send(to_message(row))
+            except (aiosmtplib.SMTPException, OSError) as err:
+                row.attempts += 1
+                row.last_error = str(err)[:500]
+                permanent = isinstance(err, aiosmtplib.SMTPResponseException) and err.code >= 500
+                if permanent or row.attempts >= max_attempts:
+                    row.status = "failed"
+                    MAIL_SENT.labels("failed").inc()
+                    log.error("Email %s a %s descartado: %s", row.id, row.to_email, err)
+                else:
+                    delay = retry_base_seconds * 2 ** (row.attempts - 1)
+                    row.next_attempt_at = now + timedelta(seconds=delay)
+                    MAIL_SENT.labels("retry").inc()
+                continue
+            row.status = "sent"
+            row.sent_at = datetime.now(UTC)
+            MAIL_SENT.labels("sent").inc()
+    return len(rows)
+
+
+async def purge_outbox(
+    session_factory: async_sessionmaker[AsyncSession], before: datetime, batch_size: int
+) -> int:
+    """
+    Borra las filas enviadas o descartadas creadas antes de `before`, un lote por
+    transacción. Devuelve cuántas ha borrado.
+    """
+    total = 0
+    while True:
+        batch = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status != "pending", EmailOutbox.created_at < before)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with session_factory() as db, db.begin():
+            result = await db.execute(
+                delete(EmailOutbox)
+                .where(EmailOutbox.id.in_(batch))
+                .execution_options(synchronize_session=False)
+            )
+        total += result.rowcount
+        MAIL_OUTBOX_PURGED.inc(result.rowcount)
+        if result.rowcount < batch_size:
+            return total
+
+
+async def pending_count(session_factory: async_sessionmaker[AsyncSession]) -> int:
+    async with session_factory() as db:
+        return await db.scalar(
+            select(func.count()).select_from(EmailOutbox).where(EmailOutbox.status == "pending")
+        )
+
+
+async def run(once: bool = False) -> None:
+    engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True, pool_size=2)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    sender = sender_from_settings()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    log.info("Relay de email_outbox arrancado (lote=%d)", settings.mail_relay_batch_size)
+    next_purge = loop.time()
+    try:
+        while not stop.is_set():
+            processed = await relay_once(
+                session_factory,
+                sender,
+                batch_size=settings.mail_relay_batch_size,
+                max_attempts=settings.mail_max_attempts,
+                retry_base_seconds=settings.mail_retry_base_seconds,
+            )
+            if once:
+                break
+            if processed < settings.mail_relay_batch_size:
+                # Cola (casi) vacía: actualiza el gauge y espera antes de volver a mirar
+                MAIL_OUTBOX_PENDING.set(await pending_count(session_factory))
+                if loop.time() >= next_purge:
+                    before = datetime.now(UTC) - timedelta(days=settings.mail_outbox_retention_days)
+                    purged = await purge_outbox(
+                        session_factory, before, settings.mail_outbox_purge_batch_size
+                    )
+                    if purged:
+                        log.info("Borradas %d filas antiguas de email_outbox", purged)
+                    next_purge = loop.time() + settings.mail_outbox_purge_interval_seconds
+                try:
+                    await asyncio.wait_for(stop.wait(), settings.mail_relay_poll_seconds)
+                except TimeoutError:
+                    pass
+    finally:
+        await sender.close()
+        await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Relay de email_outbox -> SMTP")
+    parser.add_argument("--once", action="store_true", help="procesa un lote y termina")
+    args = parser.parse_args()
+
+    setup_logging()
+    if settings.mail_relay_metrics_port:
+        start_http_server(settings.mail_relay_metrics_port)
+    asyncio.run(run(once=args.once))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,53 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.auth.router import router as auth_router
-from app.profile import router as profile_router
+from app.auth.domains import email_domains
+from app.auth.sweeper import email_code_sweeper
+from app.core import profiling
+from app.core.config import settings
+from app.core.hashing import hasher
+from app.core.logging import RequestContextMiddleware, setup_logging, shutdown_logging
+from app.core.mail_outbox import mail_outbox
+from app.core.metrics import MetricsMiddleware, mark_process_dead, metrics_router
+from app.profile import serving as avatar_serving
+from app.profile.derivatives import avatar_processor
+from app.rides.live import live_hub
+
+# DB_ASYNC elige el stack de BD: routers async (AsyncSession) o síncronos (threadpool)
+if settings.db_async:
+    from app.auth.router_async import router as auth_router
+    from app.profile import router_async as profile_router
+    from app.rides import router_async as rides_router
+else:
+    from app.auth.router import router as auth_router
+    from app.profile import router as profile_router
+    from app.rides import router as rides_router
+
 
-app = FastAPI(title="UniGo", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    if settings.mail_outbox_enabled:
+        await mail_outbox.start()
+    if settings.email_code_sweep_enabled:
+        await email_code_sweeper.start()
+    if email_domains.dynamic:
+        await email_domains.start()
+    await live_hub.start()
+    yield
+    await live_hub.stop()
+    await email_domains.stop()
+    await email_code_sweeper.stop()
+    await mail_outbox.stop()
+    hasher.shutdown()
+    avatar_processor.shutdown()
+    mark_process_dead()
+    shutdown_logging()
+
+
+app = FastAPI(title="UniGo", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,7 +60,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # El frontend lee el ETag del perfil para mandarlo en If-Match
+    expose_headers=["ETag"],
 )
+app.add_middleware(MetricsMiddleware)
+# La más externa: el request_id ya está puesto en todo lo que se loguea durante la petición
+app.add_middleware(RequestContextMiddleware)
 
 
 @app.get("/health")
@@ -25,5 +73,13 @@ def health():
     return {"status": "ok"}
 
 
+app.include_router(metrics_router)
 app.include_router(auth_router)
 app.include_router(profile_router.router, prefix="/api")
+app.include_router(rides_router.router, prefix="/api")
+# Con AVATAR_STORE=s3 los avatares los sirve el bucket/CDN (AVATAR_PUBLIC_PREFIX absoluto)
+if settings.avatar_store == "local" and avatar_serving.PUBLIC_PREFIX.startswith("/"):
+    app.include_router(avatar_serving.router)
+
+# Solo se instala con PROFILING_ENABLED o PROFILING_SECRET; debe ir tras registrar las rutas
+profiling.install(app)
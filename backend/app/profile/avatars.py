@@ -0,0 +1,106 @@
+"""
+Guardado de avatares subidos.
+
+El UploadFile se lee por trozos de AVATAR_CHUNK_BYTES: el hash SHA-256 y la escritura de cada
+trozo van al threadpool (hashlib suelta el GIL con buffers grandes), así el event loop no se
+bloquea aunque se suban varias imágenes grandes a la vez. Si se supera AVATAR_MAX_BYTES se
+corta la lectura en ese trozo y se responde 413.
+
+La subida y sus variantes se preparan en un directorio de staging propio de la petición y
+después se publican en el almacén (app.profile.storage) bajo el hash completo: primero las
+variantes y el original el último, así nadie ve nunca un avatar a medias. Si el original ya
+existe (la misma foto subida antes, por este u otro usuario) no se escribe nada.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.profile.derivatives import avatar_processor
+from app.profile.storage import BlobStore, blob_key, store_from_settings
+
+AVATAR_DIR = os.getenv("AVATAR_DIR", "data/avatars")
+PUBLIC_PREFIX = os.getenv("AVATAR_PUBLIC_PREFIX", "/static/avatars")
+CONTENT_TYPES = {"image/png": ".png", "image/jpeg": ".jpg"}
+EXT_CONTENT_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".webp": "image/webp"}
+
+avatar_store = store_from_settings(AVATAR_DIR)
+
+
+def public_url(key: str) -> str:
+    return f"{PUBLIC_PREFIX}/{key}"
+
+
+def _open_staging() -> tuple[BinaryIO, str]:
+    # Dentro de AVATAR_DIR: con el backend local, publicar es un rename
+    root = os.path.join(AVATAR_DIR, ".staging")
+    os.makedirs(root, exist_ok=True)
+    workdir = tempfile.mkdtemp(dir=root)
+    return open(os.path.join(workdir, "upload"), "wb"), workdir
+
+
+def _consume(out: BinaryIO, digest, chunk: bytes) -> None:
+    digest.update(chunk)
+    out.write(chunk)
+
+
+def _publish(store: BlobStore, digest: str, ext: str, upload: str, variants: list[str]) -> None:
+    stem = os.path.join(os.path.dirname(upload), digest)
+    for path in variants:
+        suffix = path[len(stem) :]
+        store.put_file(blob_key(digest, suffix), path, EXT_CONTENT_TYPES[os.path.splitext(path)[1]])
+    store.put_file(blob_key(digest, ext), upload, EXT_CONTENT_TYPES[ext])
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"El avatar supera el máximo de {max_bytes // 1024} KB",
+    )
+
+
+async def store_upload(file: UploadFile) -> str:
+    """
+    Guarda el avatar y sus variantes (app.profile.derivatives) y devuelve la URL pública del
+    original.
+    """
+    ext = CONTENT_TYPES.get(file.content_type)
+    if ext is None:
+        raise HTTPException(status_code=400, detail="Tipo de archivo no permitido")
+
+    max_bytes = settings.avatar_max_bytes
+    # El parser multipart ya conoce el tamaño: se rechaza sin leer nada
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    digest = hashlib.sha256()
+    size = 0
+    out, workdir = await run_in_threadpool(_open_staging)
+    try:
+        try:
+            while chunk := await file.read(settings.avatar_chunk_bytes):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                await run_in_threadpool(_consume, out, digest, chunk)
+        finally:
+            await run_in_threadpool(out.close)
+
+        hexdigest = digest.hexdigest()
+        key = blob_key(hexdigest, ext)
+        if await run_in_threadpool(avatar_store.exists, key):
+            # Deduplicado: se renueva la fecha para que el GC no lo borre antes del commit
+            await run_in_threadpool(avatar_store.touch, key)
+            return public_url(key)
+
+        variants = await avatar_processor.render(out.name, os.path.join(workdir, hexdigest))
+        await run_in_threadpool(_publish, avatar_store, hexdigest, ext, out.name, variants)
+        return public_url(key)
+    finally:
+        await run_in_threadpool(shutil.rmtree, workdir, True)
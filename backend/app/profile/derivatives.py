@@ -0,0 +1,149 @@
+"""
+Variantes redimensionadas de los avatares.
+
+Antes de publicar el original, un pool de procesos (Pillow es CPU puro y el decodificado de
+imágenes no confiables mejor aislarlo) genera un cuadrado centrado en AVATAR_SIZES px, en
+WebP y JPEG, que se guardan junto al original: {stem}_{px}.webp / {stem}_{px}.jpg. El stem ya
+lleva el hash del contenido, así que las URLs de las variantes se deducen de avatar_url sin
+guardar nada más en BD.
+
+Para generar las variantes de los avatares antiguos (nombre {user_id}_{hash}.ext, fuera del
+almacén app.profile.storage):
+
+    cd backend && python -m app.profile.derivatives
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from PIL import Image, ImageOps, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.logging import setup_logging
+
+log = logging.getLogger("avatars.derivatives")
+
+AVATAR_SIZES = (64, 128, 256)
+# formato -> (extensión, opciones de Pillow)
+FORMATS = {
+    "webp": (".webp", {"format": "WEBP", "quality": 80, "method": 4}),
+    "jpeg": (".jpg", {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True}),
+}
+ORIGINAL_RE = re.compile(r"^\d+_[0-9a-f]{16}\.(png|jpg)$")
+
+
+def render_variants(src_path: str, max_pixels: int, out_stem: str | None = None) -> list[str]:
+    """
+    Genera todas las variantes de src_path como {out_stem}_{px}{ext} (por defecto junto al
+    original). Se ejecuta en el pool. Devuelve sus rutas.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels  # imágenes mayores -> DecompressionBombError
+    stem = out_stem or os.path.splitext(src_path)[0]
+    written = []
+    with Image.open(src_path) as img:
+        # JPEG: decodifica ya reducido (DCT scaling), mucho más rápido en fotos grandes
+        img.draft("RGB", (max(AVATAR_SIZES), max(AVATAR_SIZES)))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        for px in sorted(AVATAR_SIZES, reverse=True):
+            # Cada tamaño sale del anterior: menos píxeles que remuestrear
+            img = ImageOps.fit(img, (px, px), Image.Resampling.LANCZOS)
+            for ext, options in FORMATS.values():
+                path = f"{stem}_{px}{ext}"
+                tmp = f"{path}.tmp"
+                img.save(tmp, **options)
+                os.replace(tmp, path)
+                written.append(path)
+    return written
+
+
+class AvatarProcessor:
+    def __init__(self, workers: int, use_pool: bool = True):
+        self.workers = workers or os.cpu_count() or 1
+        self.use_pool = use_pool
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    async def render(self, src_path: str, out_stem: str | None = None) -> list[str]:
+        """
+        Genera las variantes; 400 si el fichero no es una imagen válida.
+        """
+        args = (src_path, settings.avatar_max_pixels, out_stem)
+        try:
+            if not self.use_pool:
+                return await run_in_threadpool(render_variants, *args)
+            return await asyncio.wrap_future(self._get_executor().submit(render_variants, *args))
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+            raise HTTPException(status_code=400, detail="La imagen no es válida") from err
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+avatar_processor = AvatarProcessor(
+    workers=settings.avatar_workers, use_pool=settings.avatar_process_pool
+)
+
+
+def variant_urls(avatar_url: str | None) -> dict[str, dict[str, str]] | None:
+    """
+    {"64": {"webp": url, "jpeg": url}, ...} a partir de la URL del original.
+    """
+    if not avatar_url:
+        return None
+    stem, _ = os.path.splitext(avatar_url)
+    return {
+        str(px): {fmt: f"{stem}_{px}{ext}" for fmt, (ext, _) in FORMATS.items()}
+        for px in AVATAR_SIZES
+    }
+
+
+def backfill(avatar_dir: str) -> int:
+    """
+    Genera las variantes que falten para los originales de avatar_dir.
+    """
+    done = 0
+    for name in sorted(os.listdir(avatar_dir)):
+        if not ORIGINAL_RE.match(name):
+            continue
+        stem, _ = os.path.splitext(os.path.join(avatar_dir, name))
+        if all(
+            os.path.exists(f"{stem}_{px}{ext}")
+            for px in AVATAR_SIZES
+            for ext, _ in FORMATS.values()
+        ):
+            continue
+        try:
+            render_variants(os.path.join(avatar_dir, name), settings.avatar_max_pixels)
+            done += 1
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+            log.warning("Avatar %s ignorado: %s", name, err)
+    return done
+
+
+def main() -> None:
+    from app.profile.avatars import AVATAR_DIR
+
+    setup_logging()
+    log.info("Variantes generadas para %d avatares", backfill(AVATAR_DIR))
+
+
+if __name__ == "__main__":
+    main()
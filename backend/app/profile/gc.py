@@ -0,0 +1,125 @@
+"""
+GC del almacén de avatares: python -m app.profile.gc [--dry-run]
+
+Recorre el almacén en orden de clave, agrupa original + variantes por hash y, por lotes de
+AVATAR_GC_BATCH_SIZE grupos, cuenta cuántos usuarios apuntan a cada original
+(users.avatar_url, indexado). Borra los grupos sin referencias cuyos ficheros tengan más de
+AVATAR_GC_GRACE_MINUTES: el margen cubre la ventana entre publicar un avatar y hacer commit
+del avatar_url (y la subida deduplicada renueva la fecha del original con touch()).
+
+El listado y las referencias de un lote se leen antes de decidir; justo antes de borrar se
+vuelven a leer las referencias y la fecha de cada blob candidato, y se respeta el grupo si
+alguien lo ha referenciado o tocado entretanto.
+"""
+
+import argparse
+import itertools
+import logging
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from operator import attrgetter
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.auth.models import User
+from app.core.config import settings
+from app.core.logging import setup_logging
+from app.db.session import SessionLocal
+from app.profile.avatars import CONTENT_TYPES, avatar_store, public_url
+from app.profile.storage import BlobInfo, BlobStore, blob_key
+
+log = logging.getLogger("avatars.gc")
+
+
+def reference_counts(db: Session, urls: list[str]) -> dict[str, int]:
+    rows = db.execute(
+        select(User.avatar_url, func.count())
+        .where(User.avatar_url.in_(urls))
+        .group_by(User.avatar_url)
+    )
+    return dict(rows.all())
+
+
+def _unreferenced(
+    db: Session, groups: list[tuple[str, list[BlobInfo]]]
+) -> list[tuple[str, list[BlobInfo]]]:
+    # URLs posibles del original de cada grupo (la extensión depende del tipo subido)
+    urls = {
+        digest: [public_url(blob_key(digest, ext)) for ext in CONTENT_TYPES.values()]
+        for digest, _ in groups
+    }
+    refs = reference_counts(db, [u for candidates in urls.values() for u in candidates])
+    return [(d, blobs) for d, blobs in groups if not any(refs.get(u) for u in urls[d])]
+
+
+def _unchanged(store: BlobStore, blobs: list[BlobInfo]) -> bool:
+    # touch() de una subida deduplicada (o el blob ya borrado) tras el listado
+    return all(store.modified(b.key) == b.modified for b in blobs)
+
+
+def _groups(store: BlobStore, batch_size: int) -> Iterator[list[tuple[str, list[BlobInfo]]]]:
+    groups = (
+        (digest, list(blobs))
+        for digest, blobs in itertools.groupby(store.iter_blobs(), key=attrgetter("digest"))
+    )
+    while batch := list(itertools.islice(groups, batch_size)):
+        yield batch
+
+
+def collect_garbage(
+    db: Session,
+    store: BlobStore,
+    batch_size: int,
+    grace: timedelta,
+    dry_run: bool = False,
+    now: datetime | None = None,
+) -> int:
+    """
+    Borra los grupos de blobs sin referencias. Devuelve cuántos blobs ha borrado.
+    """
+    cutoff = (now or datetime.now(UTC)) - grace
+    deleted = 0
+    for batch in _groups(store, batch_size):
+        candidates = [
+            (digest, blobs)
+            for digest, blobs in _unreferenced(db, batch)
+            # recién subido, quizá aún sin commit del avatar_url
+            if all(b.modified <= cutoff for b in blobs)
+        ]
+        if candidates:
+            # Revalidar justo antes de borrar, en una transacción nueva: primero referencias
+            # y luego fechas (la subida hace touch() antes del commit del avatar_url)
+            db.rollback()
+            candidates = [
+                (digest, blobs)
+                for digest, blobs in _unreferenced(db, candidates)
+                if _unchanged(store, blobs)
+            ]
+        garbage = [b.key for _, blobs in candidates for b in blobs]
+
+        if garbage and not dry_run:
+            store.delete_many(garbage)
+        deleted += len(garbage)
+    return deleted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GC del almacén de avatares")
+    parser.add_argument("--dry-run", action="store_true", help="cuenta, pero no borra")
+    args = parser.parse_args()
+
+    setup_logging()
+    with SessionLocal() as db:
+        deleted = collect_garbage(
+            db,
+            avatar_store,
+            batch_size=settings.avatar_gc_batch_size,
+            grace=timedelta(minutes=settings.avatar_gc_grace_minutes),
+            dry_run=args.dry_run,
+        )
+    log.info("%s %d blobs sin referencias", "Encontrados" if args.dry_run else "Borrados", deleted)
+
+
+if __name__ == "__main__":
+    main()
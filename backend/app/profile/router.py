@@ -1,35 +1,67 @@
-from fastapi import APIRouter, Depends, File, UploadFile
+from fastapi import APIRouter, Depends, File, Header, Request, Response, UploadFile
 from sqlalchemy.orm import Session
 
+from app.auth.cache import UserSnapshot
 from app.auth.models import User
 
 # Ajusta esta importación si tu dependencia vive en otro lugar:
-from app.auth.router import get_current_user
+from app.auth.router import get_current_snapshot, get_current_user
 from app.db.session import get_db
 from app.profile import service
-from app.profile.schemas import ProfileOut, ProfileUpdate
+from app.profile.schemas import ProfileOut, ProfilePatch, ProfileUpdate
+from app.profile.serving import etag_matches
 
 router = APIRouter(prefix="/me", tags=["Profile"])
 
 
 @router.get("/profile", response_model=ProfileOut)
-def get_profile(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_profile(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: UserSnapshot = Depends(get_current_snapshot),
+):
+    # Con AUTH_STATELESS el snapshot cacheado lleva profile_version: el 304 no toca la BD
+    etag = service.profile_etag(current_user)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=service.cache_headers(etag))
+    response.headers.update(service.cache_headers(etag))
     return service.get_profile(db, current_user)
 
 
 @router.put("/profile", response_model=ProfileOut)
 def update_profile(
     payload: ProfileUpdate,
+    response: Response,
+    if_match: str | None = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return service.update_profile(db, current_user, payload)
+    profile = service.update_profile(db, current_user, payload, if_match)
+    response.headers.update(service.cache_headers(service.profile_etag(current_user)))
+    return profile
+
+
+@router.patch("/profile", response_model=ProfileOut)
+def patch_profile(
+    payload: ProfilePatch,
+    response: Response,
+    if_match: str | None = Header(None),
+    db: Session = Depends(get_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    snap = service.patch_profile(db, current, payload, if_match)
+    response.headers.update(service.cache_headers(service.profile_etag(snap)))
+    return service.get_profile(db, snap)
 
 
 @router.post("/avatar", response_model=ProfileOut)
 async def upload_avatar(
+    response: Response,
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    return await service.upload_avatar(db, current_user, file)
+    profile = await service.upload_avatar(db, current_user, file)
+    response.headers.update(service.cache_headers(service.profile_etag(current_user)))
+    return profile
@@ -0,0 +1,67 @@
+# Variante de app.profile.router para DB_ASYNC=true
+from fastapi import APIRouter, Depends, File, Header, Request, Response, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.cache import UserSnapshot
+from app.auth.models import User
+from app.auth.router_async import get_current_snapshot, get_current_user
+from app.db.session import get_async_db
+from app.profile import service_async as service
+from app.profile.schemas import ProfileOut, ProfilePatch, ProfileUpdate
+from app.profile.service import cache_headers, profile_etag
+from app.profile.service import get_profile as build_profile
+from app.profile.serving import etag_matches
+
+router = APIRouter(prefix="/me", tags=["Profile"])
+
+
+@router.get("/profile", response_model=ProfileOut)
+async def get_profile(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_snapshot),
+):
+    etag = profile_etag(current_user)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
+    return build_profile(db, current_user)
+
+
+@router.put("/profile", response_model=ProfileOut)
+async def update_profile(
+    payload: ProfileUpdate,
+    response: Response,
+    if_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    profile = await service.update_profile(db, current_user, payload, if_match)
+    response.headers.update(cache_headers(profile_etag(current_user)))
+    return profile
+
+
+@router.patch("/profile", response_model=ProfileOut)
+async def patch_profile(
+    payload: ProfilePatch,
+    response: Response,
+    if_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    snap = await service.patch_profile(db, current, payload, if_match)
+    response.headers.update(cache_headers(profile_etag(snap)))
+    return build_profile(db, snap)
+
+
+@router.post("/avatar", response_model=ProfileOut)
+async def upload_avatar(
+    response: Response,
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    profile = await service.upload_avatar(db, current_user, file)
+    response.headers.update(cache_headers(profile_etag(current_user)))
+    return profile
@@ -1,6 +1,6 @@
 from typing import Literal
 
-from pydantic import BaseModel, HttpUrl, conint, constr, model_validator
+from pydantic import BaseModel, ConfigDict, HttpUrl, conint, constr, model_validator
 
 RideIntent = Literal["offers", "seeks", "both"]
 
@@ -29,5 +29,29 @@ class ProfileUpdate(ProfileBase):
         return self
 
 
+class ProfilePatch(BaseModel):
+    """
+    PATCH: solo se validan los campos enviados. Los obligatorios (RF-02) no se pueden
+    vaciar; el avatar solo cambia con POST /me/avatar.
+    """
+
+    model_config = ConfigDict(extra="forbid")
+
+    full_name: constr(strip_whitespace=True, min_length=1, max_length=150) | None = None
+    university: constr(strip_whitespace=True, min_length=1, max_length=150) | None = None
+    degree: constr(strip_whitespace=True, min_length=1, max_length=150) | None = None
+    course: conint(ge=1, le=6) | None = None
+    ride_intent: RideIntent | None = None
+
+    @model_validator(mode="after")
+    def _no_nulls(self) -> "ProfilePatch":
+        nulls = sorted(k for k in self.model_fields_set if getattr(self, k) is None)
+        if nulls:
+            raise ValueError(f"Faltan campos obligatorios: {', '.join(nulls)}")
+        return self
+
+
 class ProfileOut(ProfileBase):
     email: str
+    # {"64": {"webp": url, "jpeg": url}, "128": {...}, "256": {...}}
+    avatar_variants: dict[str, dict[str, str]] | None = None
@@ -1,18 +1,159 @@
-import hashlib
-import os
+import dataclasses
+import re
 
 from fastapi import HTTPException, UploadFile, status
+from sqlalchemy import Row, Update, or_, update
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.auth.models import User
-from app.profile.schemas import ProfileOut, ProfileUpdate
+from app.auth.cache import UserSnapshot, mark_user_dirty, user_cache
+from app.auth.models import PROFILE_FIELDS, User
+from app.core.config import settings
+from app.core.profiling import profiled
+from app.profile import avatars
+from app.profile.derivatives import variant_urls
+from app.profile.schemas import ProfileOut, ProfilePatch, ProfileUpdate
 
-AVATAR_DIR = os.getenv("AVATAR_DIR", "data/avatars")
-PUBLIC_PREFIX = os.getenv("AVATAR_PUBLIC_PREFIX", "/static/avatars")
 REQUIRED = ("full_name", "university", "degree", "course", "ride_intent")
+# Súbelo si cambia la forma de ProfileOut: invalida los ETag ya emitidos
+PROFILE_SCHEMA_REV = 1
 
 
-def get_profile(db: Session, user: User) -> ProfileOut:
+def profile_etag(user: User | UserSnapshot) -> str:
+    """
+    ETag fuerte del perfil: users.profile_version sube con cada cambio de PROFILE_FIELDS.
+    """
+    return f'"{user.id}.{user.profile_version or 0}.{PROFILE_SCHEMA_REV}"'
+
+
+def cache_headers(etag: str) -> dict[str, str]:
+    # private: lleva datos del usuario; no-cache: el navegador revalida con If-None-Match
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def _precondition_failed(etag: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="El perfil ha cambiado desde que lo cargaste; recarga antes de guardar",
+        headers={"ETag": etag},
+    )
+
+
+def check_if_match(if_match: str, user: User | UserSnapshot) -> None:
+    """
+    If-Match (comparación fuerte): 412 si el perfil cambió desde que el cliente lo leyó.
+    """
+    tags = [t.strip() for t in if_match.split(",")]
+    etag = profile_etag(user)
+    if "*" not in tags and etag not in tags:
+        raise _precondition_failed(etag)
+
+
+def profile_changes(current: UserSnapshot, payload: ProfilePatch) -> dict:
+    """
+    Campos del PATCH cuyo valor difiere del actual.
+    """
+    data = payload.model_dump(exclude_unset=True)
+    return {k: v for k, v in data.items() if getattr(current, k) != v}
+
+
+def patch_statement(current: UserSnapshot, changes: dict, if_match: str | None) -> Update:
+    """
+    UPDATE ... RETURNING de solo las columnas enviadas, que solo escribe si alguna difiere de
+    lo que hay en la BD (IS DISTINCT FROM): el snapshot puede venir de la caché y no saber qué
+    hay. Con If-Match la versión esperada va en el WHERE: la comprobación y la escritura son
+    atómicas, sin SELECT ... FOR UPDATE.
+    """
+    distinct = [getattr(User, k).is_distinct_from(v) for k, v in changes.items()]
+    stmt = (
+        update(User)
+        .where(User.id == current.id, User.token_version == current.token_version, or_(*distinct))
+        # UPDATE de Core: el before_update del ORM no corre, la versión se sube aquí
+        .values(**changes, profile_version=User.profile_version + 1)
+        .returning(User.profile_version, *(getattr(User, f) for f in PROFILE_FIELDS))
+    )
+    tags = [t.strip() for t in (if_match or "*").split(",")]
+    if "*" not in tags:
+        tag_re = re.compile(rf'^"{current.id}\.(\d+)\.{PROFILE_SCHEMA_REV}"$')
+        versions = [int(m.group(1)) for t in tags if (m := tag_re.match(t))]
+        stmt = stmt.where(User.profile_version.in_(versions))
+    return stmt
+
+
+def patched_snapshot(current: UserSnapshot, row: Row) -> UserSnapshot:
+    """
+    Snapshot tras el UPDATE (las columnas de perfil salen del RETURNING).
+    """
+    values = row._asdict()
+    ride = values["ride_intent"]
+    values["ride_intent"] = ride.value if hasattr(ride, "value") else ride
+    return dataclasses.replace(current, **values)
+
+
+def unpatched_snapshot(
+    current: UserSnapshot, user: User | None, if_match: str | None
+) -> UserSnapshot:
+    """
+    El UPDATE no escribió nada; se decide con la fila actual: 401 si el token se revocó entre
+    medias, 412 si If-Match no casa y, si no, no había nada que cambiar.
+    """
+    if user is None or (user.token_version or 0) != current.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    snap = UserSnapshot.from_user(user)
+    if if_match is not None:
+        check_if_match(if_match, snap)
+    return snap
+
+
+def patch_changes(current: UserSnapshot, payload: ProfilePatch) -> dict | None:
+    """
+    Columnas a mandar en el UPDATE, o None si se puede responder sin tocar la BD: solo
+    cuando el snapshot se leyó de la BD en esta petición. Uno de la caché puede ir por detrás
+    de otro worker, así que se manda todo lo recibido y decide la BD (ver patch_statement).
+    """
+    if not current.fresh:
+        return payload.model_dump(exclude_unset=True)
+    return profile_changes(current, payload) or None
+
+
+def cache_patched(snap: UserSnapshot) -> None:
+    # Tras el commit (que ya invalidó el snapshot viejo): el siguiente GET sigue sin queries
+    if settings.auth_stateless:
+        user_cache.set(snap)
+
+
+@profiled("profile.patch")
+def patch_profile(
+    db: Session, current: UserSnapshot, payload: ProfilePatch, if_match: str | None = None
+) -> UserSnapshot:
+    """
+    Aplica un PATCH en una sola ida a la BD (ninguna si no cambia nada y el snapshot es de
+    esta petición; una lectura más si el UPDATE no escribe).
+    """
+    changes = patch_changes(current, payload)
+    if changes is None:
+        if if_match is not None:
+            check_if_match(if_match, current)
+        return current
+
+    row = db.execute(patch_statement(current, changes, if_match)).first() if changes else None
+    if row is None:
+        user = db.get(User, current.id, populate_existing=True)
+        snap = unpatched_snapshot(current, user, if_match)
+        db.rollback()
+        return snap
+    snap = patched_snapshot(current, row)
+    mark_user_dirty(db, current.id)
+    db.commit()
+    cache_patched(snap)
+    return snap
+
+
+def get_profile(db: Session, user: User | UserSnapshot) -> ProfileOut:
     ride = user.ride_intent.name if hasattr(user.ride_intent, "name") else user.ride_intent
     return ProfileOut(
         email=user.email,
@@ -22,10 +163,19 @@ def get_profile(db: Session, user: User) -> ProfileOut:
         course=user.course,
         ride_intent=ride,
         avatar_url=user.avatar_url,
+        avatar_variants=variant_urls(user.avatar_url),
     )
 
 
-def update_profile(db: Session, user: User, payload: ProfileUpdate) -> ProfileOut:
+@profiled("profile.update")
+def update_profile(
+    db: Session, user: User, payload: ProfileUpdate, if_match: str | None = None
+) -> ProfileOut:
+    if if_match is not None:
+        # Bloquea la fila hasta el commit: dos pestañas no pueden pasar la comprobación a la vez
+        db.refresh(user, with_for_update=True)
+        check_if_match(if_match, user)
+
     data = payload.dict(exclude_unset=True)
     for k, v in data.items():
         setattr(user, k, v)
@@ -44,20 +194,16 @@ def update_profile(db: Session, user: User, payload: ProfileUpdate) -> ProfileOu
     return get_profile(db, user)
 
 
-async def upload_avatar(db: Session, user: User, file: UploadFile) -> ProfileOut:
-    if file.content_type not in {"image/png", "image/jpeg"}:
-        raise HTTPException(status_code=400, detail="Tipo de archivo no permitido")
-
-    os.makedirs(AVATAR_DIR, exist_ok=True)
-    raw = await file.read()
-    digest = hashlib.sha256(raw).hexdigest()[:16]
-    ext = ".jpg" if file.content_type == "image/jpeg" else ".png"
-    fname = f"{user.id}_{digest}{ext}"
-    with open(os.path.join(AVATAR_DIR, fname), "wb") as f:
-        f.write(raw)
-
-    user.avatar_url = f"{PUBLIC_PREFIX}/{fname}"
+def _save_avatar_url(db: Session, user: User, url: str) -> None:
+    user.avatar_url = url
     db.add(user)
     db.commit()
     db.refresh(user)
+
+
+@profiled("profile.upload_avatar")
+async def upload_avatar(db: Session, user: User, file: UploadFile) -> ProfileOut:
+    url = await avatars.store_upload(file)
+    # Sesión síncrona: el commit va al threadpool para no bloquear el event loop
+    await run_in_threadpool(_save_avatar_url, db, user, url)
     return get_profile(db, user)
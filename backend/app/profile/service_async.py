@@ -0,0 +1,83 @@
+"""
+Versión async de app.profile.service para el modo DB_ASYNC.
+La construcción de ProfileOut no toca la BD, así que se reutiliza la síncrona.
+"""
+
+from fastapi import HTTPException, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.cache import UserSnapshot, mark_user_dirty, user_cache
+from app.auth.models import User
+from app.core.config import settings
+from app.core.profiling import profiled
+from app.profile import avatars
+from app.profile.schemas import ProfileOut, ProfilePatch, ProfileUpdate
+from app.profile.service import (
+    REQUIRED,
+    check_if_match,
+    get_profile,
+    patch_changes,
+    patch_statement,
+    patched_snapshot,
+    unpatched_snapshot,
+)
+
+
+@profiled("profile.update")
+async def update_profile(
+    db: AsyncSession, user: User, payload: ProfileUpdate, if_match: str | None = None
+) -> ProfileOut:
+    if if_match is not None:
+        await db.refresh(user, with_for_update=True)
+        check_if_match(if_match, user)
+
+    data = payload.model_dump(exclude_unset=True)
+    for k, v in data.items():
+        setattr(user, k, v)
+
+    missing = [k for k in REQUIRED if getattr(user, k, None) in (None, "", 0)]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Faltan campos obligatorios: {', '.join(missing)}",
+        )
+
+    db.add(user)
+    await db.commit()
+    # expire_on_commit=False: el objeto sigue cargado, no hace falta refresh
+    return get_profile(db, user)
+
+
+@profiled("profile.patch")
+async def patch_profile(
+    db: AsyncSession, current: UserSnapshot, payload: ProfilePatch, if_match: str | None = None
+) -> UserSnapshot:
+    changes = patch_changes(current, payload)
+    if changes is None:
+        if if_match is not None:
+            check_if_match(if_match, current)
+        return current
+
+    row = None
+    if changes:
+        row = (await db.execute(patch_statement(current, changes, if_match))).first()
+    if row is None:
+        user = await db.get(User, current.id, populate_existing=True)
+        snap = unpatched_snapshot(current, user, if_match)
+        await db.rollback()
+        return snap
+    snap = patched_snapshot(current, row)
+    mark_user_dirty(db.sync_session, current.id)
+    await db.commit()
+    # Como service.cache_patched, pero sin bloquear el event loop con Redis
+    if settings.auth_stateless:
+        await user_cache.aset(snap)
+    return snap
+
+
+@profiled("profile.upload_avatar")
+async def upload_avatar(db: AsyncSession, user: User, file: UploadFile) -> ProfileOut:
+    user.avatar_url = await avatars.store_upload(file)
+    db.add(user)
+    await db.commit()
+    return get_profile(db, user)
@@ -0,0 +1,158 @@
+"""
+Servido de avatares desde el almacén local (AVATAR_PUBLIC_PREFIX -> AVATAR_DIR).
+
+El nombre de cada fichero ya es su hash de contenido, así que el contenido de una URL no
+cambia nunca: ETag fuerte sacado del nombre (sin leer el fichero), Cache-Control immutable
+de un año, 304 con If-None-Match y rangos de bytes (Range / If-Range).
+
+El cuerpo se envía con la extensión ASGI http.response.zerocopysend (sendfile) si el
+servidor la ofrece; si no, por trozos leídos en el threadpool. Detrás de nginx,
+AVATAR_ACCEL_REDIRECT_PREFIX delega el envío en nginx (X-Accel-Redirect, sendfile real).
+"""
+
+import os
+import re
+from email.utils import formatdate
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request, Response
+from starlette.concurrency import run_in_threadpool
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+from app.profile.avatars import AVATAR_DIR, EXT_CONTENT_TYPES, PUBLIC_PREFIX
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Almacén por hash (ab/cd/{sha256}[_px].ext) y avatares antiguos ({user_id}_{hash}[_px].ext)
+KEY_RE = re.compile(
+    r"^(?:[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}|\d+_[0-9a-f]{16})(?:_\d+)?\.(?:png|jpg|webp)$"
+)
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+router = APIRouter(prefix=PUBLIC_PREFIX, tags=["Avatars"])
+
+
+class FileRangeResponse(Response):
+    """
+    Envía [start, end] (inclusive) de path; send_body=False para HEAD.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        start: int,
+        end: int,
+        status_code: int,
+        headers: dict[str, str],
+        media_type: str,
+        send_body: bool = True,
+    ):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.count = end - start + 1
+        self.send_body = send_body
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        )
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        async with await anyio.open_file(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send(
+                    {
+                        "type": "http.response.zerocopysend",
+                        "file": f.wrapped,
+                        "offset": self.start,
+                        "count": self.count,
+                    }
+                )
+                return
+            await f.seek(self.start)
+            remaining = self.count
+            while True:
+                chunk = await f.read(min(self.chunk_size, remaining)) if remaining else b""
+                remaining -= len(chunk)
+                more = bool(chunk) and remaining > 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": more})
+                if not more:
+                    break
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """
+    If-None-Match: comparación débil (RFC 9110 13.1.2), admite lista y "*".
+    """
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Un único rango "bytes=a-b" / "a-" / "-n" -> (start, end). None = servir entero
+    (sin Range, o con varios rangos: se permite ignorarlos). 416 si no es satisfacible.
+    """
+    if not header:
+        return None
+    m = RANGE_RE.match(header.strip())
+    if m is None:
+        return None
+    first, last = m.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+@router.api_route("/{key:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_avatar(key: str, request: Request) -> Response:
+    if not KEY_RE.match(key):
+        raise HTTPException(status_code=404)
+    path = os.path.join(AVATAR_DIR, key)
+    try:
+        st = await run_in_threadpool(os.stat, path)
+    except FileNotFoundError as err:
+        raise HTTPException(status_code=404) from err
+
+    name = os.path.basename(key)
+    etag = f'"{name}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    media_type = EXT_CONTENT_TYPES[os.path.splitext(name)[1]]
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if settings.avatar_accel_redirect_prefix:
+        # nginx sirve el fichero (sendfile, rangos) y conserva estas cabeceras
+        headers["X-Accel-Redirect"] = f"{settings.avatar_accel_redirect_prefix}/{key}"
+        return Response(headers=headers, media_type=media_type)
+
+    size = st.st_size
+    if_range = request.headers.get("if-range")
+    byte_range = None
+    if if_range is None or if_range.strip() == etag:
+        byte_range = parse_range(request.headers.get("range"), size)
+    send_body = request.method != "HEAD"
+    if byte_range is None:
+        return FileRangeResponse(path, 0, size - 1, 200, headers, media_type, send_body)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end, 206, headers, media_type, send_body)
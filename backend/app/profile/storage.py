@@ -0,0 +1,209 @@
+"""
+Almacén de avatares direccionado por contenido.
+
+Cada imagen se guarda una sola vez bajo su SHA-256 completo, repartida en subdirectorios
+(ab/cd/abcd…ef.png) para que ningún directorio crezca sin límite; sus variantes van al lado
+({digest}_{px}.webp…). Dos usuarios que suben la misma foto comparten los ficheros: la
+"cuenta de referencias" es el número de filas de users cuyo avatar_url apunta al original, y
+el GC (python -m app.profile.gc) borra los grupos sin referencias.
+
+Backends con la misma API (AVATAR_STORE):
+- local: ficheros en AVATAR_DIR.
+- s3: bucket S3/MinIO (boto3, dependencia opcional).
+"""
+
+import os
+import re
+import shutil
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from app.core.config import settings
+
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}")
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    key: str
+    size: int
+    modified: datetime
+
+    @property
+    def digest(self) -> str:
+        return os.path.basename(self.key)[:64]
+
+
+def blob_key(digest: str, suffix: str) -> str:
+    """
+    Clave de un blob: ab/cd/{digest}{suffix}, p. ej. suffix=".png" o "_128.webp".
+    """
+    return f"{digest[:2]}/{digest[2:4]}/{digest}{suffix}"
+
+
+class BlobStore(ABC):
+    @abstractmethod
+    def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def put_file(self, key: str, path: str, content_type: str) -> None:
+        """
+        Sube (o mueve) el fichero local path a key. Se escribe entero o no se escribe.
+        """
+
+    @abstractmethod
+    def touch(self, key: str) -> None:
+        """
+        Renueva la fecha de modificación (protege del GC un blob recién reutilizado).
+        """
+
+    @abstractmethod
+    def modified(self, key: str) -> datetime | None:
+        """
+        Fecha de modificación actual del blob; None si ya no existe.
+        """
+
+    @abstractmethod
+    def iter_blobs(self) -> Iterator[BlobInfo]:
+        """
+        Todos los blobs, ordenados por clave (un grupo original+variantes queda contiguo).
+        """
+
+    @abstractmethod
+    def delete_many(self, keys: Iterable[str]) -> None: ...
+
+
+class LocalBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put_file(self, key: str, path: str, content_type: str) -> None:
+        dest = self._path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.chmod(path, 0o644)
+        # Mismo sistema de ficheros que el staging: rename atómico; si no, copia
+        shutil.move(path, dest)
+
+    def touch(self, key: str) -> None:
+        os.utime(self._path(key))
+
+    def modified(self, key: str) -> datetime | None:
+        try:
+            return datetime.fromtimestamp(os.stat(self._path(key)).st_mtime, UTC)
+        except FileNotFoundError:
+            return None
+
+    def iter_blobs(self) -> Iterator[BlobInfo]:
+        for shard1 in sorted(os.listdir(self.root)):
+            if len(shard1) != 2 or not os.path.isdir(self._path(shard1)):
+                continue  # staging, avatares antiguos sin shard...
+            for shard2 in sorted(os.listdir(self._path(shard1))):
+                for name in sorted(os.listdir(self._path(f"{shard1}/{shard2}"))):
+                    if not DIGEST_RE.match(name):
+                        continue
+                    key = f"{shard1}/{shard2}/{name}"
+                    st = os.stat(self._path(key))
+                    yield BlobInfo(key, st.st_size, datetime.fromtimestamp(st.st_mtime, UTC))
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+class S3BlobStore(BlobStore):
+    # Límite de DeleteObjects por llamada
+    DELETE_BATCH = 1000
+
+    def __init__(self, bucket: str, prefix: str = "", client=None, **client_kwargs):
+        if client is None:
+            import boto3  # dependencia opcional, solo con AVATAR_STORE=s3
+
+            client = boto3.client("s3", **client_kwargs)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def put_file(self, key: str, path: str, content_type: str) -> None:
+        self.client.upload_file(
+            path,
+            self.bucket,
+            self.prefix + key,
+            ExtraArgs={
+                "ContentType": content_type,
+                "CacheControl": "public, max-age=31536000, immutable",
+            },
+        )
+        os.unlink(path)
+
+    def touch(self, key: str) -> None:
+        # S3 no tiene utime: copiar el objeto sobre sí mismo actualiza LastModified
+        full = self.prefix + key
+        head = self.client.head_object(Bucket=self.bucket, Key=full)
+        self.client.copy_object(
+            Bucket=self.bucket,
+            Key=full,
+            CopySource={"Bucket": self.bucket, "Key": full},
+            MetadataDirective="REPLACE",
+            ContentType=head.get("ContentType", "application/octet-stream"),
+            CacheControl=head.get("CacheControl", ""),
+        )
+
+    def modified(self, key: str) -> datetime | None:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as err:
+            if err.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return head["LastModified"]
+
+    def iter_blobs(self) -> Iterator[BlobInfo]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for obj in page.get("Contents", []):
+                key = obj["Key"][len(self.prefix) :]
+                if DIGEST_RE.match(os.path.basename(key)):
+                    yield BlobInfo(key, obj["Size"], obj["LastModified"])
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        for i in range(0, len(keys), self.DELETE_BATCH):
+            objects = [{"Key": self.prefix + k} for k in keys[i : i + self.DELETE_BATCH]]
+            self.client.delete_objects(
+                Bucket=self.bucket, Delete={"Objects": objects, "Quiet": True}
+            )
+
+
+def store_from_settings(avatar_dir: str) -> BlobStore:
+    if settings.avatar_store == "s3":
+        return S3BlobStore(
+            settings.avatar_s3_bucket,
+            prefix=settings.avatar_s3_prefix,
+            endpoint_url=settings.avatar_s3_endpoint_url or None,
+            region_name=settings.avatar_s3_region or None,
+        )
+    return LocalBlobStore(avatar_dir)
@@ -0,0 +1,55 @@
+"""
+Índice espacial sin PostGIS: rejilla fija de CELL_DEG grados.
+
+Cada viaje guarda la celda de su origen (un entero) en rides.origin_cell, indexada junto a la
+hora de salida. Una búsqueda "a menos de N km" se traduce en las pocas celdas que cubren el
+rectángulo que contiene al círculo (origin_cell IN (...), B-tree) y después se filtra por
+distancia exacta (haversine). Con CELL_DEG = 0.1 (~11 km de latitud) un radio de 10 km son
+3x3 o 4x4 celdas.
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEG = 0.1
+ROWS = round(180 / CELL_DEG)
+COLS = round(360 / CELL_DEG)
+MAX_RADIUS_KM = 50.0
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _row(lat: float) -> int:
+    return min(max(math.floor((lat + 90) / CELL_DEG), 0), ROWS - 1)
+
+
+def _col(lon: float) -> int:
+    return math.floor((lon + 180) / CELL_DEG) % COLS
+
+
+def cell_of(lat: float, lon: float) -> int:
+    return _row(lat) * COLS + _col(lon)
+
+
+def cells_within(lat: float, lon: float, radius_km: float) -> list[int]:
+    """
+    Celdas que cubren el rectángulo que contiene al círculo (lat, lon, radius_km).
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    # El grado de longitud se estrecha hacia los polos; se usa la latitud más alejada del ecuador
+    far_lat = min(abs(lat) + dlat, 89.9)
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(far_lat))))
+    rows = range(_row(lat - dlat), _row(lat + dlat) + 1)
+    if dlon >= 180:
+        cols = range(COLS)
+    else:
+        first, last = _col(lon - dlon), _col(lon + dlon)
+        # Cruce del antimeridiano: last < first
+        cols = range(first, last + 1) if first <= last else [*range(first, COLS), *range(last + 1)]
+    return [r * COLS + c for r in rows for c in cols]
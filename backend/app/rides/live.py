@@ -0,0 +1,380 @@
+"""
+Cambios de viajes en tiempo real por WebSocket (/api/rides/live).
+
+El cliente se suscribe a viajes concretos o a zonas y recibe los cambios sin sondear:
+
+    -> {"op": "subscribe", "rides": [12, 15]}
+    -> {"op": "subscribe", "area": {"lat": 37.18, "lon": -3.6, "radius_km": 5}}
+    <- {"type": "ride.seats", "ride_id": 12, "seats_left": 2}
+
+Los temas son ride:<id> y cell:<celda> (las celdas de app.rides.geo). Una zona se aproxima por
+las celdas que cubren el radio, así que pueden llegar viajes algo más lejanos (ride.published
+lleva el viaje entero para que el cliente filtre por distancia). Los servicios publican tras
+el commit: ride.published, ride.cancelled y ride.seats (reservas y sus cancelaciones).
+Los eventos llevan el estado (seats_left), no incrementos: quien esté suscrito al viaje y a
+su zona puede recibir el mismo evento dos veces sin problema.
+
+- LiveHub reparte dentro del proceso. Cada conexión tiene su cola acotada
+  (RIDE_LIVE_QUEUE_MAX) que una tarea vacía al socket; si un cliente no lee y la cola se
+  llena, se le expulsa (cierre 1013) en vez de acumular memoria o frenar a los demás.
+- Con RIDE_LIVE_BACKEND=redis los eventos pasan por Redis pub/sub para llegar a los clientes
+  de todos los workers; cada worker solo se suscribe a los canales con clientes locales.
+- publish() no bloquea y se puede llamar desde cualquier hilo (los servicios síncronos corren
+  en el threadpool). Los eventos son avisos, no un log: tras reconectar, el cliente debe
+  volver a pedir el estado por HTTP.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+from collections.abc import Awaitable, Callable, Iterable
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from app.auth.cache import UserSnapshot
+from app.auth.router import WS_AUTH_PROTOCOL
+from app.core.config import settings
+from app.core.metrics import RIDE_LIVE_CONNECTIONS, RIDE_LIVE_EVICTIONS, RIDE_LIVE_MESSAGES
+from app.rides.geo import cell_of, cells_within
+from app.rides.schemas import LiveCommand, RideOut
+
+log = logging.getLogger("rides.live")
+
+Deliver = Callable[[str, str], None]
+TokenCheck = Callable[[], Awaitable[bool]]
+
+
+def ride_topic(ride_id: int) -> str:
+    return f"ride:{ride_id}"
+
+
+def cell_topic(cell: int) -> str:
+    return f"cell:{cell}"
+
+
+def command_topics(cmd: LiveCommand) -> set[str]:
+    topics = {ride_topic(ride_id) for ride_id in cmd.rides}
+    if cmd.area is not None:
+        a = cmd.area
+        topics.update(cell_topic(c) for c in cells_within(a.lat, a.lon, a.radius_km))
+    return topics
+
+
+class Subscriber:
+    __slots__ = ("queue", "topics", "evicted")
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize)
+        self.topics: set[str] = set()
+        self.evicted = asyncio.Event()
+
+
+class MemoryBroker:
+    """
+    Un solo proceso: lo publicado se entrega directamente a las conexiones locales.
+    """
+
+    local_only = True
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        pass
+
+    def publish(self, topic: str, data: str) -> None:
+        self._deliver(topic, data)
+
+    def subscribe(self, topic: str) -> None:
+        pass
+
+    def unsubscribe(self, topic: str) -> None:
+        pass
+
+
+class RedisBroker:
+    """
+    Fan-out entre workers. Todas las órdenes a Redis (PUBLISH, SUBSCRIBE, UNSUBSCRIBE) pasan
+    por una cola y una sola tarea, así publish/subscribe no esperan a la red; otra tarea lee
+    los mensajes de los canales suscritos y los entrega en local.
+    """
+
+    local_only = False
+
+    def __init__(self, url: str, prefix: str = "unigo:rides:", queue_max: int = 10_000):
+        self._url = url
+        self._prefix = prefix
+        self._queue_max = queue_max
+        self._tasks: list[asyncio.Task] = []
+        self._listener: asyncio.Task | None = None
+
+    async def start(self, deliver: Deliver) -> None:
+        import redis.asyncio as redis  # dependencia opcional, solo con RIDE_LIVE_BACKEND=redis
+
+        self._deliver = deliver
+        self._redis = redis.Redis.from_url(self._url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._commands: asyncio.Queue[tuple[str, str, str | None]] = asyncio.Queue(self._queue_max)
+        self._tasks = [asyncio.create_task(self._run_commands())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._listener = [], None
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+
+    def _enqueue(self, op: str, topic: str, data: str | None = None) -> None:
+        try:
+            self._commands.put_nowait((op, self._prefix + topic, data))
+        except asyncio.QueueFull:
+            RIDE_LIVE_MESSAGES.labels("lost").inc()
+            log.warning("Cola de Redis llena: se descarta %s %s", op, topic)
+
+    def publish(self, topic: str, data: str) -> None:
+        self._enqueue("publish", topic, data)
+
+    def subscribe(self, topic: str) -> None:
+        self._enqueue("subscribe", topic)
+
+    def unsubscribe(self, topic: str) -> None:
+        self._enqueue("unsubscribe", topic)
+
+    async def _run_commands(self) -> None:
+        while True:
+            op, channel, data = await self._commands.get()
+            try:
+                if op == "publish":
+                    await self._redis.publish(channel, data)
+                elif op == "subscribe":
+                    await self._pubsub.subscribe(channel)
+                    # get_message falla sin conexión, que se abre con la primera suscripción
+                    if self._listener is None:
+                        self._listener = asyncio.create_task(self._listen())
+                        self._tasks.append(self._listener)
+                else:
+                    await self._pubsub.unsubscribe(channel)
+            except Exception:
+                if op == "publish":
+                    RIDE_LIVE_MESSAGES.labels("lost").inc()
+                log.exception("Redis pub/sub: falló %s %s", op, channel)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception:
+                log.exception("Redis pub/sub: error leyendo mensajes")
+                await asyncio.sleep(1.0)
+                continue
+            if msg and msg["type"] == "message":
+                self._deliver(msg["channel"].decode()[len(self._prefix) :], msg["data"].decode())
+
+
+class LiveHub:
+    def __init__(self, broker: MemoryBroker | RedisBroker, queue_max: int, max_topics: int):
+        self._broker = broker
+        self._queue_max = queue_max
+        self._max_topics = max_topics
+        self._topics: dict[str, set[Subscriber]] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def start(self) -> None:
+        """
+        Idempotente; lo llama el lifespan y, por si acaso, cada conexión nueva.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._topics.clear()
+        await self._broker.start(self._deliver)
+
+    async def stop(self) -> None:
+        if self._loop is not None:
+            self._loop = None
+            await self._broker.stop()
+
+    def connect(self) -> Subscriber:
+        return Subscriber(self._queue_max)
+
+    def subscribe(self, sub: Subscriber, topics: Iterable[str]) -> None:
+        new = set(topics) - sub.topics
+        if len(sub.topics) + len(new) > self._max_topics:
+            raise ValueError(f"Máximo {self._max_topics} suscripciones por conexión")
+        for topic in new:
+            subs = self._topics.get(topic)
+            if subs is None:
+                subs = self._topics[topic] = set()
+                self._broker.subscribe(topic)
+            subs.add(sub)
+        sub.topics |= new
+
+    def unsubscribe(self, sub: Subscriber, topics: Iterable[str]) -> None:
+        for topic in sub.topics.intersection(topics):
+            subs = self._topics.get(topic)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._topics[topic]
+                    self._broker.unsubscribe(topic)
+            sub.topics.discard(topic)
+
+    def disconnect(self, sub: Subscriber) -> None:
+        self.unsubscribe(sub, tuple(sub.topics))
+
+    def offer(self, sub: Subscriber, data: str) -> None:
+        """
+        Encola para una conexión; si su cola está llena, la expulsa.
+        """
+        if sub.evicted.is_set():
+            return
+        try:
+            sub.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.disconnect(sub)
+            sub.evicted.set()
+            RIDE_LIVE_EVICTIONS.inc()
+            return
+        RIDE_LIVE_MESSAGES.labels("queued").inc()
+
+    def _deliver(self, topic: str, data: str) -> None:
+        for sub in tuple(self._topics.get(topic, ())):
+            self.offer(sub, data)
+
+    def _publish(self, topics: Iterable[str], data: str) -> None:
+        for topic in topics:
+            self._broker.publish(topic, data)
+
+    def publish(self, topics: Iterable[str], event: dict) -> None:
+        """
+        Publica un evento en varios temas. No bloquea; segura desde cualquier hilo.
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        if self._broker.local_only:
+            # Sin nadie escuchando en este proceso no hace falta ni serializar
+            topics = [t for t in topics if t in self._topics]
+            if not topics:
+                return
+        data = json.dumps(event, default=str)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._publish(topics, data)
+        else:
+            loop.call_soon_threadsafe(self._publish, topics, data)
+
+
+def _build_broker() -> MemoryBroker | RedisBroker:
+    if settings.ride_live_backend == "redis":
+        return RedisBroker(settings.redis_url)
+    return MemoryBroker()
+
+
+live_hub = LiveHub(
+    _build_broker(),
+    queue_max=settings.ride_live_queue_max,
+    max_topics=settings.ride_live_max_topics,
+)
+
+
+def ride_published(ride: RideOut) -> None:
+    live_hub.publish(
+        (cell_topic(cell_of(ride.origin_lat, ride.origin_lon)),),
+        {"type": "ride.published", "ride": ride.model_dump(mode="json")},
+    )
+
+
+def ride_cancelled(ride: RideOut) -> None:
+    live_hub.publish(
+        (ride_topic(ride.id), cell_topic(cell_of(ride.origin_lat, ride.origin_lon))),
+        {"type": "ride.cancelled", "ride_id": ride.id},
+    )
+
+
+def seats_changed(ride_id: int, cell: int, seats_left: int) -> None:
+    live_hub.publish(
+        (ride_topic(ride_id), cell_topic(cell)),
+        {"type": "ride.seats", "ride_id": ride_id, "seats_left": seats_left},
+    )
+
+
+async def _write(websocket: WebSocket, sub: Subscriber) -> None:
+    while True:
+        await websocket.send_text(await sub.queue.get())
+
+
+def _reply(sub: Subscriber, raw: str) -> dict:
+    try:
+        cmd = LiveCommand.model_validate_json(raw)
+        topics = command_topics(cmd)
+        if cmd.op == "subscribe":
+            live_hub.subscribe(sub, topics)
+        else:
+            live_hub.unsubscribe(sub, topics)
+    except ValidationError as err:
+        return {"type": "error", "detail": err.errors(include_url=False, include_context=False)}
+    except ValueError as err:
+        return {"type": "error", "detail": str(err)}
+    return {"type": "ok", "op": cmd.op, "topics": len(sub.topics)}
+
+
+async def _read(websocket: WebSocket, sub: Subscriber) -> None:
+    while True:
+        live_hub.offer(sub, json.dumps(_reply(sub, await websocket.receive_text()), default=str))
+
+
+async def _watch_token(still_valid: TokenCheck, interval: float) -> None:
+    # Sale (y se cierra con 1008) cuando el token caduca o se revoca tras el handshake
+    while True:
+        await asyncio.sleep(interval)
+        if not await still_valid():
+            return
+
+
+async def serve(websocket: WebSocket, user: UserSnapshot, still_valid: TokenCheck) -> None:
+    """
+    Atiende una conexión ya autenticada hasta que el cliente se va, se le expulsa o su token
+    deja de valer (se comprueba cada RIDE_LIVE_AUTH_CHECK_SECONDS).
+    """
+    await live_hub.start()
+    # Si el token llegó en Sec-WebSocket-Protocol el navegador exige que se acepte el protocolo
+    auth = WS_AUTH_PROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=WS_AUTH_PROTOCOL if auth else None)
+    sub = live_hub.connect()
+    RIDE_LIVE_CONNECTIONS.inc()
+    watch = asyncio.create_task(_watch_token(still_valid, settings.ride_live_auth_check_seconds))
+    tasks = [
+        asyncio.create_task(_read(websocket, sub)),
+        asyncio.create_task(_write(websocket, sub)),
+        asyncio.create_task(sub.evicted.wait()),
+        watch,
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            err = None if task.cancelled() else task.exception()
+            if err is not None and not isinstance(err, WebSocketDisconnect):
+                log.warning("WebSocket del usuario %s: %r", user.id, err)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        live_hub.disconnect(sub)
+        RIDE_LIVE_CONNECTIONS.dec()
+    if sub.evicted.is_set():
+        code, reason = status.WS_1013_TRY_AGAIN_LATER, "slow consumer"
+    elif watch.done() and not watch.cancelled() and watch.exception() is None:
+        code, reason = status.WS_1008_POLICY_VIOLATION, "token revoked"
+    else:
+        return
+    # Un cliente que no lee puede tener el buffer TCP lleno: no esperar al cierre sin límite
+    with contextlib.suppress(Exception):
+        await asyncio.wait_for(websocket.close(code=code, reason=reason), timeout=5.0)
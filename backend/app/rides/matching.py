@@ -0,0 +1,245 @@
+"""
+Motor de emparejamiento en memoria: ofertas activas en columnas NumPy por universidad.
+
+Cada universidad (users.university del conductor, copiada en rides.university) tiene un
+OfferColumns: una matriz float64 de columnas (origen y destino en radianes con su coseno
+precalculado, ventana de salida en segundos epoch y plazas libres) y vectores de ids de viaje
+y de conductor. Un emparejamiento filtra todas las ofertas de una pasada vectorizada
+(ventana y plazas; después, las dos distancias haversine de las que quedan), puntúa con el
+desfase horario y saca el top-k con argpartition: sin ir fila a fila en Python ni consultar
+la BD.
+
+Las altas, cancelaciones y cambios de plazas del propio proceso se aplican al momento
+(add/remove/set_seats, O(1) con borrado por intercambio con la última fila). Lo que hagan
+otros workers se recoge al recargar: una universidad se recarga de la BD cuando su copia
+tiene más de RIDE_MATCH_REFRESH_SECONDS, y así también salen las ofertas ya pasadas.
+"""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from app.core.config import settings
+from app.rides.geo import EARTH_RADIUS_KM
+from app.rides.schemas import as_utc
+
+# Penalización por desfase horario en el coste: 10 minutos pesan como 1 km de desvío
+KM_PER_MINUTE = 0.1
+
+# Filas de OfferColumns.data
+O_LAT, O_LON, O_COS, D_LAT, D_LON, D_COS, EARLIEST, LATEST, SEATS = range(9)
+N_COLS = 9
+
+
+@dataclass(frozen=True)
+class MatchQuery:
+    origin_lat: float
+    origin_lon: float
+    dest_lat: float
+    dest_lon: float
+    start: datetime
+    end: datetime
+    radius_km: float = 5.0
+    seats: int = 1
+    # Los viajes propios no se ofrecen a quien busca
+    exclude_driver: int | None = None
+
+
+@dataclass(frozen=True)
+class Match:
+    ride_id: int
+    score: float
+    origin_km: float
+    dest_km: float
+
+
+def _ts(value: datetime) -> float:
+    return as_utc(value).timestamp()
+
+
+def offer_row(ride) -> tuple[int, int, list[float]]:
+    """
+    (id, driver_id, columnas) de un Ride o de una fila con los mismos atributos.
+    """
+    o_lat, d_lat = math.radians(ride.origin_lat), math.radians(ride.dest_lat)
+    # Mismo orden que O_LAT ... SEATS
+    values = [
+        o_lat,
+        math.radians(ride.origin_lon),
+        math.cos(o_lat),
+        d_lat,
+        math.radians(ride.dest_lon),
+        math.cos(d_lat),
+        _ts(ride.departure_earliest),
+        _ts(ride.departure_latest),
+        ride.seats_left,
+    ]
+    return ride.id, ride.driver_id, values
+
+
+class OfferColumns:
+    """
+    Ofertas de una universidad. Las filas válidas son [0, n); la capacidad se dobla al llenarse.
+    """
+
+    def __init__(self, capacity: int = 64):
+        self.n = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.drivers = np.empty(capacity, dtype=np.int64)
+        self.data = np.empty((N_COLS, capacity), dtype=np.float64)
+        self.slots: dict[int, int] = {}
+
+    @classmethod
+    def from_offers(cls, rides) -> "OfferColumns":
+        rows = [offer_row(ride) for ride in rides]
+        columns = cls(max(64, len(rows)))
+        if rows:
+            ids, drivers, values = zip(*rows, strict=True)
+            n = len(rows)
+            columns.ids[:n] = ids
+            columns.drivers[:n] = drivers
+            columns.data[:, :n] = np.array(values, dtype=np.float64).T
+            columns.slots = {ride_id: slot for slot, ride_id in enumerate(ids)}
+            columns.n = n
+        return columns
+
+    def _grow(self, needed: int) -> None:
+        capacity = self.ids.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        ids = np.empty(capacity, dtype=np.int64)
+        drivers = np.empty(capacity, dtype=np.int64)
+        data = np.empty((N_COLS, capacity), dtype=np.float64)
+        ids[: self.n] = self.ids[: self.n]
+        drivers[: self.n] = self.drivers[: self.n]
+        data[:, : self.n] = self.data[:, : self.n]
+        self.ids, self.drivers, self.data = ids, drivers, data
+
+    def put(self, ride_id: int, driver_id: int, values: list[float]) -> None:
+        slot = self.slots.get(ride_id)
+        if slot is None:
+            self._grow(self.n + 1)
+            slot = self.n
+            self.n += 1
+            self.slots[ride_id] = slot
+            self.ids[slot] = ride_id
+            self.drivers[slot] = driver_id
+        self.data[:, slot] = values
+
+    def remove(self, ride_id: int) -> None:
+        slot = self.slots.pop(ride_id, None)
+        if slot is None:
+            return
+        last = self.n - 1
+        if slot != last:
+            moved = int(self.ids[last])
+            self.ids[slot] = moved
+            self.drivers[slot] = self.drivers[last]
+            self.data[:, slot] = self.data[:, last]
+            self.slots[moved] = slot
+        self.n = last
+
+    def set_seats(self, ride_id: int, seats: int) -> None:
+        slot = self.slots.get(ride_id)
+        if slot is not None:
+            self.data[SEATS, slot] = seats
+
+    def match(self, q: MatchQuery, now: float, limit: int) -> list[Match]:
+        d = self.data[:, : self.n]
+        start, end = _ts(q.start), _ts(q.end)
+        # Primero las comparaciones baratas (ventana, plazas, conductor); la trigonometría
+        # solo se calcula para las ofertas que las pasan
+        ok = (d[EARLIEST] <= end) & (d[LATEST] >= max(start, now)) & (d[SEATS] >= q.seats)
+        if q.exclude_driver is not None:
+            ok &= self.drivers[: self.n] != q.exclude_driver
+        idx = np.flatnonzero(ok)
+        if idx.size == 0:
+            return []
+        c = d[:, idx]
+        lat1, lat2 = math.radians(q.origin_lat), math.radians(q.dest_lat)
+        origin_km = _haversine(lat1, math.radians(q.origin_lon), math.cos(lat1), c, O_LAT)
+        dest_km = _haversine(lat2, math.radians(q.dest_lon), math.cos(lat2), c, D_LAT)
+        near = np.flatnonzero((origin_km <= q.radius_km) & (dest_km <= q.radius_km))
+        if near.size == 0:
+            return []
+        # Desfase entre el centro de la ventana del viaje y el de la buscada
+        offset_min = np.abs((c[EARLIEST, near] + c[LATEST, near]) - (start + end)) / 120.0
+        cost = origin_km[near] + dest_km[near] + offset_min * KM_PER_MINUTE
+        if near.size > limit:
+            top = np.argpartition(cost, limit - 1)[:limit]
+            near, cost = near[top], cost[top]
+        order = np.argsort(cost, kind="stable")
+        return [
+            Match(int(self.ids[idx[i]]), float(cost_i), float(origin_km[i]), float(dest_km[i]))
+            for i, cost_i in zip(near[order], cost[order], strict=True)
+        ]
+
+
+def _haversine(lat: float, lon: float, cos_lat: float, d: np.ndarray, col: int) -> np.ndarray:
+    # Las columnas (lat, lon, cos) de origen y destino van seguidas en OfferColumns.data
+    a = (
+        np.sin((d[col] - lat) * 0.5) ** 2
+        + cos_lat * d[col + 2] * np.sin((d[col + 1] - lon) * 0.5) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class RideMatcher:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._offers: dict[str, OfferColumns] = {}
+        self._loaded_at: dict[str, float] = {}
+
+    def is_stale(self, university: str) -> bool:
+        loaded_at = self._loaded_at.get(university)
+        return loaded_at is None or time.monotonic() - loaded_at > self.refresh_seconds
+
+    def load(self, university: str, rides) -> None:
+        """
+        Sustituye las ofertas de la universidad por rides (ver service.offers_statement).
+        """
+        columns = OfferColumns.from_offers(rides)
+        with self._lock:
+            self._offers[university] = columns
+            self._loaded_at[university] = time.monotonic()
+
+    def add(self, ride) -> None:
+        # Si la universidad no está cargada, la oferta entra en la primera carga
+        with self._lock:
+            columns = self._offers.get(ride.university)
+            if columns is not None:
+                columns.put(*offer_row(ride))
+
+    def remove(self, university: str, ride_id: int) -> None:
+        with self._lock:
+            columns = self._offers.get(university)
+            if columns is not None:
+                columns.remove(ride_id)
+
+    def set_seats(self, university: str, ride_id: int, seats: int) -> None:
+        with self._lock:
+            columns = self._offers.get(university)
+            if columns is not None:
+                columns.set_seats(ride_id, seats)
+
+    def match(self, university: str, q: MatchQuery, limit: int = 10) -> list[Match]:
+        with self._lock:
+            columns = self._offers.get(university)
+            if columns is None:
+                return []
+            return columns.match(q, time.time(), limit)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._offers.clear()
+            self._loaded_at.clear()
+
+
+ride_matcher = RideMatcher(settings.ride_match_refresh_seconds)
@@ -0,0 +1,103 @@
+import enum
+from datetime import UTC, datetime
+
+from sqlalchemy import (
+    BigInteger,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    text,
+)
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.session import Base
+
+
+class RideStatus(str, enum.Enum):
+    active = "active"
+    cancelled = "cancelled"
+
+
+class Ride(Base):
+    __tablename__ = "rides"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    driver_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    # Copiada del perfil del conductor al publicar: el emparejamiento se agrupa por universidad
+    university: Mapped[str] = mapped_column(String(150), nullable=False)
+    origin_lat: Mapped[float] = mapped_column(Float, nullable=False)
+    origin_lon: Mapped[float] = mapped_column(Float, nullable=False)
+    origin_label: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    # Celda de la rejilla de app.rides.geo que contiene el origen
+    origin_cell: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    dest_lat: Mapped[float] = mapped_column(Float, nullable=False)
+    dest_lon: Mapped[float] = mapped_column(Float, nullable=False)
+    dest_label: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    # Ventana de salida [departure_earliest, departure_latest]
+    departure_earliest: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    departure_latest: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    seats_total: Mapped[int] = mapped_column(Integer, nullable=False)
+    seats_left: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[RideStatus] = mapped_column(
+        Enum(RideStatus), default=RideStatus.active, nullable=False
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+
+    __table_args__ = (
+        # Búsqueda por cercanía: origin_cell IN (...) AND departure_earliest <= :hasta.
+        # Solo viajes activos: los cancelados no ocupan el índice.
+        Index(
+            "ix_rides_active_cell_departure",
+            "origin_cell",
+            "departure_earliest",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+        # Carga de las ofertas de una universidad en el motor de emparejamiento
+        Index(
+            "ix_rides_active_university_departure",
+            "university",
+            "departure_latest",
+            postgresql_where=text("status = 'active'"),
+            sqlite_where=text("status = 'active'"),
+        ),
+    )
+
+
+class BookingStatus(str, enum.Enum):
+    confirmed = "confirmed"
+    cancelled = "cancelled"
+
+
+class Booking(Base):
+    __tablename__ = "bookings"
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    ride_id: Mapped[int] = mapped_column(
+        ForeignKey("rides.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    passenger_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    seats: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[BookingStatus] = mapped_column(
+        Enum(BookingStatus), default=BookingStatus.confirmed, nullable=False
+    )
+    # Cabecera Idempotency-Key del cliente: un reintento devuelve la reserva ya creada
+    idempotency_key: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+
+    __table_args__ = (
+        UniqueConstraint(
+            "passenger_id", "idempotency_key", name="uq_bookings_passenger_idempotency_key"
+        ),
+    )
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Header, Query, Response, WebSocket, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.auth.cache import UserSnapshot
+from app.auth.router import (
+    get_current_snapshot,
+    get_websocket_snapshot,
+    token_still_valid,
+    websocket_token,
+)
+from app.db.session import get_db
+from app.rides import live, service
+from app.rides.geo import MAX_RADIUS_KM
+from app.rides.matching import MatchQuery
+from app.rides.schemas import BookingCreate, BookingOut, RideCreate, RideHit, RideMatch, RideOut
+
+router = APIRouter(prefix="/rides", tags=["Rides"])
+
+
+@router.post("", response_model=RideOut, status_code=status.HTTP_201_CREATED)
+def publish_ride(
+    payload: RideCreate,
+    db: Session = Depends(get_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    """
+    Publica un viaje del usuario actual como conductor.
+    """
+    return service.publish_ride(db, current, payload)
+
+
+@router.get("/search", response_model=list[RideHit])
+def search_rides(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5.0, gt=0, le=MAX_RADIUS_KM),
+    departure_from: datetime | None = None,
+    departure_to: datetime | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    """
+    Viajes con origen a menos de radius_km de (lat, lon) que salen en la ventana indicada.
+    """
+    return service.search_rides(db, lat, lon, radius_km, departure_from, departure_to, limit)
+
+
+@router.get("/matches", response_model=list[RideMatch])
+def match_rides(
+    origin_lat: float = Query(..., ge=-90, le=90),
+    origin_lon: float = Query(..., ge=-180, le=180),
+    dest_lat: float = Query(..., ge=-90, le=90),
+    dest_lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5.0, gt=0, le=MAX_RADIUS_KM),
+    departure_from: datetime | None = None,
+    departure_to: datetime | None = None,
+    seats: int = Query(1, ge=1, le=8),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    """
+    Mejores viajes de tu universidad para ir de origen a destino en la ventana indicada.
+    """
+    start, end = service.search_window(departure_from, departure_to)
+    q = MatchQuery(
+        origin_lat, origin_lon, dest_lat, dest_lon, start, end, radius_km, seats, current.id
+    )
+    return service.match_rides(db, current, q, limit)
+
+
+@router.websocket("/live")
+async def ride_updates(
+    websocket: WebSocket,
+    current: UserSnapshot = Depends(get_websocket_snapshot),
+    token: str = Depends(websocket_token),
+    db: Session = Depends(get_db),
+):
+    """
+    Cambios de viajes y zonas en tiempo real; protocolo en app.rides.live.
+    """
+    # La sesión de la dependencia vive lo que la conexión; current_snapshot la devuelve al pool
+    await live.serve(websocket, current, lambda: run_in_threadpool(token_still_valid, token, db))
+
+
+@router.get("/{ride_id}", response_model=RideOut)
+def get_ride(
+    ride_id: int,
+    db: Session = Depends(get_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    return service.get_ride(db, ride_id)
+
+
+@router.post("/{ride_id}/cancel", response_model=RideOut)
+def cancel_ride(
+    ride_id: int,
+    db: Session = Depends(get_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    return service.cancel_ride(db, current, ride_id)
+
+
+@router.post("/{ride_id}/bookings", response_model=BookingOut, status_code=status.HTTP_201_CREATED)
+def book_seats(
+    ride_id: int,
+    response: Response,
+    payload: BookingCreate = BookingCreate(),
+    idempotency_key: str | None = Header(None, max_length=64),
+    db: Session = Depends(get_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    """
+    Reserva plazas. Con Idempotency-Key, un reintento devuelve la misma reserva (200).
+    """
+    booking, created = service.book_seats(db, current, ride_id, payload, idempotency_key)
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return booking
+
+
+@router.post("/bookings/{booking_id}/cancel", response_model=BookingOut)
+def cancel_booking(
+    booking_id: int,
+    db: Session = Depends(get_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    return service.cancel_booking(db, current, booking_id)
@@ -0,0 +1,117 @@
+# Variante de app.rides.router para DB_ASYNC=true
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Header, Query, Response, WebSocket, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth.cache import UserSnapshot
+from app.auth.router import websocket_token
+from app.auth.router_async import get_current_snapshot, get_websocket_snapshot, token_still_valid
+from app.db.session import get_async_db
+from app.rides import live
+from app.rides import service_async as service
+from app.rides.geo import MAX_RADIUS_KM
+from app.rides.matching import MatchQuery
+from app.rides.schemas import BookingCreate, BookingOut, RideCreate, RideHit, RideMatch, RideOut
+from app.rides.service import search_window
+
+router = APIRouter(prefix="/rides", tags=["Rides"])
+
+
+@router.post("", response_model=RideOut, status_code=status.HTTP_201_CREATED)
+async def publish_ride(
+    payload: RideCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    return await service.publish_ride(db, current, payload)
+
+
+@router.get("/search", response_model=list[RideHit])
+async def search_rides(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5.0, gt=0, le=MAX_RADIUS_KM),
+    departure_from: datetime | None = None,
+    departure_to: datetime | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    return await service.search_rides(db, lat, lon, radius_km, departure_from, departure_to, limit)
+
+
+@router.get("/matches", response_model=list[RideMatch])
+async def match_rides(
+    origin_lat: float = Query(..., ge=-90, le=90),
+    origin_lon: float = Query(..., ge=-180, le=180),
+    dest_lat: float = Query(..., ge=-90, le=90),
+    dest_lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5.0, gt=0, le=MAX_RADIUS_KM),
+    departure_from: datetime | None = None,
+    departure_to: datetime | None = None,
+    seats: int = Query(1, ge=1, le=8),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    start, end = search_window(departure_from, departure_to)
+    q = MatchQuery(
+        origin_lat, origin_lon, dest_lat, dest_lon, start, end, radius_km, seats, current.id
+    )
+    return await service.match_rides(db, current, q, limit)
+
+
+@router.websocket("/live")
+async def ride_updates(
+    websocket: WebSocket,
+    current: UserSnapshot = Depends(get_websocket_snapshot),
+    token: str = Depends(websocket_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Cambios de viajes y zonas en tiempo real; protocolo en app.rides.live.
+    """
+    await live.serve(websocket, current, lambda: token_still_valid(token, db))
+
+
+@router.get("/{ride_id}", response_model=RideOut)
+async def get_ride(
+    ride_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    return await service.get_ride(db, ride_id)
+
+
+@router.post("/{ride_id}/cancel", response_model=RideOut)
+async def cancel_ride(
+    ride_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    return await service.cancel_ride(db, current, ride_id)
+
+
+@router.post("/{ride_id}/bookings", response_model=BookingOut, status_code=status.HTTP_201_CREATED)
+async def book_seats(
+    ride_id: int,
+    response: Response,
+    payload: BookingCreate = BookingCreate(),
+    idempotency_key: str | None = Header(None, max_length=64),
+    db: AsyncSession = Depends(get_async_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    booking, created = await service.book_seats(db, current, ride_id, payload, idempotency_key)
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return booking
+
+
+@router.post("/bookings/{booking_id}/cancel", response_model=BookingOut)
+async def cancel_booking(
+    booking_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current: UserSnapshot = Depends(get_current_snapshot),
+):
+    return await service.cancel_booking(db, current, booking_id)
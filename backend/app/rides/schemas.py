@@ -0,0 +1,134 @@
+from datetime import UTC, datetime, timedelta
+from typing import Literal
+
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    confloat,
+    conint,
+    constr,
+    field_validator,
+    model_validator,
+)
+
+from app.rides.geo import MAX_RADIUS_KM
+
+# Una ventana de salida más larga no es un viaje concreto; además acota el rango del índice
+MAX_DEPARTURE_WINDOW = timedelta(hours=12)
+
+Latitude = confloat(ge=-90, le=90)
+Longitude = confloat(ge=-180, le=180)
+
+
+def as_utc(value: datetime) -> datetime:
+    # Sin zona horaria se asume UTC (SQLite además devuelve fechas naive)
+    return value.replace(tzinfo=UTC) if value.tzinfo is None else value.astimezone(UTC)
+
+
+class RideCreate(BaseModel):
+    origin_lat: Latitude
+    origin_lon: Longitude
+    origin_label: constr(strip_whitespace=True, max_length=200) | None = None
+    dest_lat: Latitude
+    dest_lon: Longitude
+    dest_label: constr(strip_whitespace=True, max_length=200) | None = None
+    departure_earliest: datetime
+    departure_latest: datetime
+    seats_total: conint(ge=1, le=8)
+
+    @field_validator("departure_earliest", "departure_latest")
+    @classmethod
+    def _utc(cls, value: datetime) -> datetime:
+        return as_utc(value)
+
+    @model_validator(mode="after")
+    def _window(self) -> "RideCreate":
+        if self.departure_latest < self.departure_earliest:
+            raise ValueError("La ventana de salida termina antes de empezar")
+        if self.departure_latest - self.departure_earliest > MAX_DEPARTURE_WINDOW:
+            raise ValueError("La ventana de salida no puede superar 12 horas")
+        if self.departure_latest <= datetime.now(UTC):
+            raise ValueError("La salida debe ser en el futuro")
+        return self
+
+
+class RideOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    driver_id: int
+    university: str
+    origin_lat: float
+    origin_lon: float
+    origin_label: str | None = None
+    dest_lat: float
+    dest_lon: float
+    dest_label: str | None = None
+    departure_earliest: datetime
+    departure_latest: datetime
+    seats_total: int
+    seats_left: int
+    status: str
+
+    @field_validator("departure_earliest", "departure_latest")
+    @classmethod
+    def _utc(cls, value: datetime) -> datetime:
+        return as_utc(value)
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def _status(cls, value) -> str:
+        return getattr(value, "value", value)
+
+
+class RideHit(RideOut):
+    # Distancia en km del origen del viaje al punto buscado
+    distance_km: float
+
+
+class RideMatch(RideOut):
+    # Coste del emparejamiento (km de desvío + penalización por desfase horario), menor es mejor
+    score: float
+    origin_km: float
+    dest_km: float
+
+
+class BookingCreate(BaseModel):
+    seats: conint(ge=1, le=8) = 1
+
+
+class BookingOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    ride_id: int
+    passenger_id: int
+    seats: int
+    status: str
+    created_at: datetime
+
+    @field_validator("created_at")
+    @classmethod
+    def _utc(cls, value: datetime) -> datetime:
+        return as_utc(value)
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def _status(cls, value) -> str:
+        return getattr(value, "value", value)
+
+
+class LiveArea(BaseModel):
+    lat: Latitude
+    lon: Longitude
+    radius_km: confloat(gt=0, le=MAX_RADIUS_KM) = 5.0
+
+
+class LiveCommand(BaseModel):
+    """
+    Mensaje del cliente por el WebSocket de app.rides.live.
+    """
+
+    op: Literal["subscribe", "unsubscribe"]
+    rides: list[int] = []
+    area: LiveArea | None = None
@@ -0,0 +1,432 @@
+"""
+Viajes publicados por conductores y búsqueda por cercanía.
+
+La búsqueda va en dos pasos: search_statement acota por índice (celdas de app.rides.geo que
+cubren el radio + rango de departure_earliest) y rank_hits descarta por distancia exacta y
+ordena. departure_earliest se acota por los dos lados gracias a MAX_DEPARTURE_WINDOW: un
+viaje que sale como tarde a las `start` empezó su ventana, como pronto, 12 h antes.
+
+El emparejamiento origen+destino (match_rides) no consulta la BD para puntuar: usa el motor
+en memoria de app.rides.matching, que publish_ride y cancel_ride mantienen al día. Tras cada
+commit se avisa además a los clientes suscritos por WebSocket (app.rides.live).
+
+Las reservas nunca leen-comprueban-escriben: las plazas se descuentan con un único
+UPDATE ... SET seats_left = seats_left - n WHERE seats_left >= n RETURNING (reserve_statement)
+y la fila de bookings se inserta en la misma transacción. Con cientos de peticiones a la vez
+sobre el mismo viaje, la BD serializa los UPDATE sobre la fila y ninguno puede dejar
+seats_left en negativo. La cabecera Idempotency-Key (única por pasajero) hace que un
+reintento del cliente devuelva la reserva ya hecha en vez de reservar otra vez.
+
+Las funciones síncronas que usan los endpoints devuelven modelos de respuesta y cierran la
+transacción antes de volver. FastAPI serializa la respuesta en otro salto al threadpool: si
+la sesión siguiera con una conexión (o un objeto ORM caducado que recargar), bajo carga los
+hilos esperando conexión agotarían el threadpool y las conexiones esperarían hilo.
+"""
+
+from collections.abc import Iterable
+from datetime import UTC, datetime, timedelta
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, Update, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.auth.cache import UserSnapshot
+from app.core.metrics import RIDE_BOOKINGS
+from app.core.profiling import profiled
+from app.rides import live
+from app.rides.geo import cell_of, cells_within, haversine_km
+from app.rides.matching import Match, MatchQuery, ride_matcher
+from app.rides.models import Booking, BookingStatus, Ride, RideStatus
+from app.rides.schemas import (
+    MAX_DEPARTURE_WINDOW,
+    BookingCreate,
+    BookingOut,
+    RideCreate,
+    RideHit,
+    RideMatch,
+    RideOut,
+    as_utc,
+)
+
+DRIVER_INTENTS = ("offers", "both")
+MAX_SEARCH_WINDOW = timedelta(days=7)
+
+
+def check_driver(driver: UserSnapshot) -> None:
+    if driver.ride_intent not in DRIVER_INTENTS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Tu perfil no indica que ofrezcas viajes",
+        )
+    if not driver.university:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Completa tu perfil antes de publicar un viaje",
+        )
+
+
+def require_university(user: UserSnapshot) -> str:
+    if not user.university:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indica tu universidad en el perfil para buscar viajes",
+        )
+    return user.university
+
+
+def new_ride(driver: UserSnapshot, payload: RideCreate) -> Ride:
+    return Ride(
+        **payload.model_dump(),
+        driver_id=driver.id,
+        university=driver.university,
+        origin_cell=cell_of(payload.origin_lat, payload.origin_lon),
+        seats_left=payload.seats_total,
+        status=RideStatus.active,
+    )
+
+
+def search_window(start: datetime | None, end: datetime | None) -> tuple[datetime, datetime]:
+    """
+    Normaliza la ventana buscada: por defecto desde ahora y 12 h; 400 si es inválida.
+    """
+    start = as_utc(start) if start else datetime.now(UTC)
+    end = as_utc(end) if end else start + MAX_DEPARTURE_WINDOW
+    if end < start or end - start > MAX_SEARCH_WINDOW:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Ventana de búsqueda inválida (máximo 7 días)",
+        )
+    return start, end
+
+
+def search_statement(
+    lat: float, lon: float, radius_km: float, start: datetime, end: datetime
+) -> Select:
+    """
+    Candidatos: viajes activos con plazas, origen en las celdas del radio y ventana de salida
+    que se solapa con [start, end].
+    """
+    return select(Ride).where(
+        Ride.status == RideStatus.active,
+        Ride.origin_cell.in_(cells_within(lat, lon, radius_km)),
+        Ride.departure_earliest >= start - MAX_DEPARTURE_WINDOW,
+        Ride.departure_earliest <= end,
+        Ride.departure_latest >= start,
+        Ride.seats_left > 0,
+    )
+
+
+def rank_hits(
+    rides: Iterable[Ride], lat: float, lon: float, radius_km: float, limit: int
+) -> list[RideHit]:
+    """
+    Filtro exacto por distancia; los más cercanos primero y, a igual distancia, el que antes sale.
+    """
+    hits = []
+    for ride in rides:
+        distance = haversine_km(lat, lon, ride.origin_lat, ride.origin_lon)
+        if distance <= radius_km:
+            hits.append((distance, ride))
+    hits.sort(key=lambda h: (h[0], as_utc(h[1].departure_earliest)))
+    return [
+        RideHit(**RideOut.model_validate(ride).model_dump(), distance_km=round(distance, 3))
+        for distance, ride in hits[:limit]
+    ]
+
+
+@profiled("rides.publish")
+def publish_ride(db: Session, driver: UserSnapshot, payload: RideCreate) -> RideOut:
+    check_driver(driver)
+    ride = new_ride(driver, payload)
+    db.add(ride)
+    db.flush()
+    out = RideOut.model_validate(ride)
+    db.commit()
+    ride_matcher.add(out)
+    live.ride_published(out)
+    return out
+
+
+def ride_not_found() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Viaje no encontrado")
+
+
+def get_ride(db: Session, ride_id: int) -> RideOut:
+    ride = db.get(Ride, ride_id)
+    if ride is None:
+        raise ride_not_found()
+    out = RideOut.model_validate(ride)
+    db.rollback()
+    return out
+
+
+def check_owner(ride: Ride, driver: UserSnapshot) -> None:
+    if ride.driver_id != driver.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo el conductor puede cancelar el viaje",
+        )
+
+
+@profiled("rides.cancel")
+def cancel_ride(db: Session, driver: UserSnapshot, ride_id: int) -> RideOut:
+    ride = db.get(Ride, ride_id, with_for_update=True)
+    if ride is None:
+        raise ride_not_found()
+    check_owner(ride, driver)
+    ride.status = RideStatus.cancelled
+    db.execute(cancel_ride_bookings_statement(ride.id))
+    db.flush()
+    out = RideOut.model_validate(ride)
+    db.commit()
+    ride_matcher.remove(out.university, out.id)
+    live.ride_cancelled(out)
+    return out
+
+
+@profiled("rides.search")
+def search_rides(
+    db: Session,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int = 20,
+) -> list[RideHit]:
+    start, end = search_window(start, end)
+    rides = db.scalars(search_statement(lat, lon, radius_km, start, end))
+    hits = rank_hits(rides, lat, lon, radius_km, limit)
+    db.rollback()
+    return hits
+
+
+def offers_statement(university: str, now: datetime) -> Select:
+    """
+    Columnas que carga el motor de emparejamiento: ofertas activas aún no pasadas.
+    """
+    return select(
+        Ride.id,
+        Ride.driver_id,
+        Ride.university,
+        Ride.origin_lat,
+        Ride.origin_lon,
+        Ride.dest_lat,
+        Ride.dest_lon,
+        Ride.departure_earliest,
+        Ride.departure_latest,
+        Ride.seats_left,
+    ).where(
+        Ride.university == university,
+        Ride.status == RideStatus.active,
+        Ride.departure_latest >= now,
+    )
+
+
+def matched_rides(rides: Iterable[Ride], matches: list[Match], seats: int) -> list[RideMatch]:
+    """
+    Resultado en el orden del motor. La BD manda: se descartan los viajes cancelados o
+    llenos desde otro worker.
+    """
+    by_id = {ride.id: ride for ride in rides}
+    out = []
+    for m in matches:
+        ride = by_id.get(m.ride_id)
+        if ride is None or ride.status != RideStatus.active or ride.seats_left < seats:
+            continue
+        out.append(
+            RideMatch(
+                **RideOut.model_validate(ride).model_dump(),
+                score=round(m.score, 3),
+                origin_km=round(m.origin_km, 3),
+                dest_km=round(m.dest_km, 3),
+            )
+        )
+    return out
+
+
+@profiled("rides.match")
+def match_rides(
+    db: Session, seeker: UserSnapshot, q: MatchQuery, limit: int = 10
+) -> list[RideMatch]:
+    university = require_university(seeker)
+    if ride_matcher.is_stale(university):
+        ride_matcher.load(university, db.execute(offers_statement(university, datetime.now(UTC))))
+    matches = ride_matcher.match(university, q, limit)
+    if not matches:
+        db.rollback()
+        return []
+    rides = db.scalars(select(Ride).where(Ride.id.in_([m.ride_id for m in matches])))
+    out = matched_rides(rides, matches, q.seats)
+    db.rollback()
+    return out
+
+
+def reserve_statement(ride_id: int, passenger_id: int, seats: int, now: datetime) -> Update:
+    """
+    Descuenta las plazas solo si quedan suficientes (y el viaje sigue activo, no ha salido y
+    no es del propio pasajero). Sin fila devuelta, no se ha reservado nada.
+    """
+    return (
+        update(Ride)
+        .where(
+            Ride.id == ride_id,
+            Ride.status == RideStatus.active,
+            Ride.seats_left >= seats,
+            Ride.driver_id != passenger_id,
+            Ride.departure_latest >= now,
+        )
+        .values(seats_left=Ride.seats_left - seats)
+        .returning(Ride.university, Ride.origin_cell, Ride.seats_left)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release_statement(ride_id: int, seats: int) -> Update:
+    return (
+        update(Ride)
+        .where(Ride.id == ride_id)
+        .values(seats_left=Ride.seats_left + seats)
+        .returning(Ride.university, Ride.origin_cell, Ride.seats_left)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def cancel_booking_statement(booking_id: int, passenger_id: int) -> Update:
+    # Solo una cancelación concurrente encuentra la reserva aún confirmada
+    return (
+        update(Booking)
+        .where(
+            Booking.id == booking_id,
+            Booking.passenger_id == passenger_id,
+            Booking.status == BookingStatus.confirmed,
+        )
+        .values(status=BookingStatus.cancelled)
+        .returning(Booking.ride_id, Booking.seats)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def cancel_ride_bookings_statement(ride_id: int) -> Update:
+    # Al cancelar el viaje ninguna reserva sigue confirmada (misma transacción que el viaje)
+    return (
+        update(Booking)
+        .where(Booking.ride_id == ride_id, Booking.status == BookingStatus.confirmed)
+        .values(status=BookingStatus.cancelled)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def idempotent_statement(passenger_id: int, key: str) -> Select:
+    return select(Booking).where(
+        Booking.passenger_id == passenger_id, Booking.idempotency_key == key
+    )
+
+
+def replayed(booking: Booking, ride_id: int, seats: int) -> BookingOut:
+    """
+    Reintento con una Idempotency-Key ya usada: misma reserva si la petición es la misma.
+    """
+    if booking.ride_id != ride_id or booking.seats != seats:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key ya usada con otra reserva",
+        )
+    RIDE_BOOKINGS.labels("replayed").inc()
+    return BookingOut.model_validate(booking)
+
+
+def booking_rejection(ride: Ride | None, passenger_id: int, now: datetime) -> HTTPException:
+    """
+    Motivo por el que reserve_statement no ha actualizado ninguna fila.
+    """
+    RIDE_BOOKINGS.labels("rejected").inc()
+    if ride is None:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Viaje no encontrado")
+    if ride.driver_id == passenger_id:
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="No puedes reservar tu propio viaje"
+        )
+    if ride.status != RideStatus.active:
+        detail = "El viaje está cancelado"
+    elif as_utc(ride.departure_latest) < now:
+        detail = "El viaje ya ha salido"
+    else:
+        detail = f"No quedan plazas suficientes (quedan {ride.seats_left})"
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+def booking_not_found() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reserva no encontrada")
+
+
+@profiled("rides.book")
+def book_seats(
+    db: Session,
+    passenger: UserSnapshot,
+    ride_id: int,
+    payload: BookingCreate,
+    idempotency_key: str | None = None,
+) -> tuple[BookingOut, bool]:
+    """
+    Reserva plazas. Devuelve (reserva, creada); creada=False si es un reintento.
+    """
+    if idempotency_key:
+        existing = db.scalar(idempotent_statement(passenger.id, idempotency_key))
+        if existing is not None:
+            out = replayed(existing, ride_id, payload.seats)
+            db.rollback()
+            return out, False
+
+    now = datetime.now(UTC)
+    row = db.execute(reserve_statement(ride_id, passenger.id, payload.seats, now)).first()
+    if row is None:
+        db.rollback()
+        rejection = booking_rejection(db.get(Ride, ride_id), passenger.id, now)
+        db.rollback()
+        raise rejection
+    booking = Booking(
+        ride_id=ride_id,
+        passenger_id=passenger.id,
+        seats=payload.seats,
+        idempotency_key=idempotency_key,
+    )
+    db.add(booking)
+    try:
+        db.flush()
+    except IntegrityError:
+        # Un reintento simultáneo con la misma clave ganó: el rollback devuelve también las plazas
+        db.rollback()
+        existing = db.scalar(idempotent_statement(passenger.id, idempotency_key))
+        if existing is None:
+            raise
+        out = replayed(existing, ride_id, payload.seats)
+        db.rollback()
+        return out, False
+    out = BookingOut.model_validate(booking)
+    db.commit()
+    RIDE_BOOKINGS.labels("created").inc()
+    ride_matcher.set_seats(row.university, ride_id, row.seats_left)
+    live.seats_changed(ride_id, row.origin_cell, row.seats_left)
+    return out, True
+
+
+@profiled("rides.cancel_booking")
+def cancel_booking(db: Session, passenger: UserSnapshot, booking_id: int) -> BookingOut:
+    row = db.execute(cancel_booking_statement(booking_id, passenger.id)).first()
+    if row is None:
+        db.rollback()
+        booking = db.get(Booking, booking_id)
+        if booking is None or booking.passenger_id != passenger.id:
+            raise booking_not_found()
+        out = BookingOut.model_validate(booking)  # ya estaba cancelada
+        db.rollback()
+        return out
+    seats = db.execute(release_statement(row.ride_id, row.seats)).one()
+    booking = db.get(Booking, booking_id, populate_existing=True)
+    out = BookingOut.model_validate(booking)
+    db.commit()
+    ride_matcher.set_seats(seats.university, row.ride_id, seats.seats_left)
+    live.seats_changed(row.ride_id, seats.origin_cell, seats.seats_left)
+    return out
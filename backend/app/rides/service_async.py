@@ -0,0 +1,162 @@
+"""
+Versión async de app.rides.service para el modo DB_ASYNC.
+Las consultas y validaciones se construyen con las funciones de la síncrona.
+"""
+
+from datetime import UTC, datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.auth.cache import UserSnapshot
+from app.core.metrics import RIDE_BOOKINGS
+from app.core.profiling import profiled
+from app.rides import live
+from app.rides.matching import MatchQuery, ride_matcher
+from app.rides.models import Booking, Ride, RideStatus
+from app.rides.schemas import BookingCreate, BookingOut, RideCreate, RideHit, RideMatch, RideOut
+from app.rides.service import (
+    booking_not_found,
+    booking_rejection,
+    cancel_booking_statement,
+    cancel_ride_bookings_statement,
+    check_driver,
+    check_owner,
+    idempotent_statement,
+    matched_rides,
+    new_ride,
+    offers_statement,
+    rank_hits,
+    release_statement,
+    replayed,
+    require_university,
+    reserve_statement,
+    ride_not_found,
+    search_statement,
+    search_window,
+)
+
+
+@profiled("rides.publish")
+async def publish_ride(db: AsyncSession, driver: UserSnapshot, payload: RideCreate) -> Ride:
+    check_driver(driver)
+    ride = new_ride(driver, payload)
+    db.add(ride)
+    await db.commit()
+    await db.refresh(ride)
+    ride_matcher.add(ride)
+    live.ride_published(RideOut.model_validate(ride))
+    return ride
+
+
+async def get_ride(db: AsyncSession, ride_id: int) -> Ride:
+    ride = await db.get(Ride, ride_id)
+    if ride is None:
+        raise ride_not_found()
+    return ride
+
+
+@profiled("rides.cancel")
+async def cancel_ride(db: AsyncSession, driver: UserSnapshot, ride_id: int) -> RideOut:
+    # Como la síncrona: el lock de fila serializa con las reservas en curso del viaje
+    ride = await db.get(Ride, ride_id, with_for_update=True)
+    if ride is None:
+        raise ride_not_found()
+    check_owner(ride, driver)
+    ride.status = RideStatus.cancelled
+    await db.execute(cancel_ride_bookings_statement(ride.id))
+    await db.flush()
+    out = RideOut.model_validate(ride)
+    await db.commit()
+    ride_matcher.remove(out.university, out.id)
+    live.ride_cancelled(out)
+    return out
+
+
+@profiled("rides.search")
+async def search_rides(
+    db: AsyncSession,
+    lat: float,
+    lon: float,
+    radius_km: float,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    limit: int = 20,
+) -> list[RideHit]:
+    start, end = search_window(start, end)
+    rides = await db.scalars(search_statement(lat, lon, radius_km, start, end))
+    return rank_hits(rides, lat, lon, radius_km, limit)
+
+
+@profiled("rides.match")
+async def match_rides(
+    db: AsyncSession, seeker: UserSnapshot, q: MatchQuery, limit: int = 10
+) -> list[RideMatch]:
+    university = require_university(seeker)
+    if ride_matcher.is_stale(university):
+        rows = await db.execute(offers_statement(university, datetime.now(UTC)))
+        # Convertir decenas de miles de filas a columnas no debe parar el event loop
+        await run_in_threadpool(ride_matcher.load, university, rows.all())
+    matches = ride_matcher.match(university, q, limit)
+    if not matches:
+        return []
+    rides = await db.scalars(select(Ride).where(Ride.id.in_([m.ride_id for m in matches])))
+    return matched_rides(rides, matches, q.seats)
+
+
+@profiled("rides.book")
+async def book_seats(
+    db: AsyncSession,
+    passenger: UserSnapshot,
+    ride_id: int,
+    payload: BookingCreate,
+    idempotency_key: str | None = None,
+) -> tuple[BookingOut, bool]:
+    if idempotency_key:
+        existing = await db.scalar(idempotent_statement(passenger.id, idempotency_key))
+        if existing is not None:
+            return replayed(existing, ride_id, payload.seats), False
+
+    now = datetime.now(UTC)
+    result = await db.execute(reserve_statement(ride_id, passenger.id, payload.seats, now))
+    row = result.first()
+    if row is None:
+        await db.rollback()
+        raise booking_rejection(await db.get(Ride, ride_id), passenger.id, now)
+    booking = Booking(
+        ride_id=ride_id,
+        passenger_id=passenger.id,
+        seats=payload.seats,
+        idempotency_key=idempotency_key,
+    )
+    db.add(booking)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        existing = await db.scalar(idempotent_statement(passenger.id, idempotency_key))
+        if existing is None:
+            raise
+        return replayed(existing, ride_id, payload.seats), False
+    RIDE_BOOKINGS.labels("created").inc()
+    ride_matcher.set_seats(row.university, ride_id, row.seats_left)
+    live.seats_changed(ride_id, row.origin_cell, row.seats_left)
+    return BookingOut.model_validate(booking), True
+
+
+@profiled("rides.cancel_booking")
+async def cancel_booking(db: AsyncSession, passenger: UserSnapshot, booking_id: int) -> BookingOut:
+    row = (await db.execute(cancel_booking_statement(booking_id, passenger.id))).first()
+    if row is None:
+        await db.rollback()
+        booking = await db.get(Booking, booking_id)
+        if booking is None or booking.passenger_id != passenger.id:
+            raise booking_not_found()
+        return BookingOut.model_validate(booking)
+    seats = (await db.execute(release_statement(row.ride_id, row.seats))).one()
+    await db.commit()
+    ride_matcher.set_seats(seats.university, row.ride_id, seats.seats_left)
+    live.seats_changed(row.ride_id, seats.origin_cell, seats.seats_left)
+    return BookingOut.model_validate(await db.get(Booking, booking_id, populate_existing=True))
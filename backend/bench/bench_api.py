@@ -0,0 +1,333 @@
+"""
+Prueba de carga de la API: el recorrido completo de N usuarios con concurrencia controlada.
+
+    make infra-up && make migrate && make bench
+    cd backend && python -m bench.bench_api --users 200 --concurrency 32
+    cd backend && python -m bench.bench_api --compare bench/results/<anterior>.json
+
+Cada usuario virtual hace register -> verify -> login -> me -> GET profile -> PUT profile ->
+PATCH profile -> avatar -> GET profile con If-None-Match (304). El código de verificación se
+lee de email_codes. Antes se siembran --seed-users usuarios directamente en la BD para que
+tablas e índices no estén vacíos.
+
+Por paso se informa de p50/p95/p99, peticiones/s, errores y consultas y tiempo de BD por
+petición (diferencia de los histogramas de /metrics antes y después). El resultado se guarda
+en bench/results/bench_api-<fecha>-<commit>.json; con --compare se imprime la variación frente
+a otra ejecución.
+
+Sin --base-url la API corre en el propio proceso (httpx.ASGITransport, con su lifespan) contra
+DATABASE_URL, y el rate limiting se desactiva. Con --base-url se ataca un servidor ya
+levantado con la misma DATABASE_URL y RATE_LIMIT_ENABLED=false. Los usuarios
+(bench-load-*@bench.<primer dominio de ALLOWED_EMAIL_DOMAINS>, o --domain) se borran al
+terminar; sus avatares los recoge `make avatar-gc`.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+from PIL import Image
+from prometheus_client.parser import text_string_to_metric_families
+from sqlalchemy import delete, insert, select
+
+from app.auth.models import EmailCode, User
+from app.core import security
+from app.core.config import settings
+from app.db.session import Base, SessionLocal, engine
+from app.mail.models import EmailOutbox
+
+RESULTS_DIR = Path(__file__).parent / "results"
+PASSWORD = "bench-Passw0rd"
+PROFILE = {
+    "full_name": "Bench User",
+    "university": "bench",
+    "degree": "Ingeniería Informática",
+    "course": 3,
+    "ride_intent": "both",
+}
+
+# Paso -> ruta (plantilla, como la etiqueta de las métricas)
+STEPS = {
+    "register": ("POST", "/api/auth/register"),
+    "verify": ("POST", "/api/auth/verify"),
+    "login": ("POST", "/api/auth/login"),
+    "me": ("GET", "/api/auth/me"),
+    "profile_get": ("GET", "/api/me/profile"),
+    "profile_put": ("PUT", "/api/me/profile"),
+    "profile_patch": ("PATCH", "/api/me/profile"),
+    "avatar": ("POST", "/api/me/avatar"),
+    "profile_304": ("GET", "/api/me/profile"),
+}
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _default_domain() -> str:
+    # Subdominio de un dominio permitido: pasa el filtro de ALLOWED_EMAIL_DOMAINS
+    allowed = settings.allowed_email_domains
+    return f"bench.{allowed[0]}" if allowed else "bench.example.com"
+
+
+def _avatar(rng: random.Random, px: int) -> bytes:
+    # Ruido: el PNG no se comprime y cada usuario sube un contenido (y un hash) distinto
+    img = Image.frombytes("RGB", (px, px), rng.randbytes(px * px * 3))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _seed(tag: str, domain: str, count: int) -> None:
+    password_hash = security.hash_password(PASSWORD)
+    with SessionLocal() as db:
+        for start in range(0, count, 5000):
+            rows = [
+                {"email": f"bench-load-{tag}-seed{i}@{domain}", "password_hash": password_hash}
+                for i in range(start, min(start + 5000, count))
+            ]
+            db.execute(insert(User), rows)
+        db.commit()
+
+
+def _cleanup(tag: str, domain: str) -> None:
+    pattern = f"bench-load-{tag}-%@{domain}"
+    with SessionLocal() as db:
+        db.execute(delete(EmailOutbox).where(EmailOutbox.to_email.like(pattern)))
+        db.execute(delete(EmailCode).where(EmailCode.email.like(pattern)))
+        db.execute(delete(User).where(User.email.like(pattern)))
+        db.commit()
+
+
+def _code_for(email: str) -> str | None:
+    with SessionLocal() as db:
+        return db.scalar(
+            select(EmailCode.code)
+            .where(EmailCode.email == email, EmailCode.consumed.is_(False))
+            .order_by(EmailCode.created_at.desc())
+            .limit(1)
+        )
+
+
+async def _db_histograms(http: httpx.AsyncClient) -> dict:
+    """
+    (method, path) -> [consultas, segundos de BD, peticiones] acumulados en /metrics.
+    """
+    text = (await http.get("/metrics")).text
+    totals: dict = defaultdict(lambda: [0.0, 0.0, 0.0])
+    for family in text_string_to_metric_families(text):
+        if family.name not in ("unigo_db_queries_per_request", "unigo_db_time_per_request_seconds"):
+            continue
+        for s in family.samples:
+            key = (s.labels.get("method"), s.labels.get("path"))
+            if s.name.endswith("_sum"):
+                totals[key][0 if family.name.startswith("unigo_db_queries") else 1] += s.value
+            elif s.name.endswith("_count") and family.name.startswith("unigo_db_queries"):
+                totals[key][2] += s.value
+    return totals
+
+
+class Journey:
+    def __init__(self, http: httpx.AsyncClient, samples: dict, statuses: dict):
+        self.http = http
+        self.samples = samples
+        self.statuses = statuses
+
+    async def step(self, name: str, expect: int, **kwargs) -> httpx.Response:
+        method, path = STEPS[name]
+        t0 = time.perf_counter()
+        r = await self.http.request(method, path, **kwargs)
+        self.samples[name].append(time.perf_counter() - t0)
+        self.statuses[name][r.status_code] += 1
+        if r.status_code != expect:
+            raise RuntimeError(f"{name}: {r.status_code} {r.text[:200]}")
+        return r
+
+    async def run(self, email: str, avatar: bytes) -> None:
+        creds = {"email": email, "password": PASSWORD}
+        await self.step("register", 204, json=creds)
+        code = await asyncio.to_thread(_code_for, email)
+        await self.step("verify", 204, json={"email": email, "code": code})
+        token = (await self.step("login", 200, json=creds)).json()["access_token"]
+        auth = {"Authorization": f"Bearer {token}"}
+        await self.step("me", 200, headers=auth)
+        await self.step("profile_get", 200, headers=auth)
+        await self.step("profile_put", 200, json=PROFILE, headers=auth)
+        await self.step("profile_patch", 200, json={"course": 4}, headers=auth)
+        files = {"file": ("avatar.png", avatar, "image/png")}
+        etag = (await self.step("avatar", 200, files=files, headers=auth)).headers.get("etag")
+        await self.step("profile_304", 304, headers={**auth, "If-None-Match": etag or ""})
+
+
+def _percentile(sorted_ms: list[float], p: float) -> float:
+    return sorted_ms[max(0, math.ceil(p / 100 * len(sorted_ms)) - 1)]
+
+
+def _report(samples, statuses, before, after, elapsed: float) -> dict:
+    steps = {}
+    for name, (method, path) in STEPS.items():
+        ms = sorted(s * 1000 for s in samples[name])
+        if not ms:
+            continue
+        q0, t0, n0 = before.get((method, path), (0, 0, 0))
+        q1, t1, n1 = after.get((method, path), (0, 0, 0))
+        served = n1 - n0
+        ok = statuses[name][304 if name == "profile_304" else 200] + statuses[name][204]
+        steps[name] = {
+            "route": f"{method} {path}",
+            "requests": len(ms),
+            "errors": len(ms) - ok,
+            "p50_ms": round(_percentile(ms, 50), 2),
+            "p95_ms": round(_percentile(ms, 95), 2),
+            "p99_ms": round(_percentile(ms, 99), 2),
+            "requests_per_sec": round(len(ms) / elapsed, 1),
+            # Por ruta: los pasos que comparten ruta (profile_get/profile_304) salen iguales
+            "db_queries_per_request": round((q1 - q0) / served, 2) if served else None,
+            "db_ms_per_request": round((t1 - t0) * 1000 / served, 2) if served else None,
+            "status_counts": {str(k): v for k, v in sorted(statuses[name].items())},
+        }
+    total = sum(s["requests"] for s in steps.values())
+    return {
+        "total": {
+            "requests": total,
+            "errors": sum(s["errors"] for s in steps.values()),
+            "seconds": round(elapsed, 3),
+            "requests_per_sec": round(total / elapsed, 1),
+            "journeys_per_sec": round(len(samples["profile_304"]) / elapsed, 2),
+        },
+        "steps": steps,
+    }
+
+
+def _compare(current: dict, baseline: dict) -> str:
+    lines = [f"{'paso':<15}" + "".join(f"{h:>22}" for h in ("p50", "p95", "p99", "req/s"))]
+    for name, cur in current["steps"].items():
+        base = baseline.get("steps", {}).get(name)
+        if base is None:
+            continue
+        cells = []
+        for field in ("p50_ms", "p95_ms", "p99_ms", "requests_per_sec"):
+            delta = (cur[field] - base[field]) / base[field] * 100 if base[field] else 0.0
+            cells.append(f"{base[field]:.1f}->{cur[field]:.1f} {delta:+.0f}%")
+        lines.append(f"{name:<15}" + "".join(f"{c:>22}" for c in cells))
+    return "\n".join(lines)
+
+
+async def _drive(args, tag: str) -> dict:
+    rng = random.Random(args.seed)
+    emails = [f"bench-load-{tag}-{i}@{args.domain}" for i in range(args.users)]
+    avatars = [_avatar(rng, args.avatar_px) for _ in emails]
+    samples: dict = defaultdict(list)
+    statuses: dict = defaultdict(Counter)
+    failures: Counter = Counter()
+
+    if args.base_url:
+        http = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+        lifespan = contextlib.nullcontext()
+    else:
+        from app.core.ratelimit import rate_limiter
+        from app.main import app
+
+        rate_limiter.enabled = False
+        http = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+            base_url="http://bench",
+            timeout=60,
+        )
+        lifespan = app.router.lifespan_context(app)
+
+    async with lifespan, http:
+        journey = Journey(http, samples, statuses)
+        todo: asyncio.Queue = asyncio.Queue()
+        for item in zip(emails, avatars, strict=True):
+            todo.put_nowait(item)
+
+        async def worker() -> None:
+            while not todo.empty():
+                email, avatar = todo.get_nowait()
+                try:
+                    await journey.run(email, avatar)
+                except Exception as err:  # un recorrido fallido no para la prueba
+                    failures[str(err).split(":")[0]] += 1
+
+        before = await _db_histograms(http)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+        after = await _db_histograms(http)
+
+    report = _report(samples, statuses, before, after, elapsed)
+    report["failed_journeys"] = dict(failures)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200, help="recorridos completos")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed-users", type=int, default=10_000)
+    parser.add_argument("--avatar-px", type=int, default=128)
+    parser.add_argument("--base-url", default="")
+    parser.add_argument("--domain", default="", help="dominio de los emails")
+    parser.add_argument("--output", default="", help="por defecto bench/results/...")
+    parser.add_argument("--compare", default="", help="JSON de otra ejecución")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    args.domain = args.domain or _default_domain()
+
+    Base.metadata.create_all(engine)
+    tag = uuid.uuid4().hex[:8]
+    commit = _git_commit()
+    started = datetime.now(UTC)
+    try:
+        _seed(tag, args.domain, args.seed_users)
+        report = asyncio.run(_drive(args, tag))
+    finally:
+        _cleanup(tag, args.domain)
+
+    result = {
+        "meta": {
+            "commit": commit,
+            "started_at": started.isoformat(timespec="seconds"),
+            "target": args.base_url or "in-process",
+            "database": engine.dialect.name,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "seed_users": args.seed_users,
+            "cpus": os.cpu_count(),
+        },
+        **report,
+    }
+    output = (
+        Path(args.output)
+        if args.output
+        else (RESULTS_DIR / f"bench_api-{started:%Y%m%d-%H%M%S}-{commit}.json")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False) + "\n")
+    print(json.dumps(result["total"], indent=2))
+    if args.compare:
+        print(_compare(result, json.loads(Path(args.compare).read_text())))
+    print(f"Resultados en {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Lag del event loop durante subidas de avatar concurrentes: ruta antigua (read() completo +
+sha256 + write en el loop) frente a app.profile.avatars.store_upload (streaming, threadpool).
+
+    cd backend && python -m bench.bench_avatar_upload --uploads 8 --size-mb 20
+
+Un "ticker" duerme 1 ms en bucle y mide cuánto se retrasa cada despertar; el retraso es el
+tiempo que el loop ha estado bloqueado.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.profile import avatars
+from app.profile.storage import LocalBlobStore
+
+TICK = 0.001
+
+
+async def legacy_store(file: UploadFile, user_id: int) -> str:
+    # Copia de la implementación anterior de upload_avatar
+    os.makedirs(avatars.AVATAR_DIR, exist_ok=True)
+    raw = await file.read()
+    digest = hashlib.sha256(raw).hexdigest()[:16]
+    fname = f"{user_id}_{digest}.png"
+    with open(os.path.join(avatars.AVATAR_DIR, fname), "wb") as f:
+        f.write(raw)
+    return fname
+
+
+async def _ticker(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+def _uploads(count: int, payload: bytes) -> list[UploadFile]:
+    files = []
+    for i in range(count):
+        # Como en Starlette: el cuerpo ya está en un SpooledTemporaryFile (en disco si > 1 MB)
+        spool = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        spool.write(payload[:-1] + bytes([i % 256]))
+        spool.seek(0)
+        files.append(UploadFile(spool, headers=Headers({"content-type": "image/png"})))
+    return files
+
+
+async def _measure(store, count: int, payload: bytes) -> dict:
+    files = _uploads(count, payload)
+    stop = asyncio.Event()
+    lags: list[float] = []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(store(f, i) for i, f in enumerate(files)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    return {
+        "seconds": round(elapsed, 3),
+        "loop_lag_max_ms": round(lags_ms[-1], 2),
+        "loop_lag_p99_ms": round(lags_ms[int(len(lags_ms) * 0.99) - 1], 2),
+        "loop_lag_mean_ms": round(statistics.fmean(lags_ms), 3),
+    }
+
+
+class _NoVariants:
+    # Los bytes aleatorios no son una imagen: aquí solo se mide la subida
+    async def render(self, src_path: str) -> list[str]:
+        return []
+
+
+async def _main(uploads: int, size_mb: int) -> dict:
+    payload = os.urandom(size_mb * 1024 * 1024)
+    settings.avatar_max_bytes = len(payload)
+    return {
+        "legacy": await _measure(legacy_store, uploads, payload),
+        "streaming": await _measure(lambda f, _: avatars.store_upload(f), uploads, payload),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--size-mb", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        avatars.AVATAR_DIR = tmp
+        avatars.avatar_store = LocalBlobStore(tmp)
+        avatars.avatar_processor = _NoVariants()
+        results = asyncio.run(_main(args.uploads, args.size_mb))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
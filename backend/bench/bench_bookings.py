@@ -0,0 +1,205 @@
+"""
+Carga de reservas: N clientes concurrentes reservando plazas de unos pocos viajes populares.
+
+    cd backend && python -m bench.bench_bookings --clients 500 --attempts 3
+    cd backend && python -m bench.bench_bookings --base-url http://127.0.0.1:8000
+
+Sin --base-url la API corre en el propio proceso (httpx.ASGITransport); con --base-url se
+ataca un servidor ya levantado con la misma DATABASE_URL y SECRET_KEY. Los usuarios y viajes
+se crean directamente en la BD (bench-book-*@bench.local) y se borran al terminar.
+
+Cada cliente repite con la misma Idempotency-Key una parte de sus peticiones, como haría un
+móvil que pierde la respuesta. Al final se comprueba contra la BD que ningún viaje ha
+vendido más plazas de las que tenía y que cada reserva confirmada corresponde a un único
+201; el proceso sale con código 1 si no es así.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+
+import httpx
+from sqlalchemy import delete, func, insert, select
+
+from app.auth.models import User
+from app.auth.service import token_claims
+from app.core.security import create_access_token
+from app.db.session import Base, SessionLocal, engine
+from app.rides.geo import cell_of
+from app.rides.models import Booking, BookingStatus, Ride, RideStatus
+
+
+def _setup(tag: str, clients: int, rides: int, seats: int) -> tuple[list[str], list[int]]:
+    now = datetime.now(UTC)
+    with SessionLocal() as db:
+        emails = [f"bench-book-{tag}-{i}@bench.local" for i in range(clients + 1)]
+        db.execute(
+            insert(User),
+            [{"email": e, "password_hash": "bench", "is_verified": True} for e in emails],
+        )
+        users = db.scalars(select(User).where(User.email.in_(emails)).order_by(User.id)).all()
+        driver, passengers = users[0], users[1:]
+        start = now + timedelta(hours=2)
+        db.execute(
+            insert(Ride),
+            [
+                {
+                    "driver_id": driver.id,
+                    "university": "bench",
+                    "origin_lat": 37.18,
+                    "origin_lon": -3.60,
+                    "origin_cell": cell_of(37.18, -3.60),
+                    "dest_lat": 37.197,
+                    "dest_lon": -3.624,
+                    "departure_earliest": start,
+                    "departure_latest": start,
+                    "seats_total": seats,
+                    "seats_left": seats,
+                    "status": RideStatus.active,
+                    "created_at": now,
+                }
+                for _ in range(rides)
+            ],
+        )
+        db.commit()
+        ride_ids = list(db.scalars(select(Ride.id).where(Ride.driver_id == driver.id)))
+        tokens = [create_access_token(sub=str(u.id), claims=token_claims(u)) for u in passengers]
+    return tokens, ride_ids
+
+
+def _cleanup(tag: str) -> None:
+    with SessionLocal() as db:
+        users = select(User.id).where(User.email.like(f"bench-book-{tag}-%@bench.local"))
+        db.execute(delete(Booking).where(Booking.passenger_id.in_(users)))
+        db.execute(delete(Ride).where(Ride.driver_id.in_(users)))
+        db.execute(delete(User).where(User.id.in_(users)))
+        db.commit()
+
+
+def _verify(ride_ids: list[int], created_ids: set[int]) -> dict:
+    with SessionLocal() as db:
+        booked = dict(
+            db.execute(
+                select(Booking.ride_id, func.sum(Booking.seats))
+                .where(Booking.ride_id.in_(ride_ids), Booking.status == BookingStatus.confirmed)
+                .group_by(Booking.ride_id)
+            ).all()
+        )
+        confirmed = db.scalar(
+            select(func.count()).where(
+                Booking.ride_id.in_(ride_ids), Booking.status == BookingStatus.confirmed
+            )
+        )
+        rides = db.scalars(select(Ride).where(Ride.id.in_(ride_ids))).all()
+    oversold = [
+        r.id
+        for r in rides
+        if r.seats_left < 0 or r.seats_total - r.seats_left != booked.get(r.id, 0)
+    ]
+    return {
+        "seats_total": sum(r.seats_total for r in rides),
+        "seats_booked": sum(booked.values()),
+        "oversold_rides": oversold,
+        "bookings_confirmed": confirmed,
+        "bookings_acknowledged": len(created_ids),
+    }
+
+
+async def _client(
+    http: httpx.AsyncClient,
+    token: str,
+    ride_ids: list[int],
+    attempts: int,
+    retry_ratio: float,
+    rng: random.Random,
+    results: list,
+) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(attempts):
+        ride_id = rng.choice(ride_ids)
+        body = {"seats": rng.choice((1, 1, 1, 2))}
+        key = uuid.uuid4().hex
+        sends = 2 if rng.random() < retry_ratio else 1
+        for _ in range(sends):
+            t0 = time.perf_counter()
+            r = await http.post(
+                f"/api/rides/{ride_id}/bookings",
+                json=body,
+                headers={**headers, "Idempotency-Key": key},
+            )
+            booking_id = r.json().get("id") if r.status_code in (200, 201) else None
+            results.append((r.status_code, time.perf_counter() - t0, booking_id))
+
+
+async def _run(args, tokens: list[str], ride_ids: list[int]) -> tuple[dict, set[int]]:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    if args.base_url:
+        http = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60)
+    else:
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        http = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60)
+
+    results: list = []
+    async with http:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                _client(http, t, ride_ids, args.attempts, args.retry_ratio, rng, results)
+                for t in tokens
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _, _ in results)
+    latencies = sorted(lat * 1000 for _, lat, _ in results)
+    created_ids = {bid for status, _, bid in results if status == 201}
+    stats = {
+        "clients": len(tokens),
+        "requests": len(results),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(results) / elapsed, 1),
+        "bookings_per_sec": round(statuses[201] / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 1),
+        "status_counts": dict(sorted(statuses.items())),
+    }
+    return stats, created_ids
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--attempts", type=int, default=3, help="reservas por cliente")
+    parser.add_argument("--rides", type=int, default=100)
+    parser.add_argument("--seats", type=int, default=8)
+    parser.add_argument("--retry-ratio", type=float, default=0.2)
+    parser.add_argument("--base-url", default="")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    tag = uuid.uuid4().hex[:8]
+    try:
+        tokens, ride_ids = _setup(tag, args.clients, args.rides, args.seats)
+        stats, created_ids = asyncio.run(_run(args, tokens, ride_ids))
+        check = _verify(ride_ids, created_ids)
+    finally:
+        _cleanup(tag)
+
+    ok = not check["oversold_rides"] and check["bookings_confirmed"] == len(created_ids)
+    print(json.dumps({**stats, **check, "ok": ok}, indent=2))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark de altas: flujo antiguo (SELECT + INSERT/commit/refresh + INSERT/commit) frente al
+registro en una sola transacción (app.auth.registration).
+
+    cd backend && python -m bench.bench_register --users 2000 --concurrency 16
+
+Usa DATABASE_URL (PostgreSQL) y crea usuarios bench-*@bench.local que borra al terminar.
+bcrypt queda fuera: se usa un hash precalculado para medir solo el coste de BD.
+"""
+
+import argparse
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import delete, event
+
+from app.auth.models import EmailCode, User
+from app.auth.registration import build_email_code, insert_user, registration_statement
+from app.core import security
+from app.db.session import SessionLocal, engine
+from app.mail.models import EmailOutbox
+
+PASSWORD_HASH = security.hash_password("bench-password")
+
+_statements = 0
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _count(*args):
+    global _statements
+    _statements += 1
+
+
+def legacy_register(email: str) -> None:
+    # Reproduce el service.register anterior: cuatro viajes y dos commits
+    with SessionLocal() as db:
+        if db.query(User).filter(User.email == email).first():
+            raise RuntimeError("duplicado")
+        user = User(email=email, password_hash=PASSWORD_HASH)
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        rec, outbox = build_email_code(email)
+        db.add_all([r for r in (rec, outbox) if r is not None])
+        db.commit()
+
+
+def single_register(email: str) -> None:
+    with SessionLocal() as db:
+        rec, outbox = build_email_code(email)
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            created = db.execute(registration_statement(email, PASSWORD_HASH, rec, outbox))
+        else:
+            created = db.execute(insert_user(dialect, email, PASSWORD_HASH))
+            db.add_all([r for r in (rec, outbox) if r is not None])
+        if created.scalar() is None:
+            raise RuntimeError("duplicado")
+        db.commit()
+
+
+def _run(fn, users: int, concurrency: int, prefix: str) -> dict:
+    global _statements
+    emails = [f"{prefix}-{i}@bench.local" for i in range(users)]
+    _statements = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fn, emails))
+    elapsed = time.perf_counter() - start
+    return {
+        "signups": users,
+        "seconds": round(elapsed, 3),
+        "signups_per_sec": round(users / elapsed, 1),
+        "statements_per_signup": round(_statements / users, 2),
+    }
+
+
+def _cleanup(prefix: str) -> None:
+    pattern = f"{prefix}-%@bench.local"
+    with SessionLocal() as db:
+        db.execute(delete(EmailOutbox).where(EmailOutbox.to_email.like(pattern)))
+        db.execute(delete(EmailCode).where(EmailCode.email.like(pattern)))
+        db.execute(delete(User).where(User.email.like(pattern)))
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    prefix = f"bench-{uuid.uuid4().hex[:8]}"
+    results = {}
+    try:
+        for name, fn in (("legacy", legacy_register), ("single_tx", single_register)):
+            results[name] = _run(fn, args.users, args.concurrency, f"{prefix}-{name}")
+    finally:
+        _cleanup(prefix)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
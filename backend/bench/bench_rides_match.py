@@ -0,0 +1,119 @@
+"""
+Benchmark de emparejamiento: motor NumPy en memoria (app.rides.matching) frente a recorrer con
+SQL todas las ofertas activas de la universidad y puntuarlas fila a fila en Python.
+
+    cd backend && python -m bench.bench_rides_match --rides 100000 --queries 200
+
+Usa DATABASE_URL; siembra las ofertas (todas de una misma universidad, como en un pico de
+exámenes) con un conductor bench-match-*@bench.local que borra al terminar.
+"""
+
+import argparse
+import heapq
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from app.auth.models import User
+from app.db.session import Base, SessionLocal, engine
+from app.rides.geo import haversine_km
+from app.rides.matching import KM_PER_MINUTE, MatchQuery, ride_matcher
+from app.rides.models import Ride
+from app.rides.service import offers_statement
+from bench.bench_rides_search import random_point, seed_rides
+
+LIMIT = 10
+
+
+def naive_match(db, university: str, q: MatchQuery, now: datetime) -> list[int]:
+    """
+    Lo que haría el servicio sin el motor: traer las ofertas y puntuarlas una a una.
+    """
+    start, end = q.start.timestamp(), q.end.timestamp()
+    scored = []
+    for ride in db.execute(offers_statement(university, now)):
+        earliest = ride.departure_earliest.replace(tzinfo=UTC).timestamp()
+        latest = ride.departure_latest.replace(tzinfo=UTC).timestamp()
+        if earliest > end or latest < start or ride.seats_left < q.seats:
+            continue
+        origin_km = haversine_km(q.origin_lat, q.origin_lon, ride.origin_lat, ride.origin_lon)
+        dest_km = haversine_km(q.dest_lat, q.dest_lon, ride.dest_lat, ride.dest_lon)
+        if origin_km > q.radius_km or dest_km > q.radius_km:
+            continue
+        offset_min = abs((earliest + latest) - (start + end)) / 120.0
+        scored.append((origin_km + dest_km + offset_min * KM_PER_MINUTE, ride.id))
+    return [ride_id for _, ride_id in heapq.nsmallest(LIMIT, scored)]
+
+
+def _run(fn, queries: list[MatchQuery]) -> dict:
+    latencies = []
+    hits = 0
+    for q in queries:
+        t0 = time.perf_counter()
+        hits += len(fn(q))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        "queries": len(queries),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 3),
+        "matches_per_sec": round(len(queries) / (sum(latencies) / 1000), 1),
+        "avg_hits": round(hits / len(queries), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rides", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    rng = random.Random(args.seed)
+    now = datetime.now(UTC)
+    tag = uuid.uuid4().hex[:8]
+    university = f"bench-{tag}"
+    queries = []
+    for _ in range(args.queries):
+        lat, lon = random_point(rng)
+        start = now + timedelta(minutes=rng.randrange(6 * 24 * 60))
+        queries.append(
+            MatchQuery(lat, lon, lat + 0.05, lon + 0.05, start, start + timedelta(hours=2))
+        )
+
+    with SessionLocal() as db:
+        driver = User(email=f"bench-match-{tag}@bench.local", password_hash="bench")
+        db.add(driver)
+        db.commit()
+        try:
+            seed_rides(db, driver.id, args.rides, rng, now, university=university)
+            t0 = time.perf_counter()
+            ride_matcher.load(university, db.execute(offers_statement(university, now)))
+            load_ms = (time.perf_counter() - t0) * 1000
+
+            def engine_with_fetch(q: MatchQuery) -> list[Ride]:
+                ids = [m.ride_id for m in ride_matcher.match(university, q, LIMIT)]
+                return db.scalars(select(Ride).where(Ride.id.in_(ids))).all() if ids else []
+
+            results = {
+                "load_ms": round(load_ms, 1),
+                "engine": _run(lambda q: ride_matcher.match(university, q, LIMIT), queries),
+                "engine_with_fetch": _run(engine_with_fetch, queries),
+                "naive_sql_scan": _run(lambda q: naive_match(db, university, q, now), queries),
+            }
+        finally:
+            db.rollback()
+            db.execute(delete(Ride).where(Ride.driver_id == driver.id))
+            db.execute(delete(User).where(User.id == driver.id))
+            db.commit()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark de búsqueda de viajes cercanos: índice de celdas (app.rides.service) frente a un
+filtro por rectángulo lat/lon sin índice espacial.
+
+    cd backend && python -m bench.bench_rides_search --rides 200000 --queries 500
+
+Usa DATABASE_URL; siembra los viajes con un conductor bench-rides-*@bench.local que borra al
+terminar. Los orígenes se concentran alrededor de varias ciudades universitarias y las
+salidas se reparten en los próximos 7 días.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import delete, insert, select
+
+from app.auth.models import User
+from app.db.session import Base, SessionLocal, engine
+from app.rides.geo import cell_of
+from app.rides.models import Ride, RideStatus
+from app.rides.service import rank_hits, search_statement
+
+CITIES = [
+    (37.18, -3.60),  # Granada
+    (40.42, -3.70),  # Madrid
+    (41.39, 2.17),  # Barcelona
+    (39.47, -0.38),  # Valencia
+    (37.39, -5.98),  # Sevilla
+    (43.26, -2.93),  # Bilbao
+]
+RADIUS_KM = 5.0
+
+
+def random_point(rng: random.Random) -> tuple[float, float]:
+    lat, lon = rng.choice(CITIES)
+    return lat + rng.gauss(0, 0.15), lon + rng.gauss(0, 0.15)
+
+
+def seed_rides(
+    db, driver_id: int, rides: int, rng: random.Random, now: datetime, university: str = "bench"
+) -> None:
+    batch = []
+    for i in range(rides):
+        lat, lon = random_point(rng)
+        start = now + timedelta(minutes=rng.randrange(7 * 24 * 60))
+        batch.append(
+            {
+                "driver_id": driver_id,
+                "university": university,
+                "origin_lat": lat,
+                "origin_lon": lon,
+                "origin_cell": cell_of(lat, lon),
+                "dest_lat": lat + 0.05,
+                "dest_lon": lon + 0.05,
+                "departure_earliest": start,
+                "departure_latest": start + timedelta(minutes=rng.choice((0, 15, 30, 60))),
+                "seats_total": 3,
+                "seats_left": 3,
+                "status": RideStatus.active,
+                "created_at": now,
+            }
+        )
+        if len(batch) == 5000 or i == rides - 1:
+            db.execute(insert(Ride), batch)
+            batch = []
+    db.commit()
+
+
+def _bbox_statement(lat: float, lon: float, start: datetime, end: datetime):
+    d = RADIUS_KM / 111.0 * 1.5
+    return select(Ride).where(
+        Ride.status == RideStatus.active,
+        Ride.origin_lat.between(lat - d, lat + d),
+        Ride.origin_lon.between(lon - d, lon + d),
+        Ride.departure_earliest <= end,
+        Ride.departure_latest >= start,
+        Ride.seats_left > 0,
+    )
+
+
+def _run(db, build, queries: list, now: datetime) -> dict:
+    latencies = []
+    hits = 0
+    for lat, lon, offset in queries:
+        start = now + timedelta(minutes=offset)
+        end = start + timedelta(hours=2)
+        t0 = time.perf_counter()
+        rides = db.scalars(build(lat, lon, start, end))
+        hits += len(rank_hits(rides, lat, lon, RADIUS_KM, 20))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    return {
+        "queries": len(queries),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+        "avg_hits": round(hits / len(queries), 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rides", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    rng = random.Random(args.seed)
+    now = datetime.now(UTC)
+    email = f"bench-rides-{uuid.uuid4().hex[:8]}@bench.local"
+    queries = [(*random_point(rng), rng.randrange(6 * 24 * 60)) for _ in range(args.queries)]
+
+    with SessionLocal() as db:
+        driver = User(email=email, password_hash="bench", is_verified=True)
+        db.add(driver)
+        db.commit()
+        try:
+            seed_rides(db, driver.id, args.rides, rng, now)
+            results = {
+                "cell_index": _run(
+                    db, lambda *q: search_statement(*q[:2], RADIUS_KM, *q[2:]), queries, now
+                ),
+                "bbox_scan": _run(db, _bbox_statement, queries, now),
+            }
+        finally:
+            db.rollback()
+            db.execute(delete(Ride).where(Ride.driver_id == driver.id))
+            db.execute(delete(User).where(User.id == driver.id))
+            db.commit()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
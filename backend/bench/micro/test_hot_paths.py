@@ -0,0 +1,107 @@
+"""
+Micro-benchmarks (pytest-benchmark) de lo que paga cada petición autenticada.
+
+    make bench-micro-baseline   # en main: guarda la referencia
+    make bench-micro            # en la rama: falla si alguna mediana casi se duplica
+
+No entran en `pytest -q` (pytest.ini limita testpaths a tests/). Ninguno toca la BD: miden
+la CPU de la función, que es lo que se multiplica por cada petición.
+"""
+
+import logging
+import sys
+
+import pytest
+
+from app.auth import service as auth_service
+from app.auth.cache import UserSnapshot, user_cache
+from app.auth.domains import DomainPolicy, email_domains
+from app.auth.router import current_snapshot, token_identity
+from app.core.config import Settings, settings
+from app.core.logging import JsonFormatter
+from app.core.security import create_access_token
+from app.profile.service import get_profile
+
+# Del tamaño de una lista real de universidades españolas (ALLOWED_EMAIL_DOMAINS)
+DOMAINS = [f"uni{i}.es" for i in range(60)] + ["ugr.es", "ual.es"]
+
+SNAPSHOT = UserSnapshot(
+    id=42,
+    email="ada@alumnos.ugr.es",
+    is_active=True,
+    is_verified=True,
+    token_version=3,
+    full_name="Ada Lovelace",
+    university="UGR",
+    degree="Informática",
+    course=3,
+    ride_intent="both",
+    avatar_url="/media/avatars/42_0123456789abcdef.jpg",
+    profile_version=7,
+)
+CLAIMS = {"ver": 3}
+
+
+@pytest.fixture()
+def token():
+    return create_access_token(sub=str(SNAPSHOT.id), claims=CLAIMS)
+
+
+def test_create_access_token(benchmark):
+    assert benchmark(create_access_token, sub="42", claims=CLAIMS)
+
+
+def test_token_identity(benchmark, token):
+    assert benchmark(token_identity, token) == (42, 3)
+
+
+def test_current_snapshot_cache_hit(benchmark, token, monkeypatch):
+    # Camino de AUTH_STATELESS: JWT + caché de snapshots, sin BD (db no se llega a usar)
+    monkeypatch.setattr(settings, "auth_stateless", True)
+    user_cache.set(SNAPSHOT)
+    try:
+        assert benchmark(current_snapshot, token, None) == SNAPSHOT
+    finally:
+        user_cache.invalidate(SNAPSHOT.id)
+
+
+def test_parse_domains(benchmark):
+    raw = ", ".join(d.upper() for d in DOMAINS)
+    assert benchmark(Settings.parse_domains, raw) == DOMAINS
+
+
+def test_compile_domain_policy(benchmark):
+    assert benchmark(DomainPolicy, DOMAINS).size == len(DOMAINS)
+
+
+@pytest.mark.parametrize("domain", ["alumnos.ugr.es", "gmail.com"])
+def test_is_allowed_domain(benchmark, monkeypatch, domain):
+    monkeypatch.setattr(email_domains, "policy", DomainPolicy(DOMAINS))
+    assert benchmark(auth_service._is_allowed_domain, domain) == domain.endswith("ugr.es")
+
+
+def test_get_profile(benchmark):
+    out = benchmark(get_profile, None, SNAPSHOT)
+    assert out.ride_intent == "both" and out.avatar_variants
+
+
+def test_json_formatter(benchmark):
+    record = logging.LogRecord(
+        "auth", logging.INFO, __file__, 1, "Login de %s en %.1f ms", ("user 42", 3.14), None
+    )
+    assert '"level":"INFO"' in benchmark(JsonFormatter().format, record)
+
+
+def test_json_formatter_exception(benchmark):
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        exc_info = sys.exc_info()
+    record = logging.LogRecord("auth", logging.ERROR, __file__, 1, "Fallo", (), exc_info)
+    formatter = JsonFormatter()
+
+    def format_uncached():
+        record.exc_text = None  # logging cachea la traza en el record
+        return formatter.format(record)
+
+    assert "ValueError" in benchmark(format_uncached)
@@ -0,0 +1,49 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.auth.cache import user_cache
+from app.auth.models import User
+from app.auth.service import token_claims
+from app.core.security import create_access_token
+from app.db.session import Base, get_db
+from app.main import app
+
+
+@pytest.fixture()
+def sqlite_engine():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def api_client(sqlite_engine):
+    """
+    TestClient autenticado como ada@ugr.es (verificada) sobre SQLite en memoria.
+    """
+    session_factory = sessionmaker(bind=sqlite_engine)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    with session_factory() as db:
+        user = User(email="ada@ugr.es", password_hash="h", is_verified=True)
+        db.add(user)
+        db.commit()
+        token = create_access_token(sub=str(user.id), claims=token_claims(user))
+    # Cada test tiene su BD pero la caché de snapshots es global (mismos ids)
+    user_cache.invalidate(user.id)
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app, headers={"Authorization": f"Bearer {token}"})
+    app.dependency_overrides.pop(get_db)
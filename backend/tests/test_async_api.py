@@ -0,0 +1,160 @@
+"""
+Los routers y servicios de DB_ASYNC sobre sqlite+aiosqlite, con el mismo recorrido que los
+síncronos: así se nota cuando los dos stacks divergen.
+"""
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from app.auth import router_async as auth_router
+from app.auth.models import User
+from app.core.ratelimit import rate_limiter
+from app.db.session import Base, get_async_db
+from app.profile import router_async as profile_router
+from app.rides import router_async as rides_router
+from app.rides.models import Booking, BookingStatus, Ride, RideStatus
+
+PROFILE = {
+    "full_name": "Ada",
+    "university": "UGR",
+    "degree": "Informática",
+    "course": 2,
+    "ride_intent": "both",
+}
+
+
+@pytest.fixture()
+def async_app(tmp_path, monkeypatch):
+    """
+    App con los routers async y (url síncrona, app). Cada petición del TestClient corre en su
+    propio event loop: NullPool para no reutilizar conexiones aiosqlite entre loops.
+    """
+    path = tmp_path / "async.db"
+    sync_url = f"sqlite:///{path}"
+    Base.metadata.create_all(create_engine(sync_url))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with session_factory() as db:
+            yield db
+
+    codes = {}
+    monkeypatch.setattr(
+        auth_router,
+        "queue_verification_email",
+        lambda bg, *, to_email, code: codes.__setitem__(to_email, code),
+    )
+    rate_limiter.buckets.clear()
+    app = FastAPI()
+    app.include_router(auth_router.router)
+    app.include_router(profile_router.router, prefix="/api")
+    app.include_router(rides_router.router, prefix="/api")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    yield sync_url, TestClient(app), codes
+    rate_limiter.buckets.clear()
+
+
+def _login(client, codes, email):
+    credentials = {"email": email, "password": "secreto1"}
+    assert client.post("/api/auth/register", json=credentials).status_code == 204
+    r = client.post("/api/auth/verify", json={"email": email, "code": codes[email]})
+    assert r.status_code == 204
+    return _auth(client.post("/api/auth/login", json=credentials).json()["access_token"])
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_auth_and_profile(async_app):
+    _, client, codes = async_app
+    ada = _login(client, codes, "ada@ugr.es")
+    assert client.get("/api/auth/me", headers=ada).json()["email"] == "ada@ugr.es"
+    wrong = {"email": "ada@ugr.es", "password": "otra"}
+    assert client.post("/api/auth/login", json=wrong).status_code == 401
+    assert (
+        client.post("/api/auth/register", json={**wrong, "password": "otra12"}).status_code == 400
+    )
+    bob = {"email": "bob@ugr.es", "password": "secreto1"}
+    assert client.post("/api/auth/register", json=bob).status_code == 204
+    assert client.post("/api/auth/resend", json={"email": "bob@ugr.es"}).status_code == 204
+    r = client.post("/api/auth/verify", json={"email": "bob@ugr.es", "code": codes["bob@ugr.es"]})
+    assert r.status_code == 204
+
+    etag = client.put("/api/me/profile", json=PROFILE, headers=ada).headers["etag"]
+    r = client.get("/api/me/profile", headers={**ada, "If-None-Match": etag})
+    assert r.status_code == 304
+    r = client.patch("/api/me/profile", json={"course": 3}, headers={**ada, "If-Match": etag})
+    assert r.status_code == 200 and r.json()["course"] == 3
+    r = client.patch("/api/me/profile", json={"course": 4}, headers={**ada, "If-Match": etag})
+    assert r.status_code == 412
+
+
+def test_rides_bookings_and_cancel(async_app):
+    sync_url, client, codes = async_app
+    ada, bob = _login(client, codes, "ada@ugr.es"), _login(client, codes, "bob@ugr.es")
+    for who, intent in ((ada, "offers"), (bob, "seeks")):
+        client.put("/api/me/profile", json={**PROFILE, "ride_intent": intent}, headers=who)
+
+    start = datetime.now(UTC) + timedelta(hours=2)
+    ride = client.post(
+        "/api/rides",
+        json={
+            "origin_lat": 37.17,
+            "origin_lon": -3.60,
+            "dest_lat": 37.197,
+            "dest_lon": -3.624,
+            "departure_earliest": start.isoformat(),
+            "departure_latest": (start + timedelta(minutes=30)).isoformat(),
+            "seats_total": 2,
+        },
+        headers=ada,
+    ).json()
+    hits = client.get("/api/rides/search", params={"lat": 37.17, "lon": -3.6}, headers=bob)
+    assert [h["id"] for h in hits.json()] == [ride["id"]]
+
+    key = {**bob, "Idempotency-Key": "k1"}
+    booking = client.post(f"/api/rides/{ride['id']}/bookings", json={"seats": 2}, headers=key)
+    assert booking.status_code == 201
+    assert (
+        client.post(f"/api/rides/{ride['id']}/bookings", json={"seats": 2}, headers=key).status_code
+        == 200
+    )
+    assert (
+        client.post(f"/api/rides/{ride['id']}/bookings", json={"seats": 1}, headers=bob).status_code
+        == 409
+    )
+    cancelled = client.post(f"/api/rides/bookings/{booking.json()['id']}/cancel", headers=bob)
+    assert cancelled.status_code == 200
+    rebooked = client.post(f"/api/rides/{ride['id']}/bookings", json={"seats": 1}, headers=bob)
+    assert rebooked.status_code == 201
+
+    assert client.post(f"/api/rides/{ride['id']}/cancel", headers=bob).status_code == 403
+    # Como en la síncrona, cancelar bloquea la fila (SQLite ignora FOR UPDATE: se mira el SQL)
+    locked = []
+
+    def record(state):
+        sql = str(state.statement.compile(dialect=postgresql.dialect()))
+        locked.append("FROM rides" in sql and sql.endswith("FOR UPDATE"))
+
+    event.listen(Session, "do_orm_execute", record)
+    try:
+        r = client.post(f"/api/rides/{ride['id']}/cancel", headers=ada)
+    finally:
+        event.remove(Session, "do_orm_execute", record)
+    assert any(locked)
+    assert r.status_code == 200 and r.json()["status"] == "cancelled"
+    with create_engine(sync_url).connect() as conn:
+        assert conn.scalar(select(Ride.status)) == RideStatus.cancelled
+        assert conn.scalar(select(Ride.seats_left)) == 1
+        assert conn.scalars(select(Booking.status)).all() == [BookingStatus.cancelled] * 2
+        assert conn.scalar(select(User.is_verified).where(User.email == "bob@ugr.es"))
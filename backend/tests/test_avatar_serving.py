@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.profile import serving
+
+DIGEST = "0123456789abcdef" * 4
+KEY = f"01/23/{DIGEST}_64.webp"
+URL = f"{serving.PUBLIC_PREFIX}/{KEY}"
+BODY = bytes(range(256)) * 4
+
+
+@pytest.fixture(autouse=True)
+def avatar_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(serving, "AVATAR_DIR", str(tmp_path))
+    path = tmp_path / KEY
+    path.parent.mkdir(parents=True)
+    path.write_bytes(BODY)
+    return path
+
+
+client = TestClient(app)
+
+
+def test_serves_with_immutable_cache_and_strong_etag():
+    r = client.get(URL)
+    assert r.status_code == 200
+    assert r.content == BODY
+    assert r.headers["content-type"] == "image/webp"
+    assert r.headers["etag"] == f'"{DIGEST}_64.webp"'
+    assert "immutable" in r.headers["cache-control"]
+
+    r = client.get(URL, headers={"If-None-Match": f'"other", W/"{DIGEST}_64.webp"'})
+    assert r.status_code == 304
+    assert r.content == b""
+
+    r = client.head(URL)
+    assert r.status_code == 200
+    assert r.headers["content-length"] == str(len(BODY))
+
+
+def test_ranges():
+    r = client.get(URL, headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.content == BODY[10:20]
+    assert r.headers["content-range"] == f"bytes 10-19/{len(BODY)}"
+
+    r = client.get(URL, headers={"Range": "bytes=-6"})
+    assert r.status_code == 206 and r.content == BODY[-6:]
+
+    r = client.get(URL, headers={"Range": f"bytes={len(BODY)}-"})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(BODY)}"
+
+    # If-Range con otra versión: se ignora el rango
+    r = client.get(URL, headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert r.status_code == 200 and r.content == BODY
+
+
+def test_rejects_unknown_keys():
+    assert client.get(f"{serving.PUBLIC_PREFIX}/../../etc/passwd").status_code == 404
+    assert client.get(f"{serving.PUBLIC_PREFIX}/01/23/{'f' * 64}.png").status_code == 404
+
+
+def test_zerocopysend_when_server_supports_it(avatar_file):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    response = serving.FileRangeResponse(
+        str(avatar_file), 5, 9, 206, {}, "image/webp", send_body=True
+    )
+    scope = {"type": "http", "extensions": {"http.response.zerocopysend": {}}}
+    asyncio.run(response(scope, None, send))
+    assert sent[1]["type"] == "http.response.zerocopysend"
+    assert (sent[1]["offset"], sent[1]["count"]) == (5, 5)
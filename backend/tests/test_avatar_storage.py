@@ -0,0 +1,111 @@
+import time
+from datetime import UTC, datetime, timedelta
+
+import boto3
+import pytest
+from moto import mock_aws
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.models import User
+from app.db.session import Base
+from app.profile import gc
+from app.profile.avatars import public_url
+from app.profile.gc import collect_garbage
+from app.profile.storage import LocalBlobStore, S3BlobStore, blob_key
+
+DIGEST_A = "a" * 64
+DIGEST_B = "b" * 64
+DIGEST_C = "c" * 64
+
+
+@pytest.fixture(params=["local", "s3"])
+def store(request, tmp_path):
+    if request.param == "local":
+        yield LocalBlobStore(str(tmp_path))
+        return
+    # moto hace de S3/MinIO en memoria
+    with mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="avatars")
+        yield S3BlobStore("avatars", prefix="avatars/", client=client)
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _put(store, tmp_path, key: str) -> None:
+    src = tmp_path / f"src-{key.replace('/', '-')}"
+    src.write_bytes(key.encode())
+    store.put_file(key, str(src), "image/png")
+
+
+def test_store_contract(store, tmp_path):
+    keys = [blob_key(DIGEST_B, ".png"), blob_key(DIGEST_A, "_64.webp"), blob_key(DIGEST_A, ".png")]
+    for key in keys:
+        _put(store, tmp_path, key)
+
+    assert store.exists(blob_key(DIGEST_A, ".png"))
+    assert not store.exists(blob_key(DIGEST_A, ".jpg"))
+    assert store.modified(blob_key(DIGEST_A, ".jpg")) is None
+    listed = list(store.iter_blobs())
+    assert [b.key for b in listed] == sorted(keys)
+    assert [b.digest for b in listed] == [DIGEST_A, DIGEST_A, DIGEST_B]
+    assert [store.modified(b.key) for b in listed] == [b.modified for b in listed]
+
+    store.touch(blob_key(DIGEST_A, ".png"))
+    store.delete_many([blob_key(DIGEST_A, ".png"), blob_key(DIGEST_A, "_64.webp")])
+    assert [b.key for b in store.iter_blobs()] == [blob_key(DIGEST_B, ".png")]
+
+
+def test_gc_removes_only_old_unreferenced_groups(store, tmp_path, db):
+    for digest in (DIGEST_A, DIGEST_B):
+        _put(store, tmp_path, blob_key(digest, ".png"))
+        _put(store, tmp_path, blob_key(digest, "_64.webp"))
+    db.add(
+        User(
+            email="ada@ugr.es", password_hash="h", avatar_url=public_url(blob_key(DIGEST_B, ".png"))
+        )
+    )
+    db.commit()
+
+    # Dentro del margen no se toca nada
+    assert collect_garbage(db, store, batch_size=1, grace=timedelta(hours=1)) == 0
+
+    later = datetime.now(UTC) + timedelta(hours=2)
+    assert (
+        collect_garbage(db, store, batch_size=1, grace=timedelta(hours=1), dry_run=True, now=later)
+        == 2
+    )
+    assert collect_garbage(db, store, batch_size=1, grace=timedelta(hours=1), now=later) == 2
+    assert [b.digest for b in store.iter_blobs()] == [DIGEST_B, DIGEST_B]
+
+
+def test_gc_rechecks_blobs_referenced_or_touched_after_listing(store, tmp_path, db, monkeypatch):
+    for digest in (DIGEST_A, DIGEST_B, DIGEST_C):
+        _put(store, tmp_path, blob_key(digest, ".png"))
+    real_counts = gc.reference_counts
+
+    def interleaved(session, urls):
+        # Tras leer las referencias del lote: un usuario confirma A y una subida toca B
+        counts = real_counts(session, urls)
+        if not session.query(User).count():
+            url = public_url(blob_key(DIGEST_A, ".png"))
+            session.add(User(email="ada@ugr.es", password_hash="h", avatar_url=url))
+            session.commit()
+            if isinstance(store, S3BlobStore):
+                time.sleep(1)  # LastModified de S3 tiene resolución de segundos
+            store.touch(blob_key(DIGEST_B, ".png"))
+        return counts
+
+    monkeypatch.setattr(gc, "reference_counts", interleaved)
+    later = datetime.now(UTC) + timedelta(hours=2)
+    assert collect_garbage(db, store, batch_size=10, grace=timedelta(hours=1), now=later) == 1
+    assert [b.digest for b in store.iter_blobs()] == [DIGEST_A, DIGEST_B]
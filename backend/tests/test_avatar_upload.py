@@ -0,0 +1,94 @@
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+from starlette.datastructures import Headers
+
+from app.core.config import settings
+from app.profile import avatars
+from app.profile.derivatives import AVATAR_SIZES, avatar_processor, variant_urls
+from app.profile.storage import LocalBlobStore
+
+
+def _upload(raw: bytes, content_type: str = "image/png", size: int | None = None) -> UploadFile:
+    return UploadFile(io.BytesIO(raw), size=size, headers=Headers({"content-type": content_type}))
+
+
+def _png(width: int, height: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def avatar_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(avatars, "AVATAR_DIR", str(tmp_path))
+    monkeypatch.setattr(avatars, "avatar_store", LocalBlobStore(str(tmp_path)))
+    monkeypatch.setattr(settings, "avatar_chunk_bytes", 1024)
+    # Sin pool de procesos en los tests (mismo código, en el threadpool)
+    monkeypatch.setattr(avatar_processor, "use_pool", False)
+    return tmp_path
+
+
+def _stored(avatar_dir) -> list[str]:
+    return sorted(str(p.relative_to(avatar_dir)) for p in avatar_dir.rglob("*") if p.is_file())
+
+
+def test_store_upload_streams_to_content_address_with_variants(avatar_dir):
+    raw = _png(640, 480)
+    url = asyncio.run(avatars.store_upload(_upload(raw)))
+
+    digest = hashlib.sha256(raw).hexdigest()
+    key = f"{digest[:2]}/{digest[2:4]}/{digest}.png"
+    assert url == f"{avatars.PUBLIC_PREFIX}/{key}"
+    assert (avatar_dir / key).read_bytes() == raw
+
+    variants = variant_urls(url)
+    assert set(variants) == {str(px) for px in AVATAR_SIZES}
+    for px in AVATAR_SIZES:
+        for fmt, expected in (("webp", "WEBP"), ("jpeg", "JPEG")):
+            name = variants[str(px)][fmt].removeprefix(f"{avatars.PUBLIC_PREFIX}/")
+            with Image.open(avatar_dir / name) as img:
+                assert img.format == expected and img.size == (px, px)
+    # Original + 3 tamaños x 2 formatos, sin restos en staging
+    assert len(_stored(avatar_dir)) == 1 + len(AVATAR_SIZES) * 2
+
+
+def test_store_upload_deduplicates(avatar_dir):
+    raw = _png(64, 64)
+    first = asyncio.run(avatars.store_upload(_upload(raw)))
+    stored = _stored(avatar_dir)
+    assert asyncio.run(avatars.store_upload(_upload(raw))) == first
+    assert _stored(avatar_dir) == stored
+
+
+def test_store_upload_rejects_non_image(avatar_dir):
+    with pytest.raises(HTTPException) as err:
+        asyncio.run(avatars.store_upload(_upload(b"\x89PNG not really")))
+    assert err.value.status_code == 400
+    assert _stored(avatar_dir) == []
+
+
+def test_store_upload_rejects_oversized(avatar_dir, monkeypatch):
+    monkeypatch.setattr(settings, "avatar_max_bytes", 4096)
+    raw = b"x" * 5000
+
+    # Tamaño conocido de antemano: 413 sin leer
+    with pytest.raises(HTTPException) as err:
+        asyncio.run(avatars.store_upload(_upload(raw, size=len(raw))))
+    assert err.value.status_code == 413
+
+    # Tamaño desconocido: se corta en streaming y no queda el temporal
+    with pytest.raises(HTTPException) as err:
+        asyncio.run(avatars.store_upload(_upload(raw)))
+    assert err.value.status_code == 413
+    assert _stored(avatar_dir) == []
+
+
+def test_store_upload_rejects_content_type():
+    with pytest.raises(HTTPException) as err:
+        asyncio.run(avatars.store_upload(_upload(b"GIF89a", "image/gif")))
+    assert err.value.status_code == 400
@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.auth.cache import UserSnapshot
+from app.auth.models import User
+from app.db.session import Base
+from app.rides import service
+from app.rides.geo import cell_of
+from app.rides.models import Booking, BookingStatus, Ride
+from app.rides.schemas import BookingCreate
+
+
+def _ride(db: Session, driver_id: int, seats: int) -> Ride:
+    start = datetime.now(UTC) + timedelta(hours=2)
+    ride = Ride(
+        driver_id=driver_id,
+        university="UGR",
+        origin_lat=37.18,
+        origin_lon=-3.60,
+        origin_cell=cell_of(37.18, -3.60),
+        dest_lat=37.197,
+        dest_lon=-3.624,
+        departure_earliest=start,
+        departure_latest=start,
+        seats_total=seats,
+        seats_left=seats,
+    )
+    db.add(ride)
+    db.commit()
+    return ride
+
+
+def _snapshot(user: User) -> UserSnapshot:
+    return UserSnapshot.from_user(user)
+
+
+def test_concurrent_bookings_never_oversell(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/book.db", connect_args={"timeout": 30})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        users = [User(email=f"u{i}@ugr.es", password_hash="h") for i in range(21)]
+        db.add_all(users)
+        db.commit()
+        ride_id = _ride(db, users[0].id, seats=5).id
+        passengers = [_snapshot(u) for u in users[1:]]
+
+    def attempt(passenger: UserSnapshot) -> int:
+        with factory() as db:
+            try:
+                service.book_seats(db, passenger, ride_id, BookingCreate(seats=1))
+                return 201
+            except HTTPException as err:
+                return err.status_code
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        results = list(pool.map(attempt, passengers))
+
+    assert results.count(201) == 5 and results.count(409) == 15
+    with factory() as db:
+        assert db.get(Ride, ride_id).seats_left == 0
+        assert db.scalar(select(func.sum(Booking.seats))) == 5
+    engine.dispose()
+
+
+@pytest.fixture()
+def ride_id(sqlite_engine):
+    with Session(sqlite_engine) as db:
+        driver = User(email="bob@ugr.es", password_hash="h", is_verified=True)
+        db.add(driver)
+        db.commit()
+        return _ride(db, driver.id, seats=3).id
+
+
+def test_idempotency_key_replays_the_booking(api_client, sqlite_engine, ride_id):
+    headers = {"Idempotency-Key": "retry-123"}
+    first = api_client.post(f"/api/rides/{ride_id}/bookings", json={"seats": 2}, headers=headers)
+    again = api_client.post(f"/api/rides/{ride_id}/bookings", json={"seats": 2}, headers=headers)
+    assert first.status_code == 201 and again.status_code == 200
+    assert first.json()["id"] == again.json()["id"]
+    assert api_client.get(f"/api/rides/{ride_id}").json()["seats_left"] == 1
+
+    other = api_client.post(f"/api/rides/{ride_id}/bookings", json={"seats": 1}, headers=headers)
+    assert other.status_code == 422
+    with Session(sqlite_engine) as db:
+        assert db.scalar(select(func.count()).select_from(Booking)) == 1
+
+
+def test_overbooking_and_cancel_release_seats(api_client, ride_id):
+    r = api_client.post(f"/api/rides/{ride_id}/bookings", json={"seats": 4})
+    assert r.status_code == 409 and "quedan 3" in r.json()["detail"]
+
+    booking = api_client.post(f"/api/rides/{ride_id}/bookings", json={"seats": 3}).json()
+    assert api_client.post(f"/api/rides/{ride_id}/bookings").status_code == 409
+
+    for _ in range(2):  # cancelar dos veces no devuelve las plazas dos veces
+        r = api_client.post(f"/api/rides/bookings/{booking['id']}/cancel")
+        assert r.status_code == 200 and r.json()["status"] == BookingStatus.cancelled.value
+    assert api_client.get(f"/api/rides/{ride_id}").json()["seats_left"] == 3
+
+
+def test_cancelling_the_ride_cancels_its_bookings(api_client, sqlite_engine, ride_id):
+    booking = api_client.post(f"/api/rides/{ride_id}/bookings", json={"seats": 2}).json()
+    with Session(sqlite_engine) as db:
+        driver = db.scalar(select(User).where(User.email == "bob@ugr.es"))
+        service.cancel_ride(db, _snapshot(driver), ride_id)
+    with Session(sqlite_engine) as db:
+        assert db.get(Booking, booking["id"]).status == BookingStatus.cancelled
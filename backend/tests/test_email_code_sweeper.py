@@ -0,0 +1,53 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.models import EmailCode
+from app.auth.sweeper import sweep_expired_codes
+from app.core.metrics import EMAIL_CODES_ROWS
+from app.db.session import Base
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_sweep_deletes_expired_and_consumed_codes_in_batches(db):
+    now = datetime.now(UTC)
+    for i in range(25):
+        db.add(
+            EmailCode(
+                email=f"old{i}@uni.es",
+                code="000000",
+                expires_at=now - timedelta(minutes=1),
+                consumed=i % 2 == 0,
+            )
+        )
+    db.add(EmailCode(email="new@uni.es", code="123456", expires_at=now + timedelta(minutes=10)))
+    for i in range(5):
+        db.add(
+            EmailCode(
+                email=f"used{i}@uni.es",
+                code="000000",
+                expires_at=now + timedelta(minutes=10),
+                consumed=True,
+            )
+        )
+    db.commit()
+
+    assert sweep_expired_codes(db, batch_size=10, now=now) == 30
+    remaining = db.scalars(select(EmailCode.email)).all()
+    assert remaining == ["new@uni.es"]
+    assert EMAIL_CODES_ROWS._value.get() == 1
+
+    # Idempotente: un segundo barrido no encuentra nada
+    assert sweep_expired_codes(db, batch_size=10, now=now) == 0
+    assert db.scalar(select(func.count()).select_from(EmailCode)) == 1
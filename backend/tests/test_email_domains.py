@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.domains import DomainPolicy, EmailDomains, parse_rule
+from app.auth.models import EmailDomainRule
+
+
+def test_most_specific_rule_wins():
+    policy = DomainPolicy(["ugr.es", "!ext.ugr.es", "*.ual.es", "alumnos.*.es", "!uma.es"])
+    assert policy.allows("ugr.es") and policy.allows("Alumnos.UGR.es")
+    assert not policy.allows("ext.ugr.es") and not policy.allows("a.ext.ugr.es")
+    # "*" ocupa una etiqueta: subdominios sí, el dominio base no
+    assert policy.allows("go.ual.es") and not policy.allows("ual.es")
+    assert policy.allows("alumnos.us.es") and not policy.allows("us.es")
+    # Empate en profundidad: la etiqueta literal gana al comodín y denegar a permitir
+    assert not DomainPolicy(["*.uma.es", "!alumnos.uma.es"]).allows("alumnos.uma.es")
+    assert not DomainPolicy(["ugr.es", "!ugr.es"]).allows("ugr.es")
+    assert not policy.allows("gmail.com")
+
+
+def test_default_depends_on_allow_rules():
+    assert DomainPolicy([]).allows("gmail.com")
+    only_deny = DomainPolicy(["!gmail.com"])
+    assert only_deny.allows("ugr.es") and not only_deny.allows("gmail.com")
+    for bad in ("*", "ugr..es", "-ugr.es", "ugr es"):
+        with pytest.raises(ValueError):
+            parse_rule(bad)
+
+
+def test_reload_from_file_and_table(tmp_path, sqlite_engine):
+    rules = tmp_path / "domains.txt"
+    rules.write_text("# universidades andaluzas\nual.es\n!ext.ual.es  # convenios\n")
+    session_factory = sessionmaker(bind=sqlite_engine)
+    with session_factory() as db:
+        db.add(EmailDomainRule(rule="*.uma.es"))
+        db.commit()
+
+    domains = EmailDomains(["ugr.es"], str(rules), table=True, session_factory=session_factory)
+    assert not domains.allows("ual.es")
+    assert domains.reload() and domains.policy.size == 4
+    assert domains.allows("ual.es") and domains.allows("ciencias.uma.es")
+    assert not domains.allows("ext.ual.es")
+
+    # Una regla rota no se aplica: sigue la política anterior
+    rules.write_text("ual.es\nu al.es\n")
+    assert not domains.reload() and domains.allows("ciencias.uma.es")
+    rules.unlink()
+    assert not domains.reload() and domains.allows("ual.es")
@@ -0,0 +1,71 @@
+import json
+import logging
+import queue
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import logging as app_logging
+from app.core.config import settings
+from app.core.logging import RequestContextMiddleware, setup_logging, shutdown_logging
+from app.core.metrics import LOG_RECORDS_DROPPED
+
+
+@pytest.fixture()
+def json_logs(capsys, monkeypatch):
+    """
+    Devuelve lo escrito por el pipeline de logs como dicts. setup_logging() se llama en el
+    propio test: pytest restaura el nivel del root al acabar cada fase.
+    """
+    monkeypatch.setattr(settings, "log_sample_rates", {"noisy": 0.0})
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level
+
+    def lines() -> list[dict]:
+        shutdown_logging()
+        return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    yield lines
+    shutdown_logging()
+    root.handlers, root.level = saved[0], saved[1]
+
+
+def test_request_context_sampling_and_redaction(json_logs):
+    setup_logging()  # el StreamHandler se queda con el stdout de capsys
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/work")
+    def work():  # síncrono: corre en el threadpool con el contexto de la petición
+        logging.getLogger("mailer").info("Tu código de verificación es: %s", "012345")
+        logging.getLogger("noisy.child").info("descartado")
+        logging.getLogger("noisy.child").warning("siempre")
+        return {}
+
+    client = TestClient(app)
+    assert client.get("/work", headers={"X-Request-ID": "req-1"}).headers["X-Request-ID"] == "req-1"
+    generated = client.get("/work", headers={"X-Request-ID": "no vale\n"}).headers["X-Request-ID"]
+    assert len(generated) == 32
+    logging.getLogger("auth").info("fuera de petición")
+
+    logs = [r for r in json_logs() if r["name"] != "httpx"]
+    assert [(r["name"], r.get("request_id")) for r in logs] == [
+        ("mailer", "req-1"),
+        ("noisy.child", "req-1"),
+        ("mailer", generated),
+        ("noisy.child", generated),
+        ("auth", None),
+    ]
+    assert logs[0]["message"] == "Tu código de verificación es: ******"
+    assert logs[0]["elapsed_ms"] >= 0 and "elapsed_ms" not in logs[-1]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = app_logging._QueueHandler(queue.Queue(maxsize=1))
+    dropped = LOG_RECORDS_DROPPED.labels("queue_full")
+    before = dropped._value.get()
+    for n in range(3):
+        handler.handle(logging.LogRecord("t", logging.INFO, __file__, 1, "n=%d", (n,), None))
+    assert handler.queue.get_nowait().msg == "n=0"
+    assert dropped._value.get() == before + 2
@@ -0,0 +1,96 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.auth.cache import LoginCache, user_cache
+from app.auth.models import User
+from app.auth.router_async import current_snapshot
+from app.auth.service import token_claims
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db.session import Base
+
+
+def _user(**kw):
+    data = {"email": "ada@ugr.es", "password_hash": "h1", "is_active": True, "is_verified": True}
+    data.update(kw)
+    return User(**data)
+
+
+def test_hit_after_remember():
+    cache = LoginCache(enabled=True, maxsize=10, ttl=60, secret="s")
+    user = _user()
+    assert not cache.check(user, "pw")
+    cache.remember(user, "pw")
+    assert cache.check(user, "pw")
+    assert not cache.check(user, "otra")
+
+
+def test_invalidated_by_user_changes():
+    cache = LoginCache(enabled=True, maxsize=10, ttl=60, secret="s")
+    cache.remember(_user(), "pw")
+    assert not cache.check(_user(password_hash="h2"), "pw")
+    assert not cache.check(_user(is_active=False), "pw")
+    assert not cache.check(_user(is_verified=False), "pw")
+
+
+def test_lru_bound_and_disabled():
+    cache = LoginCache(enabled=True, maxsize=1, ttl=60, secret="s")
+    cache.remember(_user(), "a")
+    cache.remember(_user(), "b")
+    assert not cache.check(_user(), "a")
+    assert cache.check(_user(), "b")
+    off = LoginCache(enabled=False, maxsize=10, ttl=60, secret="s")
+    off.remember(_user(), "pw")
+    assert not off.check(_user(), "pw")
+
+
+class _AsyncOnlyStore:
+    """
+    Store "bloqueante" (como Redis) cuyo API síncrono no se puede usar desde el event loop.
+    """
+
+    blocking = True
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, user_id):
+        raise AssertionError("llamada bloqueante en el event loop")
+
+    set = delete = get
+
+    async def aget(self, user_id):
+        self.calls.append(("get", user_id))
+
+    async def aset(self, snap):
+        self.calls.append(("set", snap.id))
+
+    async def adelete(self, user_id):
+        self.calls.append(("delete", user_id))
+
+
+def test_async_stack_uses_async_store(monkeypatch):
+    store = _AsyncOnlyStore()
+    monkeypatch.setattr(user_cache, "store", store)
+    monkeypatch.setattr(settings, "auth_stateless", True)
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            user = _user()
+            db.add(user)
+            await db.commit()
+            token = create_access_token(sub=str(user.id), claims=token_claims(user))
+            assert (await current_snapshot(token, db)).email == "ada@ugr.es"
+
+            user.full_name = "Ada"
+            await db.commit()  # after_commit corre en el hilo del loop: invalida con una tarea
+            await asyncio.sleep(0)
+        await engine.dispose()
+        return user.id
+
+    user_id = asyncio.run(scenario())
+    assert store.calls == [("get", user_id), ("set", user_id), ("delete", user_id)]
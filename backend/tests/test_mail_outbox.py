@@ -0,0 +1,172 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.mail_outbox import MailOutbox, SmtpSender
+from app.core.mailer import build_verification_message
+from app.db.session import Base
+from app.mail.models import EmailOutbox
+from app.mail.relay import purge_outbox, relay_once
+
+
+class StubSmtpServer:
+    """
+    Servidor SMTP mínimo en memoria (hace de MailHog en los tests).
+    """
+
+    def __init__(self, fail_first_data: int = 0):
+        self.connections = 0
+        self.messages: list[bytes] = []
+        self.fail_first_data = fail_first_data
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        writer.write(b"220 stub ESMTP\r\n")
+        while line := await reader.readline():
+            cmd = line.decode().strip().upper()
+            if cmd.startswith(("EHLO", "HELO")):
+                writer.write(b"250 stub\r\n")
+            elif cmd == "DATA":
+                writer.write(b"354 go ahead\r\n")
+                await writer.drain()
+                data = await reader.readuntil(b"\r\n.\r\n")
+                if self.fail_first_data:
+                    self.fail_first_data -= 1
+                    writer.write(b"451 try again later\r\n")
+                else:
+                    self.messages.append(data)
+                    writer.write(b"250 queued\r\n")
+            elif cmd == "QUIT":
+                writer.write(b"221 bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 ok\r\n")
+            await writer.drain()
+        writer.close()
+
+
+async def _deliver(server: StubSmtpServer, count: int) -> MailOutbox:
+    srv = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+    outbox = MailOutbox(
+        workers=1,
+        max_queue=100,
+        batch_size=10,
+        max_attempts=3,
+        retry_base_seconds=0.01,
+        sender_factory=lambda: SmtpSender("127.0.0.1", port),
+    )
+    await outbox.start()
+    for i in range(count):
+        outbox.enqueue(build_verification_message(to_email=f"u{i}@ugr.es", code="123456"))
+    for _ in range(200):
+        if len(server.messages) == count:
+            break
+        await asyncio.sleep(0.01)
+    await outbox.stop()
+    srv.close()
+    await srv.wait_closed()
+    return outbox
+
+
+def test_batch_reuses_one_connection():
+    server = StubSmtpServer()
+    asyncio.run(_deliver(server, 5))
+    assert len(server.messages) == 5
+    assert server.connections == 1
+
+
+def test_transient_failure_is_retried():
+    server = StubSmtpServer(fail_first_data=1)
+    asyncio.run(_deliver(server, 2))
+    assert len(server.messages) == 2
+
+
+def test_stop_flushes_pending_retries():
+    async def run():
+        server = StubSmtpServer(fail_first_data=1)
+        srv = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+        port = srv.sockets[0].getsockname()[1]
+        # Backoff de una hora: el reintento solo sale si stop() lo adelanta
+        outbox = MailOutbox(1, 100, 10, 3, 3600, lambda: SmtpSender("127.0.0.1", port))
+        await outbox.start()
+        outbox.enqueue(build_verification_message(to_email="u@ugr.es", code="123456"))
+        while not outbox._retrying:
+            await asyncio.sleep(0.01)
+        await outbox.stop()
+        srv.close()
+        await srv.wait_closed()
+        return server
+
+    assert len(asyncio.run(run()).messages) == 1
+
+
+def test_full_queue_drops_instead_of_failing():
+    async def run():
+        outbox = MailOutbox(0, 1, 10, 3, 0.01, sender_factory=None)
+        await outbox.start()
+        for _ in range(3):
+            outbox.enqueue(build_verification_message(to_email="u@ugr.es", code="123456"))
+        return outbox._queue.qsize()
+
+    assert asyncio.run(run()) == 1
+
+
+async def _relay(server: StubSmtpServer, count: int) -> list[EmailOutbox]:
+    srv = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with factory() as db, db.begin():
+        for i in range(count):
+            msg = build_verification_message(to_email=f"u{i}@ugr.es", code="123456")
+            db.add(EmailOutbox.from_message("verify_email", msg))
+
+    sender = SmtpSender("127.0.0.1", port)
+    kwargs = {"batch_size": 2, "max_attempts": 3, "retry_base_seconds": 0}
+    while await relay_once(factory, sender, **kwargs):
+        pass
+    await sender.close()
+    async with factory() as db:
+        rows = (await db.scalars(select(EmailOutbox).order_by(EmailOutbox.id))).all()
+    await engine.dispose()
+    srv.close()
+    await srv.wait_closed()
+    return rows
+
+
+def test_relay_marks_rows_sent_in_batches():
+    server = StubSmtpServer(fail_first_data=1)
+    rows = asyncio.run(_relay(server, 3))
+    assert [r.status for r in rows] == ["sent", "sent", "sent"]
+    assert rows[0].attempts == 1
+    assert len(server.messages) == 3
+
+
+def test_purge_outbox_deletes_only_old_finished_rows():
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        now = datetime.now(UTC)
+        old = now - timedelta(days=30)
+        rows = [("sent", old)] * 3 + [("failed", old), ("pending", old), ("sent", now)]
+        async with factory() as db, db.begin():
+            for status, created in rows:
+                msg = build_verification_message(to_email="u@ugr.es", code="123456")
+                row = EmailOutbox.from_message("verify_email", msg)
+                row.status, row.created_at = status, created
+                db.add(row)
+        purged = await purge_outbox(factory, now - timedelta(days=7), batch_size=2)
+        async with factory() as db:
+            left = (await db.scalars(select(EmailOutbox.status).order_by(EmailOutbox.id))).all()
+        await engine.dispose()
+        return purged, left
+
+    assert asyncio.run(run()) == (4, ["pending", "sent"])
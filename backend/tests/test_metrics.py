@@ -0,0 +1,43 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app.core.metrics import MetricsMiddleware, metrics_router
+
+engine = create_engine("sqlite://")
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    return app
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_labels_use_route_template_and_count_queries():
+    client = TestClient(_app())
+    before = _sample("unigo_requests_total", method="GET", path="/items/{item_id}", status="200")
+    queries = _sample("unigo_db_queries_per_request_sum", method="GET", path="/items/{item_id}")
+
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+    assert client.get("/nope/3").status_code == 404
+
+    labels = {"method": "GET", "path": "/items/{item_id}"}
+    assert _sample("unigo_requests_total", status="200", **labels) == before + 2
+    assert _sample("unigo_db_queries_per_request_sum", **labels) == queries + 4
+    assert _sample("unigo_requests_total", method="GET", path="<unmatched>", status="404") >= 1
+    assert "/items/1" not in client.get("/metrics").text
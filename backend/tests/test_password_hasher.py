@@ -0,0 +1,22 @@
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.hashing import PasswordHasher
+
+
+def test_pool_hash_roundtrip():
+    hasher = PasswordHasher(workers=1, max_queue=4, retry_after=1)
+    try:
+        hashed = hasher.run("hash", security.hash_password, "secreto123")
+        assert hasher.run("verify", security.verify_password, "secreto123", hashed)
+    finally:
+        hasher.shutdown()
+
+
+def test_full_queue_returns_503():
+    hasher = PasswordHasher(workers=1, max_queue=0, retry_after=7, use_pool=False)
+    with pytest.raises(HTTPException) as exc:
+        hasher.run("hash", security.hash_password, "secreto123")
+    assert exc.value.status_code == 503
+    assert exc.value.headers["Retry-After"] == "7"
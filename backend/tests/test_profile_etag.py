@@ -0,0 +1,40 @@
+PROFILE = {
+    "full_name": "Ada",
+    "university": "UGR",
+    "degree": "Informática",
+    "course": 2,
+    "ride_intent": "both",
+}
+
+
+def test_get_profile_etag_and_304(api_client):
+    r = api_client.get("/api/me/profile")
+    etag = r.headers["etag"]
+    assert r.status_code == 200
+    assert r.headers["cache-control"] == "private, no-cache"
+
+    r = api_client.get("/api/me/profile", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+
+    # Un PUT con cambios invalida el ETag; uno idéntico no
+    changed = api_client.put("/api/me/profile", json=PROFILE).headers["etag"]
+    assert changed != etag
+    assert api_client.get("/api/me/profile", headers={"If-None-Match": etag}).status_code == 200
+    assert api_client.put("/api/me/profile", json=PROFILE).headers["etag"] == changed
+
+
+def test_put_if_match_detects_concurrent_edit(api_client):
+    etag = api_client.get("/api/me/profile").headers["etag"]
+
+    # Pestaña A guarda con el ETag que leyó
+    r = api_client.put("/api/me/profile", json=PROFILE, headers={"If-Match": etag})
+    assert r.status_code == 200
+
+    # Pestaña B guarda con el mismo ETag (ya obsoleto): 412, no pisa los cambios de A
+    r = api_client.put(
+        "/api/me/profile", json={**PROFILE, "full_name": "Otra"}, headers={"If-Match": etag}
+    )
+    assert r.status_code == 412
+    assert r.headers["etag"] != etag
+    assert api_client.get("/api/me/profile").json()["full_name"] == "Ada"
@@ -0,0 +1,76 @@
+from sqlalchemy import event, select, update
+
+from app.auth.models import User
+from app.core.config import settings
+
+PROFILE = {
+    "full_name": "Ada",
+    "university": "UGR",
+    "degree": "Informática",
+    "course": 2,
+    "ride_intent": "both",
+}
+
+
+def _count_statements(engine) -> list[str]:
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda c, cur, stmt, *a: statements.append(stmt))
+    return statements
+
+
+def test_patch_updates_only_supplied_fields_in_one_statement(api_client, sqlite_engine):
+    api_client.put("/api/me/profile", json=PROFILE)
+    statements = _count_statements(sqlite_engine)
+
+    r = api_client.patch("/api/me/profile", json={"course": 3})
+    assert r.status_code == 200
+    assert r.json()["course"] == 3 and r.json()["full_name"] == "Ada"
+    writes = [s for s in statements if s.lstrip().upper().startswith("UPDATE")]
+    assert len(writes) == 1 and "RETURNING" in writes[0]
+    assert "full_name" not in writes[0].split("RETURNING")[0]
+    assert api_client.get("/api/me/profile").json()["course"] == 3
+
+
+def test_patch_without_changes_skips_the_write(api_client, sqlite_engine):
+    etag = api_client.put("/api/me/profile", json=PROFILE).headers["etag"]
+    statements = _count_statements(sqlite_engine)
+
+    r = api_client.patch("/api/me/profile", json={"full_name": "Ada"})
+    assert r.status_code == 200
+    assert r.headers["etag"] == etag
+    assert not [s for s in statements if s.lstrip().upper().startswith("UPDATE")]
+
+
+def test_patch_validation_and_if_match(api_client):
+    assert api_client.patch("/api/me/profile", json={"course": 9}).status_code == 422
+    assert api_client.patch("/api/me/profile", json={"full_name": None}).status_code == 422
+    assert api_client.patch("/api/me/profile", json={"avatar_url": "x"}).status_code == 422
+
+    etag = api_client.get("/api/me/profile").headers["etag"]
+    assert (
+        api_client.patch(
+            "/api/me/profile", json={"degree": "Mates"}, headers={"If-Match": etag}
+        ).status_code
+        == 200
+    )
+    r = api_client.patch("/api/me/profile", json={"degree": "Física"}, headers={"If-Match": etag})
+    assert r.status_code == 412
+    assert api_client.get("/api/me/profile").json()["degree"] == "Mates"
+
+
+def test_stale_cached_snapshot_never_loses_a_patch(api_client, sqlite_engine, monkeypatch):
+    monkeypatch.setattr(settings, "auth_stateless", True)
+    api_client.put("/api/me/profile", json=PROFILE)
+    stale_etag = api_client.get("/api/me/profile").headers["etag"]  # snapshot en caché
+    # Otro worker cambia el curso: su invalidación no llega a la caché de este
+    with sqlite_engine.begin() as conn:
+        conn.execute(update(User).values(course=3, profile_version=User.profile_version + 1))
+
+    r = api_client.patch("/api/me/profile", json={"course": 2})
+    assert r.status_code == 200 and r.json()["course"] == 2
+    with sqlite_engine.connect() as conn:
+        assert conn.scalar(select(User.course)) == 2
+
+    # Sin nada que cambiar la BD decide igual, y el If-Match se compara con su versión
+    r = api_client.patch("/api/me/profile", json={"course": 2}, headers={"If-Match": stale_etag})
+    assert r.status_code == 412
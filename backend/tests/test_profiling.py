@@ -0,0 +1,40 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.profiling import ProfilingMiddleware, phase, sign_profile_request
+
+
+def _app(out_dir, secret="s3cret") -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        ProfilingMiddleware, sample_rate=0.0, secret=secret, out_dir=str(out_dir), enabled=False
+    )
+
+    @app.get("/work")
+    def work():
+        with phase("service.work"):
+            sum(range(1000))
+        return {"ok": True}
+
+    return app
+
+
+def test_signed_header_profiles_request(tmp_path):
+    client = TestClient(_app(tmp_path))
+    header = sign_profile_request("s3cret", "GET", "/work")
+    r = client.get("/work", headers={"X-UniGo-Profile": header})
+    assert r.status_code == 200
+    assert "service.work;dur=" in r.headers["server-timing"]
+    meta = json.loads(next(tmp_path.glob("*.json")).read_text())
+    assert meta["route"] == "/work"
+    assert next(tmp_path.glob("*.collapsed")).exists()
+
+
+def test_unsigned_or_forged_requests_are_not_profiled(tmp_path):
+    client = TestClient(_app(tmp_path))
+    assert "server-timing" not in client.get("/work").headers
+    forged = sign_profile_request("otro", "GET", "/work")
+    assert "server-timing" not in client.get("/work", headers={"X-UniGo-Profile": forged}).headers
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.auth import service
+from app.auth.models import EmailCode, User
+from app.core import ratelimit
+from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_DECISIONS
+from app.core.ratelimit import MemoryBuckets, Rate, rate_limited, rate_limiter
+from app.db.session import Base
+
+
+@pytest.fixture(autouse=True)
+def _fresh_buckets():
+    rate_limiter.buckets.clear()
+    yield
+    rate_limiter.buckets.clear()
+
+
+def test_parse_rates():
+    assert Rate.parse("10/minute") == Rate(10, 60.0)
+    assert Rate.parse(" 3 / hours ").per_second == 3 / 3600
+    for bad in ("10", "0/minute", "10/fortnight"):
+        with pytest.raises(ValueError):
+            Rate.parse(bad)
+
+
+def test_bucket_allows_bursts_then_refills(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: clock[0])
+    buckets, rate = MemoryBuckets(max_keys=10), Rate(2, 60.0)
+
+    async def take():
+        return await buckets.take("k", rate)
+
+    assert [asyncio.run(take()) for _ in range(2)] == [0.0, 0.0]
+    assert asyncio.run(take()) == pytest.approx(30.0)
+    clock[0] += 30
+    assert asyncio.run(take()) == 0.0
+
+
+def test_denied_requests_never_reach_the_handler():
+    calls = []
+    app = FastAPI()
+
+    @app.post("/login", dependencies=[Depends(rate_limited("t-login", "3/minute", "2/minute"))])
+    def login(payload: dict):
+        calls.append(payload["email"])
+        return {}
+
+    client = TestClient(app)
+    deny = RATE_LIMIT_DECISIONS.labels("t-login", "email", "deny")
+    before = deny._value.get()
+    statuses = [client.post("/login", json={"email": "Ada@ugr.es"}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert deny._value.get() == before + 1
+
+    # Otro email pasa el límite por email, pero la IP ya ha gastado sus 3 fichas
+    r = client.post("/login", json={"email": "bob@ugr.es"})
+    assert r.status_code == 429 and int(r.headers["Retry-After"]) >= 1
+    assert calls == ["Ada@ugr.es", "Ada@ugr.es"]
+
+
+def test_email_code_attempts_are_enforced():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(User(email="ada@ugr.es", password_hash="h"))
+    code = EmailCode(
+        email="ada@ugr.es", code="123456", expires_at=datetime.now(UTC) + timedelta(minutes=5)
+    )
+    db.add(code)
+    db.commit()
+
+    for _ in range(settings.email_code_max_attempts):
+        with pytest.raises(HTTPException) as err:
+            service.verify_email(db, "ada@ugr.es", "000000")
+        assert err.value.status_code == 400
+    with pytest.raises(HTTPException) as err:
+        service.verify_email(db, "ada@ugr.es", "123456")
+    assert err.value.status_code == 429 and code.attempts == settings.email_code_max_attempts
+
+    # Con el código agotado la cuenta no queda bloqueada: se pide otro
+    new_code = service.resend_code(db, "ada@ugr.es")
+    db.refresh(code)
+    assert code.consumed
+    service.verify_email(db, "ada@ugr.es", new_code)
+    assert db.query(User).one().is_verified
+    assert service.resend_code(db, "ada@ugr.es") is None
+    db.close()
+    engine.dispose()
@@ -0,0 +1,80 @@
+import logging
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.auth import router as auth_router
+from app.auth.models import EmailCode, User
+from app.auth.registration import build_email_code, registration_statement
+from app.core.config import settings
+from app.core.ratelimit import rate_limiter
+from app.mail.models import EmailOutbox
+
+
+@pytest.fixture()
+def codes(monkeypatch):
+    # Sin outbox arrancado el email saldría por SMTP: se captura el código
+    sent: dict[str, str] = {}
+    monkeypatch.setattr(
+        auth_router,
+        "queue_verification_email",
+        lambda bg, *, to_email, code: sent.__setitem__(to_email, code),
+    )
+    rate_limiter.buckets.clear()
+    yield sent
+    rate_limiter.buckets.clear()
+
+
+def _count(db: Session, model) -> int:
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_register_writes_user_and_code_together(api_client, sqlite_engine, codes, caplog):
+    caplog.set_level(logging.INFO)
+    r = api_client.post("/api/auth/register", json={"email": "bob@ugr.es", "password": "secreto1"})
+    assert r.status_code == 204
+    with Session(sqlite_engine) as db:
+        user = db.scalar(select(User).where(User.email == "bob@ugr.es"))
+        code = db.scalar(select(EmailCode).where(EmailCode.email == "bob@ugr.es"))
+        assert user is not None and not user.is_verified
+        assert code.code == codes["bob@ugr.es"] and not code.consumed
+    # El código solo viaja por email
+    assert "bob@ugr.es" in caplog.text and codes["bob@ugr.es"] not in caplog.text
+
+
+def test_duplicate_email_is_rejected_without_orphan_rows(api_client, sqlite_engine, codes):
+    r = api_client.post("/api/auth/register", json={"email": "ada@ugr.es", "password": "secreto1"})
+    assert r.status_code == 400 and "ada@ugr.es" in r.json()["detail"]
+    assert codes == {}
+    with Session(sqlite_engine) as db:
+        assert _count(db, User) == 1
+        assert _count(db, EmailCode) == 0
+
+
+def test_register_writes_the_outbox_row_in_the_same_transaction(
+    api_client, sqlite_engine, codes, monkeypatch
+):
+    monkeypatch.setattr(settings, "mail_outbox_table", True)
+    r = api_client.post("/api/auth/register", json={"email": "bob@ugr.es", "password": "secreto1"})
+    assert r.status_code == 204
+    r = api_client.post("/api/auth/register", json={"email": "bob@ugr.es", "password": "secreto1"})
+    assert r.status_code == 400
+    with Session(sqlite_engine) as db:
+        assert _count(db, EmailCode) == 1
+        outbox = db.scalars(select(EmailOutbox)).one()
+        assert outbox.to_email == "bob@ugr.es" and outbox.status == "pending"
+
+
+@pytest.mark.parametrize("outbox_table", [False, True])
+def test_postgres_registration_is_a_single_statement(monkeypatch, outbox_table):
+    # SQLite no admite INSERT dentro de un CTE: se comprueba la sentencia de PostgreSQL
+    monkeypatch.setattr(settings, "mail_outbox_table", outbox_table)
+    rec, outbox = build_email_code("bob@ugr.es")
+    stmt = registration_statement("bob@ugr.es", "hash", rec, outbox)
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("WITH new_user AS")
+    assert "ON CONFLICT (email) DO NOTHING RETURNING users.id" in sql
+    assert "INSERT INTO email_codes" in sql
+    assert ("INSERT INTO email_outbox" in sql) is outbox_table
@@ -0,0 +1,113 @@
+import asyncio
+import json
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from starlette.websockets import WebSocketDisconnect
+
+from app.auth.models import User
+from app.core.config import settings
+from app.main import app
+from app.rides.geo import cell_of
+from app.rides.live import LiveHub, MemoryBroker
+from app.rides.models import Ride
+
+
+@pytest.fixture()
+def ride_id(sqlite_engine):
+    start = datetime.now(UTC) + timedelta(hours=2)
+    with Session(sqlite_engine) as db:
+        driver = User(email="bob@ugr.es", password_hash="h", is_verified=True)
+        db.add(driver)
+        db.flush()
+        ride = Ride(
+            driver_id=driver.id,
+            university="UGR",
+            origin_lat=37.18,
+            origin_lon=-3.60,
+            origin_cell=cell_of(37.18, -3.60),
+            dest_lat=37.197,
+            dest_lon=-3.624,
+            departure_earliest=start,
+            departure_latest=start,
+            seats_total=3,
+            seats_left=3,
+        )
+        db.add(ride)
+        db.commit()
+        return ride.id
+
+
+def test_bookings_are_pushed_to_ride_and_area_subscribers(api_client, ride_id):
+    with api_client.websocket_connect("/api/rides/live") as ws:
+        ws.send_json({"op": "subscribe", "rides": [ride_id]})
+        assert ws.receive_json() == {"type": "ok", "op": "subscribe", "topics": 1}
+        booking = api_client.post(f"/api/rides/{ride_id}/bookings", json={"seats": 2}).json()
+        assert ws.receive_json() == {"type": "ride.seats", "ride_id": ride_id, "seats_left": 1}
+
+        ws.send_json({"op": "subscribe", "area": {"lat": 95, "lon": 0}})
+        assert ws.receive_json()["type"] == "error"
+
+    with api_client.websocket_connect("/api/rides/live") as ws:
+        ws.send_json({"op": "subscribe", "area": {"lat": 37.2, "lon": -3.6, "radius_km": 3}})
+        assert ws.receive_json()["type"] == "ok"
+        api_client.post(f"/api/rides/bookings/{booking['id']}/cancel")
+        assert ws.receive_json() == {"type": "ride.seats", "ride_id": ride_id, "seats_left": 3}
+
+
+def test_websocket_token_only_in_header_or_subprotocol(api_client):
+    token = api_client.headers["Authorization"].split()[1]
+    client = TestClient(app)
+    # En la URL acabaría en los access logs: no se acepta
+    for url, protocols in (
+        ("/api/rides/live", []),
+        (f"/api/rides/live?token={token}", []),
+        ("/api/rides/live", ["unigo.bearer", "garbage"]),
+    ):
+        with pytest.raises(WebSocketDisconnect) as err:
+            with client.websocket_connect(url, subprotocols=protocols):
+                pass
+        assert err.value.code == 1008
+
+    with api_client.websocket_connect(
+        "/api/rides/live", subprotocols=["unigo.bearer", token], headers={"Authorization": ""}
+    ) as ws:
+        assert ws.accepted_subprotocol == "unigo.bearer"
+
+
+def test_revoked_token_closes_open_connections(api_client, sqlite_engine, monkeypatch):
+    monkeypatch.setattr(settings, "ride_live_auth_check_seconds", 0.05)
+    with api_client.websocket_connect("/api/rides/live") as ws:
+        ws.send_json({"op": "subscribe", "rides": [1]})
+        assert ws.receive_json()["type"] == "ok"
+        with sqlite_engine.begin() as conn:  # p. ej. cambio de contraseña en otro dispositivo
+            conn.execute(update(User).values(token_version=User.token_version + 1))
+        with pytest.raises(WebSocketDisconnect) as err:
+            ws.receive_json()
+        assert err.value.code == 1008
+
+
+def test_slow_consumer_is_evicted_without_blocking_others():
+    async def scenario():
+        hub = LiveHub(MemoryBroker(), queue_max=2, max_topics=3)
+        await hub.start()
+        fast, slow = hub.connect(), hub.connect()
+        hub.subscribe(fast, ["ride:1"])
+        hub.subscribe(slow, ["ride:1", "cell:7"])
+        with pytest.raises(ValueError):
+            hub.subscribe(fast, ["cell:1", "cell:2", "cell:3"])
+
+        for n in range(3):
+            # publish() llega desde el threadpool en los servicios síncronos
+            await asyncio.to_thread(hub.publish, ["ride:1"], {"n": n})
+            assert json.loads(await asyncio.wait_for(fast.queue.get(), 1)) == {"n": n}
+
+        assert slow.evicted.is_set() and not slow.topics
+        assert slow.queue.qsize() == 2
+        hub.publish(["cell:7"], {"n": 99})  # ya sin suscriptores: no se encola nada
+        assert slow.queue.qsize() == 2 and fast.queue.empty()
+
+    asyncio.run(scenario())
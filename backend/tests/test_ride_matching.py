@@ -0,0 +1,139 @@
+import random
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.auth.models import User
+from app.rides.geo import cell_of, haversine_km
+from app.rides.matching import MatchQuery, OfferColumns, offer_row, ride_matcher
+from app.rides.models import Ride
+
+PROFILE = {
+    "full_name": "Ada",
+    "university": "UGR",
+    "degree": "Informática",
+    "course": 2,
+    "ride_intent": "both",
+}
+CAMPUS = (37.1970, -3.6240)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_matcher():
+    ride_matcher.clear()
+    yield
+    ride_matcher.clear()
+
+
+def _offer(ride_id, lat, lon, start, driver_id=1, seats=3):
+    return SimpleNamespace(
+        id=ride_id,
+        driver_id=driver_id,
+        origin_lat=lat,
+        origin_lon=lon,
+        dest_lat=CAMPUS[0],
+        dest_lon=CAMPUS[1],
+        departure_earliest=start,
+        departure_latest=start + timedelta(minutes=30),
+        seats_left=seats,
+    )
+
+
+def test_vectorized_match_agrees_with_row_by_row():
+    rng = random.Random(3)
+    now = datetime.now(UTC)
+    offers = [
+        _offer(i, 37.17 + rng.gauss(0, 0.05), -3.60 + rng.gauss(0, 0.05), now + timedelta(hours=1))
+        for i in range(2000)
+    ]
+    # Altas una a una (la capacidad crece desde 64) y bajas con intercambio
+    columns = OfferColumns()
+    for offer in offers:
+        columns.put(*offer_row(offer))
+    for offer in offers[::3]:
+        columns.remove(offer.id)
+    alive = [o for o in offers if o.id % 3]
+
+    q = MatchQuery(37.17, -3.60, *CAMPUS, now, now + timedelta(hours=2), radius_km=2)
+    got = [m.ride_id for m in columns.match(q, now.timestamp(), 10)]
+    expected = sorted(
+        (o for o in alive if haversine_km(37.17, -3.60, o.origin_lat, o.origin_lon) <= 2),
+        key=lambda o: haversine_km(37.17, -3.60, o.origin_lat, o.origin_lon),
+    )
+    assert got == [o.id for o in expected[:10]]
+
+
+def test_match_filters_seats_window_and_own_rides():
+    now = datetime.now(UTC)
+    columns = OfferColumns.from_offers(
+        [
+            _offer(1, 37.17, -3.60, now + timedelta(hours=1)),
+            _offer(2, 37.17, -3.60, now + timedelta(hours=1), seats=1),
+            _offer(3, 37.17, -3.60, now + timedelta(hours=9)),
+            _offer(4, 37.17, -3.60, now + timedelta(hours=1), driver_id=7),
+        ]
+    )
+    q = MatchQuery(37.17, -3.60, *CAMPUS, now, now + timedelta(hours=2), seats=2, exclude_driver=7)
+    assert [m.ride_id for m in columns.match(q, now.timestamp(), 10)] == [1]
+
+
+def _other_driver_ride(engine) -> int:
+    start = datetime.now(UTC) + timedelta(hours=1)
+    with Session(engine) as db:
+        driver = User(email="bob@ugr.es", password_hash="h", is_verified=True, university="UGR")
+        db.add(driver)
+        db.flush()
+        ride = Ride(
+            driver_id=driver.id,
+            university="UGR",
+            origin_lat=37.18,
+            origin_lon=-3.60,
+            origin_cell=cell_of(37.18, -3.60),
+            dest_lat=CAMPUS[0],
+            dest_lon=CAMPUS[1],
+            departure_earliest=start,
+            departure_latest=start + timedelta(minutes=20),
+            seats_total=3,
+            seats_left=3,
+        )
+        db.add(ride)
+        db.commit()
+        return ride.id
+
+
+def test_matches_endpoint_loads_and_tracks_changes(api_client, sqlite_engine):
+    api_client.put("/api/me/profile", json=PROFILE)
+    other = _other_driver_ride(sqlite_engine)
+    params = {
+        "origin_lat": 37.1717,
+        "origin_lon": -3.5999,
+        "dest_lat": CAMPUS[0],
+        "dest_lon": CAMPUS[1],
+    }
+    r = api_client.get("/api/rides/matches", params=params)
+    assert r.status_code == 200
+    assert [m["id"] for m in r.json()] == [other]
+    assert r.json()[0]["dest_km"] == 0
+
+    start = datetime.now(UTC) + timedelta(hours=1)
+    own = api_client.post(
+        "/api/rides",
+        json={
+            "origin_lat": 37.1717,
+            "origin_lon": -3.5999,
+            "dest_lat": CAMPUS[0],
+            "dest_lon": CAMPUS[1],
+            "departure_earliest": start.isoformat(),
+            "departure_latest": start.isoformat(),
+            "seats_total": 2,
+        },
+    ).json()
+    # Alta incremental: el motor ya la tiene, pero no se ofrece a su propio conductor
+    q = MatchQuery(37.1717, -3.5999, *CAMPUS, start, start + timedelta(hours=1))
+    assert own["id"] in [m.ride_id for m in ride_matcher.match("UGR", q)]
+    assert [m["id"] for m in api_client.get("/api/rides/matches", params=params).json()] == [other]
+
+    api_client.post(f"/api/rides/{own['id']}/cancel")
+    assert own["id"] not in [m.ride_id for m in ride_matcher.match("UGR", q)]
@@ -0,0 +1,84 @@
+import random
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import text
+
+from app.rides.geo import cell_of, cells_within, haversine_km
+from app.rides.service import search_statement
+
+PROFILE = {
+    "full_name": "Ada",
+    "university": "UGR",
+    "degree": "Informática",
+    "course": 2,
+    "ride_intent": "offers",
+}
+# Granada: Fuente de las Batallas
+GRANADA = (37.1717, -3.5999)
+
+
+def _ride(lat, lon, hours_ahead=2.0, seats=3):
+    start = datetime.now(UTC) + timedelta(hours=hours_ahead)
+    return {
+        "origin_lat": lat,
+        "origin_lon": lon,
+        "dest_lat": 37.1970,
+        "dest_lon": -3.6240,
+        "departure_earliest": start.isoformat(),
+        "departure_latest": (start + timedelta(minutes=30)).isoformat(),
+        "seats_total": seats,
+    }
+
+
+def test_cells_within_cover_every_point_in_radius():
+    rng = random.Random(7)
+    for lat, lon, radius in [(*GRANADA, 5), (64.1, -21.9, 30), (-33.9, 179.95, 12)]:
+        cells = set(cells_within(lat, lon, radius))
+        for _ in range(500):
+            plat = lat + rng.uniform(-1, 1) * radius / 111
+            plon = (lon + rng.uniform(-2, 2) * radius / 111 + 180) % 360 - 180
+            if haversine_km(lat, lon, plat, plon) <= radius:
+                assert cell_of(plat, plon) in cells
+
+
+def test_publish_requires_driver_profile(api_client):
+    api_client.put("/api/me/profile", json={**PROFILE, "ride_intent": "seeks"})
+    assert api_client.post("/api/rides", json=_ride(*GRANADA)).status_code == 403
+
+
+def test_search_filters_by_distance_and_window(api_client):
+    api_client.put("/api/me/profile", json=PROFILE)
+    near = api_client.post("/api/rides", json=_ride(37.18, -3.60)).json()
+    api_client.post("/api/rides", json=_ride(37.39, -5.98))  # Sevilla
+    api_client.post("/api/rides", json=_ride(37.17, -3.59, hours_ahead=30))
+    assert near["seats_left"] == 3 and near["university"] == "UGR"
+
+    r = api_client.get("/api/rides/search", params={"lat": GRANADA[0], "lon": GRANADA[1]})
+    assert r.status_code == 200
+    hits = r.json()
+    assert [h["id"] for h in hits] == [near["id"]]
+    assert hits[0]["distance_km"] < 1.5
+
+    api_client.post(f"/api/rides/{near['id']}/cancel")
+    r = api_client.get("/api/rides/search", params={"lat": GRANADA[0], "lon": GRANADA[1]})
+    assert r.json() == []
+
+
+def test_search_rejects_bad_window(api_client):
+    now = datetime.now(UTC)
+    params = {
+        "lat": GRANADA[0],
+        "lon": GRANADA[1],
+        "departure_from": now.isoformat(),
+        "departure_to": (now - timedelta(hours=1)).isoformat(),
+    }
+    assert api_client.get("/api/rides/search", params=params).status_code == 400
+
+
+def test_search_uses_cell_index(sqlite_engine):
+    now = datetime.now(UTC)
+    stmt = search_statement(*GRANADA, 5, now, now + timedelta(hours=2))
+    compiled = stmt.compile(sqlite_engine, compile_kwargs={"literal_binds": True})
+    with sqlite_engine.connect() as conn:
+        plan = conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    assert "ix_rides_active_cell_departure" in " ".join(row[-1] for row in plan)
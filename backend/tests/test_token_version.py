@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.auth.cache import UserSnapshot, user_cache
+from app.auth.models import User
+from app.db.session import Base
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_password_change_and_deactivation_bump_version(db):
+    user = User(email="ada@ugr.es", password_hash="h1")
+    db.add(user)
+    db.commit()
+    assert user.token_version == 0
+
+    user.full_name = "Ada"
+    db.commit()
+    assert user.token_version == 0
+
+    user.password_hash = "h2"
+    db.commit()
+    assert user.token_version == 1
+
+    user.is_active = False
+    db.commit()
+    assert user.token_version == 2
+
+
+def test_commit_invalidates_cached_snapshot(db):
+    user = User(email="ada@ugr.es", password_hash="h1")
+    db.add(user)
+    db.commit()
+    user_cache.set(UserSnapshot.from_user(user))
+    assert user_cache.get(user.id) is not None
+
+    user.full_name = "Ada"
+    db.commit()
+    assert user_cache.get(user.id) is None
@@ -17,21 +17,34 @@ function authHeaders() {
   const t = getToken();
   return t ? { Authorization: `Bearer ${t}` } : {};
 }
+// ETag de la última versión del perfil leída: se manda en If-Match al guardar
+let profileEtag: string | null = null;
+
 async function getProfile() {
-  const r = await fetch(`${BASE}/me/profile`, { headers: { ...authHeaders() }, cache: "no-store" });
+  // no-cache: el navegador revalida con If-None-Match y reutiliza su copia si recibe 304
+  const r = await fetch(`${BASE}/me/profile`, { headers: { ...authHeaders() }, cache: "no-cache" });
   if (!r.ok) throw new Error(`Perfil: ${r.status}`);
+  profileEtag = r.headers.get("ETag");
   return r.json();
 }
 async function updateProfile(payload: any) {
   const r = await fetch(`${BASE}/me/profile`, {
     method: "PUT",
-    headers: { "Content-Type": "application/json", ...authHeaders() },
+    headers: {
+      "Content-Type": "application/json",
+      ...(profileEtag ? { "If-Match": profileEtag } : {}),
+      ...authHeaders(),
+    },
     body: JSON.stringify(payload),
   });
+  if (r.status === 412) {
+    throw new Error("El perfil se ha modificado en otra pestaña. Recarga la página antes de guardar.");
+  }
   if (!r.ok) {
     const txt = await r.text();
     throw new Error(txt || `Update: ${r.status}`);
   }
+  profileEtag = r.headers.get("ETag");
   return r.json();
 }
 async function uploadAvatar(file: File) {
@@ -43,9 +56,17 @@ async function uploadAvatar(file: File) {
     body: form,
   });
   if (!r.ok) throw new Error(`Avatar: ${r.status}`);
+  profileEtag = r.headers.get("ETag");
   return r.json();
 }
 
+// El círculo es de 80px: la variante de 128px basta incluso en pantallas 2x.
+// Las URLs relativas (/static/avatars/...) las sirve la API, no el frontend.
+function avatarSrc(p: any): string | null {
+  const url = p.avatar_variants?.["128"]?.webp ?? p.avatar_url;
+  return url ? new URL(url, BASE).toString() : null;
+}
+
 // --- validación ---
 const schema = z.object({
   full_name: z.string().min(1, "Obligatorio").max(150),
@@ -96,7 +117,7 @@ export default function ProfilePage() {
         setValue("degree", p.degree ?? "");
         setValue("course", p.course ?? 1);
         setValue("ride_intent", (p.ride_intent ?? "both") as FormValues["ride_intent"]);
-        setAvatarUrl(p.avatar_url ?? null);
+        setAvatarUrl(avatarSrc(p));
       } catch (e: any) {
         setServerError(e?.message ?? "Error cargando perfil");
       } finally {
@@ -132,7 +153,7 @@ export default function ProfilePage() {
     setSaving(true);
     try {
       const updated = await updateProfile(values);
-      setAvatarUrl(updated.avatar_url ?? null);
+      setAvatarUrl(avatarSrc(updated));
       setSuccessMsg("Perfil guardado correctamente ✅");
     } catch (e: any) {
       const msg = e?.message ?? "No se pudo guardar";
@@ -151,7 +172,7 @@ export default function ProfilePage() {
     const file = e.target.files[0];
     try {
       const updated = await uploadAvatar(file);
-      setAvatarUrl(updated.avatar_url ?? null);
+      setAvatarUrl(avatarSrc(updated));
       setAvatarMsg("Avatar actualizado ✅");
     } catch (e: any) {
       setServerError(e?.message ?? "No se pudo subir el avatar");